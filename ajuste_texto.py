@@ -0,0 +1,173 @@
+"""
+Motor de ajuste de texto (word wrap + redução de fonte) com memoização.
+
+Substitui o laço linear do caber_texto_na_caixa (que reduzia a fonte de 2 em 2px
+e re-quebrava o texto inteiro a cada passo) por:
+1. Busca binária sobre os mesmos tamanhos candidatos (start, start-2, ..., >= 14).
+2. Cache das larguras medidas por (fonte, tamanho).
+3. Memoização do resultado final por (texto, largura, altura, tamanho inicial, negrito),
+   já que os mesmos nomes de SKU voltam a cada reimpressão.
+
+O resultado é idêntico ao algoritmo antigo: a quebra de linha é a mesma (gulosa) e a
+busca binária escolhe o maior tamanho da sequência que cabe na caixa.
+"""
+import threading
+from collections import OrderedDict
+
+import fontes
+import perfil
+
+MIN_FONT_SIZE = 14      # Tamanho mínimo aceitável
+LINE_SPACING = 1.15     # Altura da linha = tamanho da fonte + 15%
+MAX_LAYOUTS = 8192      # Layouts finais memoizados
+MAX_LARGURAS = 256      # Tabelas de largura (uma por fonte/tamanho)
+
+
+class MotorAjuste:
+    """Ajusta textos em caixas guardando larguras e layouts já calculados."""
+
+    def __init__(self, max_layouts=MAX_LAYOUTS, max_larguras=MAX_LARGURAS):
+        self.max_layouts = max_layouts
+        self.max_larguras = max_larguras
+        self._layouts = OrderedDict()
+        self._larguras = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # --- Medição ---
+
+    def _tabela_larguras(self, font, modo):
+        key = (getattr(font, 'path', None), getattr(font, 'size', None), modo)
+        with self._lock:
+            tabela = self._larguras.get(key)
+            if tabela is None:
+                tabela = self._larguras[key] = {}
+                while len(self._larguras) > self.max_larguras:
+                    self._larguras.popitem(last=False)
+            else:
+                self._larguras.move_to_end(key)
+        return tabela
+
+    def largura(self, texto, font, modo='L'):
+        """Equivalente a draw.textlength(texto, font=font), com cache."""
+        tabela = self._tabela_larguras(font, modo)
+        w = tabela.get(texto)
+        if w is None:
+            w = tabela[texto] = font.getlength(texto, modo)
+        return w
+
+    def quebrar_linhas(self, text, font, max_width, modo='L'):
+        """Word wrap guloso (mesma regra do caber_texto_na_caixa original)."""
+        tabela = self._tabela_larguras(font, modo)
+        lines = []
+        current_line = []
+        for word in text.split():
+            test_line = ' '.join(current_line + [word])
+            w_line = tabela.get(test_line)
+            if w_line is None:
+                w_line = tabela[test_line] = font.getlength(test_line, modo)
+
+            if w_line <= max_width:
+                current_line.append(word)
+            else:
+                if current_line:
+                    lines.append(' '.join(current_line))
+                current_line = [word]
+
+        if current_line:
+            lines.append(' '.join(current_line))
+        return lines
+
+    # --- Ajuste ---
+
+    def _tentar(self, text, size, max_width, is_bold, modo):
+        font = fontes.carregar_fonte(size, bold=is_bold)
+        lines = self.quebrar_linhas(text, font, max_width, modo)
+        line_height = size * LINE_SPACING
+        return lines, font, len(lines) * line_height, line_height
+
+    def _calcular(self, text, max_width, max_height, start_font_size, is_bold, modo):
+        size = int(start_font_size)
+        if fontes.caminho_fonte(bold=is_bold) is None:
+            # Falha na fonte: devolve o texto inteiro com a fonte padrão do Pillow
+            line_height = size * LINE_SPACING
+            return [text], fontes.carregar_fonte(size, bold=is_bold), line_height, line_height
+
+        sizes = list(range(size, MIN_FONT_SIZE - 1, -2)) or [size]
+
+        # Busca binária pelo primeiro índice (maior tamanho) que cabe na altura
+        lo, hi = 0, len(sizes)
+        resultados = {}
+        while lo < hi:
+            mid = (lo + hi) // 2
+            resultados[mid] = self._tentar(text, sizes[mid], max_width, is_bold, modo)
+            if resultados[mid][2] <= max_height:
+                hi = mid
+            else:
+                lo = mid + 1
+
+        if lo < len(sizes):
+            return resultados[lo]
+
+        # Nem no tamanho mínimo coube: trunca o texto com "..."
+        ultimo = resultados.get(len(sizes) - 1) or self._tentar(text, sizes[-1], max_width, is_bold, modo)
+        _, font, total_h, line_h = ultimo
+        return [text[:30] + "..."], font, total_h, line_h
+
+    def ajustar(self, text, max_width, max_height, start_font_size, is_bold=True, modo='L'):
+        """Retorna (linhas, fonte, altura_total, altura_linha) para o texto na caixa."""
+        key = (text, max_width, max_height, int(start_font_size), bool(is_bold), modo)
+        with self._lock:
+            resultado = self._layouts.get(key)
+            if resultado is not None:
+                self._layouts.move_to_end(key)
+                self.hits += 1
+        if resultado is None:
+            with perfil.etapa('ajuste_texto'):
+                resultado = self._calcular(text, max_width, max_height, start_font_size, is_bold, modo)
+            with self._lock:
+                self.misses += 1
+                self._layouts[key] = resultado
+                while len(self._layouts) > self.max_layouts:
+                    self._layouts.popitem(last=False)
+        lines, font, total_h, line_h = resultado
+        return list(lines), font, total_h, line_h
+
+    def cabe(self, text, size, max_width, max_height, is_bold=True, modo='L'):
+        """
+        True se o texto, quebrado em linhas no tamanho `size`, cabe na altura.
+        Usa as tabelas de largura, mas não guarda layout nenhum: serve para testar
+        muitas caixas candidatas (paginação) sem expulsar do cache os layouts desenhados.
+        """
+        if fontes.caminho_fonte(bold=is_bold) is None:
+            return True  # Sem fonte o ajuste não reduz nada
+        return self._tentar(text, size, max_width, is_bold, modo)[2] <= max_height
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'layouts_em_cache': len(self._layouts),
+                'tabelas_de_largura': len(self._larguras),
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._layouts.clear()
+            self._larguras.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Instância global usada pelo gerador
+motor = MotorAjuste()
+
+
+def ajustar_texto(text, max_width, max_height, start_font_size, is_bold=True, modo='L'):
+    return motor.ajustar(text, max_width, max_height, start_font_size, is_bold, modo)
+
+
+def estatisticas():
+    return motor.estatisticas()
@@ -1,333 +1,767 @@
-from flask import Flask, render_template, request, send_file, redirect, url_for, flash, after_this_request
+from flask import Flask, Response, g, jsonify, render_template, request, send_file, redirect, url_for, flash, stream_with_context
+import functools
+import gc
 import io
-from werkzeug.utils import secure_filename
-import os
-import csv
+import itertools
+import json
+import re
 import tempfile
-import shutil
-import zipfile
-
-# Tenta importar img2pdf para gerar o arquivo multipágina
-try:
-    import img2pdf
-except ImportError:
-    img2pdf = None
+import threading
+import time
+import os
 
 from poster_black import (
-    gerar_poster_a_partir_de_lista, 
     TEXTO_VIGENCIA, 
     TEXTO_ESTOQUES, 
     PRINT_MARGIN, 
     DEFAULT_BG, 
     DEFAULT_TEXT, 
-    DEFAULT_ACCENT
+    DEFAULT_ACCENT,
+    TEMAS as THEMES,
 )
+from render_paralelo import iterar_paginas
+from catalogo import iter_ofertas, ofertas_de_json
+import cache_render
+import celulas
+import fontes
+import glifos
+import ajuste_texto
+import pdf_stream
+import paginacao
+import perfil
+import plano
+import poster_black
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET', 'dev-secret')
 
-# --- Definição de Temas ---
-THEMES = {
-    'blackfriday': {
-        'bg': '#000000',
-        'text': '#ffff00',
-        'accent': '#ffffff',
-        'badge': '#ff0000'
-    },
-    'natalino': {
-        'bg': '#0a3a0a',
-        'text': '#ffffff',
-        'accent': '#ffcc00',
-        'badge': '#ff0000'
-    },
-    'farmacia': {
-        'bg': '#ffffff',
-        'text': '#cc0000',
-        'accent': '#ffcc00',
-        'badge': '#cc0000'
-    }
+# POSTER_AQUECER=1: carrega fontes e caches de ajuste numa thread assim que o worker sobe
+AQUECER = os.environ.get('POSTER_AQUECER') == '1'
+
+# Temas cujas camadas o modo pré-carregado desenha no mestre (nomes separados por vírgula ou 'todos').
+# Cada tema são ~4 páginas inteiras em memória; o padrão é só o tema inicial do formulário.
+TEMAS_PRELOAD = os.environ.get('POSTER_PRELOAD_TEMAS', 'blackfriday')
+
+# Acima disso (em páginas) o PDF é gerado por um job assíncrono em vez de segurar a requisição
+LIMITE_PAGINAS_SINCRONO = int(os.environ.get('POSTER_LIMITE_SINCRONO', 40))
+
+# Páginas renderizadas antes de uma resposta em streaming começar (erro nelas não trunca o arquivo)
+PAGINAS_ANTECIPADAS = int(os.environ.get('POSTER_PAGINAS_ANTECIPADAS', 4))
+
+# Artefatos da API montados em memória até este tamanho; acima disso, num arquivo temporário
+LIMITE_SPOOL = int(float(os.environ.get('POSTER_API_SPOOL_MB', 32)) * 1024 * 1024)
+
+# Nível de compressão padrão dos PNGs do ZIP de imagens (0 = sem compressão, 9 = máxima)
+NIVEL_PNG = int(os.environ.get('POSTER_PNG_NIVEL', 6))
+
+# Envia o cabeçalho Server-Timing em todas as respostas (ou só quando o cliente manda X-Poster-Timing: 1)
+SERVER_TIMING = os.environ.get('POSTER_SERVER_TIMING') == '1'
+
+# API JSON: formatos aceitos (mimetype, nome do download) e layouts
+FORMATOS_API = {
+    'pdf': ('application/pdf', 'cartazes_ofertas.pdf'),
+    'pdf_vetorial': ('application/pdf', 'cartazes_ofertas.pdf'),
+    'zip': ('application/zip', 'cartazes_ofertas.zip'),
+    'png': ('image/png', 'cartaz_ofertas.png'),
 }
+LAYOUTS_API = ('list', 'simple', 'gondola', 'individual')
+
+# Data fixa das entradas do ZIP da API: os mesmos cartazes dão sempre os mesmos bytes (ETag forte)
+DATA_ZIP_API = (1980, 1, 1, 0, 0, 0)
+
+# EXEMPLOS FARMACÊUTICOS (Nomes longos para teste)
+DEFAULT_OFFERS = [
+    {'produto':'Dipirona Monohidratada 500mg 10 Comp','de':8.99,'por':2.99,'local':'','locale':'pt_BR'},
+    {'produto':'Protetor Solar Facial FPS 70 Toque Seco 50g','de':89.90,'por':59.90,'local':'','locale':'pt_BR'},
+    {'produto':'Fralda Geriátrica Plenitud G 8 Unidades','de':45.50,'por':32.90,'local':'','locale':'pt_BR'},
+    {'produto':'Vitamina C Efervescente 1g Laranja c/ 10','de':19.90,'por':12.49,'local':'','locale':'pt_BR'},
+    {'produto':'Shampoo Anticaspa Intensivo 200ml','de':35.00,'por':27.90,'local':'','locale':'pt_BR'},
+    {'produto':'Kit Creme Dental Leve 3 Pague 2','de':15.90,'por':9.99,'local':'','locale':'pt_BR'},
+]
 
 # --- Funções Auxiliares ---
 
+@functools.lru_cache(maxsize=None)
+def carregar_img2pdf():
+    """img2pdf (opcional), importado só se o caminho alternativo de PDF for usado (ele puxa o pikepdf)."""
+    try:
+        import img2pdf
+        return img2pdf
+    except ImportError:
+        return None
+
+
+# Módulos dos modos que nem toda requisição usa: importados na primeira vez que
+# uma rota precisar deles, para a subida do worker não pagar por todos
+
+@functools.lru_cache(maxsize=None)
+def carregar_impressao():
+    """impressao.py (modo gráfica: 300/600 dpi, sangria e marcas de corte)."""
+    import impressao
+    return impressao
+
+
+@functools.lru_cache(maxsize=None)
+def carregar_pdf_vetorial():
+    """pdf_vetorial.py (PDF com texto vetorial)."""
+    import pdf_vetorial
+    return pdf_vetorial
+
+
+@functools.lru_cache(maxsize=None)
+def carregar_jobs():
+    """jobs.py (jobs assíncronos e o pool de processos deles)."""
+    import jobs
+    return jobs
+
+
+@functools.lru_cache(maxsize=None)
+def carregar_lojas():
+    """lojas.py (cartazes por loja)."""
+    import lojas
+    return lojas
+
+
+@functools.lru_cache(maxsize=None)
+def carregar_zip_stream():
+    """zip_stream.py (ZIP das páginas em streaming)."""
+    import zip_stream
+    return zip_stream
+
+
+def aquecer_worker():
+    """
+    Aquece fontes, planos e caches de ajuste numa thread de fundo, para a primeira
+    requisição do worker não pagar esse custo. Chamado na subida do servidor
+    (POSTER_AQUECER=1 ou app.py direto); as requisições que chegarem antes só
+    disputam os mesmos caches.
+    """
+    thread = threading.Thread(target=poster_black.aquecer, name='poster-aquecer', daemon=True)
+    thread.start()
+    return thread
+
+
+def temas_preload(nomes=None):
+    """Temas de POSTER_PRELOAD_TEMAS (nomes desconhecidos são ignorados)."""
+    nomes = TEMAS_PRELOAD if nomes is None else nomes
+    if nomes.strip() == 'todos':
+        return list(THEMES.values())
+    return [THEMES[nome.strip()] for nome in nomes.split(',') if nome.strip() in THEMES]
+
+
+def preaquecer():
+    """
+    Modo pré-carregado (gunicorn com preload_app, ver gunicorn.conf.py): roda no
+    processo mestre, antes do fork. Fontes, caches de ajuste, template e as camadas
+    base dos temas de POSTER_PRELOAD_TEMAS ficam prontos uma vez só; gc.freeze()
+    tira esses objetos das coletas para que os workers os compartilhem
+    (copy-on-write) em vez de copiar as páginas de memória na primeira coleta.
+    As camadas dos outros temas são desenhadas por worker, quando pedidas.
+    """
+    # Com POSTER_AQUECER=1 a thread de aquecimento subiu na importação: ela não
+    # passa para os workers no fork, e um lock que ela segurasse ficaria preso neles
+    if _aquecimento is not None:
+        _aquecimento.join()
+    poster_black.aquecer(temas=temas_preload() or None)
+    app.jinja_env.get_template('index.html')
+    gc.collect()
+    gc.freeze()
+
+
 def rgb_to_hex(rgb):
     try:
         return '#%02x%02x%02x' % rgb
     except Exception:
         return '#000000'
 
-def parse_csv(filepath):
-    ofertas = []
-    encodings = ['utf-8-sig', 'latin-1'] 
-    csv_data = []
-    
-    for encoding in encodings:
-        try:
-            with open(filepath, newline='', encoding=encoding) as csvfile:
-                reader = csv.DictReader(csvfile)
-                csv_data = list(reader)
-            break 
-        except UnicodeDecodeError:
-            continue
-            
-    for row in csv_data:
-        # Normaliza chaves para minúsculo
-        row = {k.lower(): v for k, v in row.items() if k}
-        
-        # Tratamento robusto de FLOAT para dinheiro
+class Reaproveitamento:
+    """
+    Páginas que vieram do cache, anotadas pela flag `reaproveitada` de cada
+    ResultadoPagina à medida que os resultados chegam (ver informar_reaproveitamento).
+    """
+
+    def __init__(self, total, reaproveitadas=()):
+        self.total = total
+        self.reaproveitadas = list(reaproveitadas)
+        self.prontas = len(self.reaproveitadas)
+
+    def anotar(self, resultado):
+        self.prontas += 1
+        if resultado.reaproveitada:
+            self.reaproveitadas.append(resultado.indice)
+
+
+def paginas_validas(resultados, total, reaproveitamento=None):
+    """Percorre os ResultadoPagina devolvendo os bytes; interrompe com erro na primeira página que falhou.
+
+    Com `reaproveitamento` (um Reaproveitamento), anota as páginas que vieram do
+    cache. Ao parar (erro ou cliente que desconectou), fecha `resultados`: as
+    páginas ainda na fila do pool são canceladas (ver render_paralelo.iterar_paginas).
+    """
+    try:
+        for resultado in resultados:
+            if resultado.erro:
+                msg = f"Falha ao gerar a página {resultado.indice + 1} de {total}: {resultado.erro}"
+                app.logger.error(msg)
+                raise RuntimeError(msg)
+            if reaproveitamento is not None:
+                reaproveitamento.anotar(resultado)
+            yield resultado.dados
+        if reaproveitamento is not None:
+            app.logger.info("páginas reaproveitadas do cache: %s de %d",
+                            faixas_de_paginas(reaproveitamento.reaproveitadas) or '-', total)
+    finally:
+        resultados.close()
+
+
+def antecipar(paginas, n=PAGINAS_ANTECIPADAS):
+    """
+    Renderiza as `n` primeiras páginas antes de a resposta em streaming sair: um erro
+    nelas ainda vira mensagem (formulário) ou 500 (API), não um arquivo truncado com
+    status 200. Retorna (primeiras páginas, gerador com todas).
+
+    Um erro depois disso sobe no meio do streaming e o servidor derruba a conexão
+    sem o fim da resposta (HTTP/1.1 chunked): o cliente vê um download incompleto,
+    e o documento nunca chega ao cache (cache_render.guardar_em_partes).
+    """
+    primeiras = list(itertools.islice(paginas, n))
+
+    def todas():
         try:
-            # Remove R$, espaços e troca vírgula por ponto
-            val_de_str = str(row.get('de', '0')).replace('R$', '').replace(' ', '').replace(',', '.')
-            de_val = float(val_de_str)
-        except ValueError:
-            de_val = 0.0
-            
+            yield from primeiras
+            yield from paginas
+        finally:
+            paginas.close()
+    return primeiras, todas()
+
+
+def ler_impressao():
+    """Opções do modo gráfica (dpi, bleed_mm, marcas_corte) ou None na qualidade de tela."""
+    qualidade = request.form.get('qualidade', 'tela')
+    if qualidade not in ('300', '600'):
+        return None
+    sangria_padrao = carregar_impressao().SANGRIA_MM
+    try:
+        bleed_mm = min(10.0, max(0.0, float(str(request.form.get('bleed_mm', sangria_padrao)).replace(',', '.'))))
+    except ValueError:
+        bleed_mm = sangria_padrao
+    return dict(dpi=int(qualidade), bleed_mm=bleed_mm, marcas_corte=bool(request.form.get('marcas_corte')))
+
+
+def ler_compacto():
+    """opcoes_formato das páginas PNG: saída compacta (paleta do tema ou cinza) se o campo compacto veio marcado."""
+    return {'compacto': True} if request.form.get('compacto') else None
+
+
+def ler_opcoes_png():
+    """Opções de codificação do ZIP de imagens: nível de compressão (png_nivel) e saída compacta."""
+    try:
+        nivel = min(9, max(0, int(request.form.get('png_nivel', NIVEL_PNG))))
+    except ValueError:
+        nivel = NIVEL_PNG
+    return dict(ler_compacto() or {}, compress_level=nivel)
+
+
+def itens_por_pagina(layout_mode, qtd_itens=6):
+    """Fixo nos layouts individual, simples e gôndola; na lista, qtd_itens entre 2 e 8."""
+    if layout_mode != 'list' and layout_mode in poster_black.ITENS_POR_PAGINA:
+        return poster_black.ITENS_POR_PAGINA[layout_mode]
+    try:
+        return min(8, max(2, int(qtd_itens)))
+    except (TypeError, ValueError):
+        return poster_black.ITENS_POR_PAGINA['list']
+
+
+def itens_por_pagina_do_formulario(layout_mode):
+    if request.form.get('paginacao') == paginacao.AUTO:
+        return paginacao.AUTO  # Quantos itens por página decide a paginação por densidade
+    return itens_por_pagina(layout_mode, request.form.get('qtd_itens', 6))
+
+
+def ler_formulario(so_primeira_pagina=False):
+    """Lê ofertas (CSV ou manuais), paginação e parâmetros visuais do formulário.
+
+    Com so_primeira_pagina=True o CSV só é lido até completar a primeira página
+    (pré-visualização: o tempo não depende do tamanho do catálogo).
+    Retorna (ofertas, itens_por_pagina, opcoes_render); itens_por_pagina pode ser
+    paginacao.AUTO (divida com paginacao.paginar).
+    """
+    ofertas = []
+    csv_file = request.files.get('csvfile')
+
+    # Paginação e Layout
+    layout_mode = request.form.get('layout_mode', 'list')
+    itens_por_pagina = itens_por_pagina_do_formulario(layout_mode)
+    limite = paginacao.max_por_pagina(itens_por_pagina, layout_mode) if so_primeira_pagina else None
+
+    # 1. Processar CSV (lido direto do upload, em streaming)
+    if csv_file and csv_file.filename:
+        ofertas = list(itertools.islice(iter_ofertas(csv_file.stream), limite))
+
+    # 2. Processar Manual
+    else:
+        # Lê até 16 produtos manuais (2 páginas cheias)
+        for i in range(1, 17):
+            nome = request.form.get(f'produto_{i}', '').strip()
+            if not nome: continue
+
+            # Tratamento float no input manual
+            try:
+                de_str = request.form.get(f'de_{i}', '0').replace(',', '.')
+                de_val = float(de_str)
+            except ValueError: de_val = 0.0
+
+            try:
+                por_str = request.form.get(f'por_{i}', '0').replace(',', '.')
+                por_val = float(por_str)
+            except ValueError: por_val = 0.0
+
+            local = request.form.get(f'local_{i}', '')
+            locale = request.form.get(f'locale_{i}', 'pt_BR')
+            ofertas.append({'produto': nome, 'de': de_val, 'por': por_val, 'local': local, 'locale': locale})
+        ofertas = ofertas[:limite]
+
+    # 3. Parâmetros visuais
+    vigencia_text = request.form.get('vigencia', '').strip() or None
+    aviso_estoques = request.form.get('estoques', '').strip() or None
+    poster_title = request.form.get('poster_title', 'OFERTAS')
+
+    # Cores: usa o form, que já foi preenchido pelo JS do tema
+    bg_color = request.form.get('bg_color')
+    text_color = request.form.get('text_color')
+    accent_color = request.form.get('accent_color')
+    badge_color = request.form.get('badge_color')
+
+    opcoes_render = dict(
+        vigencia_text=vigencia_text,
+        aviso_estoques=aviso_estoques,
+        bg_color=bg_color,
+        text_color=text_color,
+        accent_color=accent_color,
+        badge_color=badge_color,
+        layout_mode=layout_mode,
+        poster_title=poster_title,
+    )
+    return ofertas, itens_por_pagina, opcoes_render
+
+def responder_previa(grupo, opcoes_render):
+    """Pré-visualização rápida: só a primeira página, em baixa resolução (WebP se o navegador aceitar).
+
+    A mesma página em resolução completa fica em /previa/<chave> (cabeçalho
+    X-Poster-Completa): o pedido vai para o cache e só é renderizado se for buscado.
+    """
+    formato = 'WEBP' if poster_black.WEBP_DISPONIVEL and request.accept_mimetypes['image/webp'] else 'JPEG'
+    chave_previa = cache_render.chave_pagina(grupo, formato, dpi=poster_black.DPI_PREVIA, **opcoes_render)
+    dados = cache_render.cache.get(chave_previa)
+    if dados is None:
+        dados = poster_black.renderizar_previa(grupo, formato, **opcoes_render)
+        cache_render.cache.put(chave_previa, dados)
+
+    chave = cache_render.chave_pagina(grupo, 'PNG', **opcoes_render)
+    pedido = {'ofertas': grupo, 'opcoes': opcoes_render}
+    cache_render.cache.put(cache_render.chave_pedido(chave), json.dumps(pedido, ensure_ascii=False).encode('utf-8'))
+
+    completa = url_for('previa_completa', chave=chave)
+    resposta = send_file(io.BytesIO(dados), mimetype=poster_black.MIMETYPES[formato])
+    resposta.headers['X-Poster-Completa'] = completa
+    resposta.headers['Link'] = f'<{completa}>; rel="alternate"; type="image/png"'
+    resposta.vary.add('Accept')
+    return resposta
+
+def responder_zip(grupos, opcoes_render, opcoes_impressao=None):
+    """ZIP com um PNG por página, enviado em streaming à medida que as páginas ficam prontas.
+
+    As páginas são codificadas no pool (nível de compressão e paleta do formulário)
+    e entram no ZIP sem recompressão (ZIP_STORED): o PNG já é comprimido.
+    """
+    total_paginas = len(grupos)
+    if opcoes_impressao:
+        # Qualidade gráfica: cada página é montada em faixas (uma de cada vez)
+        paginas = (b''.join(carregar_impressao().png_em_partes(grupo, **opcoes_render, **opcoes_impressao))
+                   for grupo in grupos)
+    else:
+        opcoes_png = ler_opcoes_png()
+        g.paginas_reaproveitadas = reaproveitamento = Reaproveitamento(total_paginas)
+        resultados = iterar_paginas(grupos, formato='PNG', opcoes_formato=opcoes_png,
+                                    cache=cache_render.cache, **opcoes_render)
+        _, paginas = antecipar(paginas_validas(resultados, total_paginas, reaproveitamento))
+
+    arquivos = ((f"cartaz_{n:03d}.png", png) for n, png in enumerate(paginas, start=1))
+    return Response(
+        stream_with_context(carregar_zip_stream().zip_em_partes(arquivos)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename=cartazes_ofertas.zip'},
+    )
+
+# --- API JSON ---
+
+def ler_pedido_json(dados):
+    """Valida o corpo JSON da API. Retorna o pedido normalizado; levanta ValueError com a mensagem para o cliente.
+
+    Os campos têm os mesmos nomes do formulário (layout_mode, qtd_itens, paginacao,
+    format, bg_color..., poster_title, vigencia, estoques, compacto, png_nivel), mais
+    `ofertas` (lista de {produto, de, por, local, locale}) e `tema` (cores de um
+    tema pronto; as cores explícitas têm prioridade).
+    """
+    if not isinstance(dados, dict):
+        raise ValueError("Envie um objeto JSON (Content-Type: application/json).")
+    ofertas = ofertas_de_json(dados.get('ofertas'))
+    if not ofertas:
+        raise ValueError("Nenhuma oferta válida encontrada.")
+
+    layout_mode = dados.get('layout_mode', 'list')
+    if layout_mode not in LAYOUTS_API:
+        raise ValueError(f"layout_mode inválido: use {', '.join(LAYOUTS_API)}.")
+    formato = dados.get('format', 'pdf')
+    if formato not in FORMATOS_API:
+        raise ValueError(f"format inválido: use {', '.join(FORMATOS_API)}.")
+    if formato == 'pdf_vetorial' and not carregar_pdf_vetorial().disponivel():
+        formato = 'pdf'  # Sem fontTools: PDF rasterizado (a chave já sai certa para ele)
+    if dados.get('paginacao') == paginacao.AUTO:
+        por_pagina = paginacao.AUTO
+    else:
+        por_pagina = itens_por_pagina(layout_mode, dados.get('qtd_itens', 6))
+
+    tema = dados.get('tema')
+    if tema is not None and tema not in THEMES:
+        raise ValueError(f"tema inválido: use {', '.join(THEMES)}.")
+    cores = {f"{nome}_color": THEMES[tema][nome] for nome in ('bg', 'text', 'accent', 'badge')} if tema else {}
+    for nome in ('bg_color', 'text_color', 'accent_color', 'badge_color'):
+        if dados.get(nome):
+            if not re.fullmatch(r'#[0-9a-fA-F]{6}', str(dados[nome])):
+                raise ValueError(f"{nome} deve ser uma cor #rrggbb.")
+            cores[nome] = dados[nome]
+
+    opcoes_render = dict(
+        vigencia_text=str(dados.get('vigencia') or '').strip() or None,
+        aviso_estoques=str(dados.get('estoques') or '').strip() or None,
+        bg_color=cores.get('bg_color'),
+        text_color=cores.get('text_color'),
+        accent_color=cores.get('accent_color'),
+        badge_color=cores.get('badge_color'),
+        layout_mode=layout_mode,
+        poster_title=str(dados.get('poster_title') or 'OFERTAS'),
+    )
+
+    # Mesmas opções de codificação do formulário: compacto nas páginas; no ZIP, também o nível do PNG
+    opcoes_png = {'compacto': True} if dados.get('compacto') else None
+    if formato == 'zip':
         try:
-            val_por_str = str(row.get('por', '0')).replace('R$', '').replace(' ', '').replace(',', '.')
-            por_val = float(val_por_str)
-        except ValueError:
-            por_val = 0.0
-            
-        ofertas.append({
-            'produto': row.get('produto', '').strip(),
-            'de': de_val,
-            'por': por_val,
-            'local': row.get('local', '').strip(),
-            'locale': row.get('locale', 'pt_BR').strip() or 'pt_BR'
-        })
-    return ofertas
-
-def dividir_lista(lista, tamanho_do_grupo):
-    """Divide a lista total em pedaços (páginas)."""
-    for i in range(0, len(lista), tamanho_do_grupo):
-        yield lista[i:i + tamanho_do_grupo]
+            nivel = min(9, max(0, int(dados.get('png_nivel', NIVEL_PNG))))
+        except (TypeError, ValueError):
+            nivel = NIVEL_PNG
+        opcoes_png = dict(opcoes_png or {}, compress_level=nivel)
+    return {'ofertas': ofertas, 'opcoes': opcoes_render, 'format': formato,
+            'itens_por_pagina': por_pagina, 'opcoes_png': opcoes_png}
+
+
+def grupos_do_pedido(pedido):
+    """Páginas do pedido (fixas ou por densidade, ver paginacao.py)."""
+    return list(paginacao.paginar(pedido['ofertas'], pedido['itens_por_pagina'], **pedido['opcoes']))
+
+
+def chave_api(pedido, grupos):
+    """Chave (e ETag) do artefato do pedido, calculada só das entradas: nada é renderizado.
+
+    Usa as mesmas chaves do formulário, então a API e o formulário compartilham o
+    cache: o PDF tem a chave do PDF do formulário e o PNG, a chave da página.
+    """
+    chaves = [cache_render.chave_pagina(grupo, 'PNG', pedido['opcoes_png'], **pedido['opcoes']) for grupo in grupos]
+    formato = pedido['format']
+    if formato == 'png':
+        return chaves[0]
+    if formato == 'pdf':
+        return cache_render.chave_documento(chaves, 'PDF', dpi=150)
+    return cache_render.chave_documento(chaves, formato)
+
+
+def nao_modificado(chave):
+    """True se o cliente já tem o artefato: If-None-Match com a ETag, ou '*' se o artefato já existe (no cache)."""
+    etags = request.if_none_match
+    if etags.is_strong(chave) or etags.is_weak(chave):
+        return True
+    return etags.star_tag and cache_render.cache.contem(chave)
+
+
+def montar_artefato(chave, partes):
+    """
+    O documento inteiro num arquivo temporário (em memória até LIMITE_SPOOL) antes
+    da resposta sair: a ETag só vai com o artefato completo, e um erro no meio
+    vira 500 em vez de um arquivo truncado que o cliente guardaria com uma ETag
+    válida. No caminho, o documento vai para o cache na chave da ETag (se couber).
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=LIMITE_SPOOL)
+    try:
+        for parte in cache_render.guardar_em_partes(cache_render.cache, chave, partes):
+            spool.write(parte)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def responder_api(chave, pedido, grupos):
+    """Artefato do pedido com ETag forte: do cache se já existir, senão renderizado inteiro antes de responder.
+
+    O documento vai para o cache na chave da ETag (até o limite do cache): o
+    próximo pedido igual não renderiza nada. Lotes grandes não viram job: as
+    páginas passam pelo pool em janela (memória constante) e o documento espera
+    num arquivo temporário (montar_artefato). Falhou uma página: 500 em JSON.
+    """
+    formato = pedido['format']
+    mimetype, nome = FORMATOS_API[formato]
+    opcoes_render, opcoes_png = pedido['opcoes'], pedido['opcoes_png']
+    total_paginas = len(grupos)
+
+    try:
+        dados = cache_render.cache.get(chave)
+        if dados is not None:
+            g.paginas_reaproveitadas = Reaproveitamento(total_paginas, range(total_paginas))
+            arquivo = io.BytesIO(dados)
+        elif formato == 'pdf_vetorial':
+            arquivo = montar_artefato(chave, carregar_pdf_vetorial().pdf_em_partes(grupos, **opcoes_render))
+        else:
+            g.paginas_reaproveitadas = reaproveitamento = Reaproveitamento(total_paginas)
+            resultados = iterar_paginas(grupos, formato='PNG', opcoes_formato=opcoes_png, cache=cache_render.cache,
+                                        **opcoes_render)
+            paginas = paginas_validas(resultados, total_paginas, reaproveitamento)
+            if formato == 'png':
+                # A página já foi para o cache na própria chave (que é a ETag)
+                arquivo = io.BytesIO(b''.join(paginas))
+            elif formato == 'pdf':
+                arquivo = montar_artefato(chave, pdf_stream.pdf_em_partes(paginas, dpi=150))
+            else:
+                arquivos = ((f"cartaz_{n:03d}.png", png) for n, png in enumerate(paginas, start=1))
+                arquivo = montar_artefato(chave, carregar_zip_stream().zip_em_partes(arquivos, data_hora=DATA_ZIP_API))
+    except Exception as e:
+        app.logger.error(f"Erro ao gerar o artefato {chave}: {e}", exc_info=True)
+        resposta = jsonify({'erro': f"Erro ao processar: {e}"})
+        resposta.status_code = 500
+        return resposta
+
+    tamanho = arquivo.seek(0, io.SEEK_END)
+    arquivo.seek(0)
+    resposta = send_file(arquivo, as_attachment=formato != 'png', download_name=nome, mimetype=mimetype)
+    resposta.content_length = tamanho
+    resposta.set_etag(chave)
+    return resposta
+
+
+def responder_cabecalhos(chave, pedido, grupos):
+    """Resposta do HEAD: ETag e tipo do artefato, sem renderizar nada (tamanho só se já estiver no cache)."""
+    # Corpo iterável vazio: sem isso o Werkzeug anunciaria Content-Length: 0
+    resposta = Response(iter(()), mimetype=FORMATOS_API[pedido['format']][0])
+    dados = cache_render.cache.get(chave)
+    if dados is not None:
+        resposta.content_length = len(dados)
+    resposta.set_etag(chave)
+    resposta.headers['Location'] = url_for('api_cartaz', chave=chave)
+    resposta.headers['X-Poster-Paginas-Total'] = str(len(grupos))
+    return resposta
+
+
+def responder_nao_modificado(chave):
+    resposta = Response(status=304)
+    resposta.set_etag(chave)
+    resposta.headers['Location'] = url_for('api_cartaz', chave=chave)
+    return resposta
+
+# --- Perfil por requisição ---
+
+@app.before_request
+def iniciar_perfil():
+    g.perfil_token, g.perfil = perfil.iniciar()
+    g.perfil_inicio = time.perf_counter()
+
+
+@app.after_request
+def registrar_perfil(response):
+    """Loga o tempo de cada etapa e, se pedido, devolve no cabeçalho Server-Timing.
+
+    Em respostas em streaming (PDF) os tempos cobrem só o que rodou antes da primeira
+    página ser enviada; o restante acontece depois que a resposta já saiu.
+    """
+    etapas = g.pop('perfil', None)
+    if etapas is None:
+        return response
+    etapas.adicionar('requisicao', time.perf_counter() - g.pop('perfil_inicio'))
+    try:
+        perfil.encerrar(g.pop('perfil_token'))
+    except ValueError:
+        pass  # Token criado em outro contexto (ex.: erro antes do after_request)
+
+    if request.endpoint != 'static':
+        app.logger.info("%s %s etapas=%s", request.method, request.path, etapas.resumo())
+    if SERVER_TIMING or request.headers.get('X-Poster-Timing') == '1':
+        response.headers['Server-Timing'] = etapas.server_timing()
+    return response
+
+def faixas_de_paginas(indices):
+    """[0, 1, 2, 6] -> '1-3,7' (páginas numeradas a partir de 1)."""
+    faixas = []
+    for i in sorted(indices):
+        if faixas and faixas[-1][1] == i - 1:
+            faixas[-1][1] = i
+        else:
+            faixas.append([i, i])
+    return ','.join(f"{a + 1}-{b + 1}" if b > a else f"{a + 1}" for a, b in faixas)
+
+
+@app.after_request
+def informar_reaproveitamento(response):
+    """Cabeçalhos com as páginas que vieram do cache em vez de serem renderizadas de novo.
+
+    Como no Server-Timing, em respostas em streaming os cabeçalhos cobrem só as
+    páginas prontas antes da resposta sair (ver antecipar); o balanço do lote
+    inteiro vai para o log quando a última página sai (paginas_validas).
+    """
+    reaproveitamento = g.pop('paginas_reaproveitadas', None)
+    if reaproveitamento is not None:
+        reaproveitadas = reaproveitamento.reaproveitadas
+        response.headers['X-Poster-Paginas-Total'] = str(reaproveitamento.total)
+        response.headers['X-Poster-Paginas-Reaproveitadas'] = faixas_de_paginas(reaproveitadas) or '-'
+        response.headers['X-Poster-Paginas-Renderizadas'] = str(reaproveitamento.prontas - len(reaproveitadas))
+    return response
 
 # --- Rotas ---
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    # EXEMPLOS FARMACÊUTICOS (Nomes longos para teste)
-    default_offers = [
-        {'produto':'Dipirona Monohidratada 500mg 10 Comp','de':8.99,'por':2.99,'local':'','locale':'pt_BR'},
-        {'produto':'Protetor Solar Facial FPS 70 Toque Seco 50g','de':89.90,'por':59.90,'local':'','locale':'pt_BR'},
-        {'produto':'Fralda Geriátrica Plenitud G 8 Unidades','de':45.50,'por':32.90,'local':'','locale':'pt_BR'},
-        {'produto':'Vitamina C Efervescente 1g Laranja c/ 10','de':19.90,'por':12.49,'local':'','locale':'pt_BR'},
-        {'produto':'Shampoo Anticaspa Intensivo 200ml','de':35.00,'por':27.90,'local':'','locale':'pt_BR'},
-        {'produto':'Kit Creme Dental Leve 3 Pague 2','de':15.90,'por':9.99,'local':'','locale':'pt_BR'},
-    ]
-
     if request.method == 'POST':
-        ofertas = []
-        csv_file = request.files.get('csvfile')
-        
-        # 1. Processar CSV
-        if csv_file and csv_file.filename:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_csv:
-                csv_file.save(tmp_csv.name)
-                tmp_path = tmp_csv.name
-            try:
-                ofertas = parse_csv(tmp_path)
-            finally:
-                if os.path.exists(tmp_path): os.remove(tmp_path)
-        
-        # 2. Processar Manual
-        else:
-            # Lê até 16 produtos manuais (2 páginas cheias)
-            for i in range(1, 17):
-                nome = request.form.get(f'produto_{i}', '').strip()
-                if not nome: continue
-                
-                # Tratamento float no input manual
-                try:
-                    de_str = request.form.get(f'de_{i}', '0').replace(',', '.')
-                    de_val = float(de_str)
-                except ValueError: de_val = 0.0
-                
-                try:
-                    por_str = request.form.get(f'por_{i}', '0').replace(',', '.')
-                    por_val = float(por_str)
-                except ValueError: por_val = 0.0
-                
-                local = request.form.get(f'local_{i}', '')
-                locale = request.form.get(f'locale_{i}', 'pt_BR')
-                ofertas.append({'produto': nome, 'de': de_val, 'por': por_val, 'local': local, 'locale': locale})
-
+        # A pré-visualização só lê (e desenha) a primeira página
+        previa = request.form.get("action") == "preview"
+        ofertas, itens_por_pagina, opcoes_render = ler_formulario(so_primeira_pagina=previa)
         if not ofertas:
             flash("Nenhuma oferta válida encontrada.")
             return redirect(url_for('index'))
 
-        # 3. Paginação e Layout
-        layout_mode = request.form.get('layout_mode', 'list')
-        
-        if layout_mode == 'individual':
-            itens_por_pagina = 1
-        elif layout_mode == 'simple':
-            # Lista simples: pode conter até 12 produtos por página
-            itens_por_pagina = 12
-        elif layout_mode == 'gondola':
-            # Gôndola / cartazete: 8 por página
-            itens_por_pagina = 8
-        else:
-            try:
-                qtd_input = int(request.form.get('qtd_itens', 6))
-                if qtd_input < 2: itens_por_pagina = 2
-                elif qtd_input > 8: itens_por_pagina = 8
-                else: itens_por_pagina = qtd_input
-            except ValueError:
-                itens_por_pagina = 6
-            
-        # Parâmetros visuais
-        vigencia_text = request.form.get('vigencia', '').strip() or None
-        aviso_estoques = request.form.get('estoques', '').strip() or None
-        poster_title = request.form.get('poster_title', 'OFERTAS')
-        
-        # Cores: usa o form, que já foi preenchido pelo JS do tema
-        bg_color = request.form.get('bg_color')
-        text_color = request.form.get('text_color')
-        accent_color = request.form.get('accent_color')
-        badge_color = request.form.get('badge_color')
-
-        # 4. GERAÇÃO EM LOTE E LIMPEZA DE ARQUIVOS
-        files_to_cleanup = []
+        # 4. GERAÇÃO EM LOTE (tudo em memória, sem arquivos temporários)
         try:
-            # Registra uma função para limpar todos os arquivos temporários (PNGs, PDF, ZIP)
-            # depois que a requisição for concluída com sucesso.
-            @after_this_request
-            def cleanup_files(response):
-                for f in files_to_cleanup:
-                    try:
-                        if os.path.exists(f):
-                            os.remove(f)
-                    except Exception as e:
-                        # Idealmente, logar esse erro em um sistema de logging
-                        app.logger.error(f"Falha ao limpar arquivo temporário {f}: {e}")
-                return response
-
-            # Geração das imagens PNG para cada página
-            temp_images = []
-            grupos = list(dividir_lista(ofertas, itens_por_pagina))
-            for grupo in grupos:
-                path = gerar_poster_a_partir_de_lista(
-                    grupo,
-                    vigencia_text=vigencia_text,
-                    aviso_estoques=aviso_estoques,
-                    bg_color=bg_color,
-                    text_color=text_color,
-                    accent_color=accent_color,
-                    badge_color=badge_color,
-                    layout_mode=layout_mode,
-                    poster_title=poster_title,
+            if previa:
+                return responder_previa(next(paginacao.paginar(ofertas, itens_por_pagina, **opcoes_render)),
+                                        opcoes_render)
+
+            grupos = list(paginacao.paginar(ofertas, itens_por_pagina, **opcoes_render))
+            total_paginas = len(grupos)
+            quer_zip = request.form.get("format") == "zip"
+            quer_pdf = not quer_zip and (total_paginas > 1 or request.form.get("format") in ("pdf", "pdf_vetorial"))
+            opcoes_impressao = ler_impressao()
+
+            # ZIP de imagens: em streaming e com memória constante, então não precisa de job
+            if quer_zip:
+                return responder_zip(grupos, opcoes_render, opcoes_impressao)
+
+            # PDF vetorial: sem rasterizar, poucos KB por página e rápido o bastante para
+            # não precisar de job nem de pool. Sem fontTools, segue o PDF rasterizado.
+            if quer_pdf and request.form.get("format") == "pdf_vetorial" and carregar_pdf_vetorial().disponivel():
+                bleed_mm = opcoes_impressao['bleed_mm'] if opcoes_impressao else None
+                return Response(
+                    stream_with_context(carregar_pdf_vetorial().pdf_em_partes(grupos, bleed_mm=bleed_mm, **opcoes_render)),
+                    mimetype='application/pdf',
+                    headers={'Content-Disposition': 'attachment; filename=cartazes_ofertas.pdf'},
+                )
+
+            # Lotes grandes não seguram a requisição: viram um job assíncrono
+            opcoes_png = ler_compacto()
+            if quer_pdf and total_paginas > LIMITE_PAGINAS_SINCRONO:
+                job_id = carregar_jobs().submeter(grupos, opcoes_impressao=opcoes_impressao, opcoes_formato=opcoes_png,
+                                                  **opcoes_render)
+                return redirect(url_for('job_status', job_id=job_id), code=303)
+
+            # Qualidade gráfica: páginas em faixas, direto para o PNG/PDF (memória limitada a qualquer DPI)
+            if opcoes_impressao:
+                if quer_pdf:
+                    partes = carregar_impressao().pdf_em_partes(grupos, **opcoes_render, **opcoes_impressao)
+                    nome, mimetype = "cartazes_ofertas_grafica.pdf", 'application/pdf'
+                else:
+                    partes = carregar_impressao().png_em_partes(grupos[0], **opcoes_render, **opcoes_impressao)
+                    nome, mimetype = "cartaz_ofertas_grafica.png", 'image/png'
+                return Response(
+                    stream_with_context(partes),
+                    mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={nome}'},
+                )
+
+            # PDF já montado para exatamente estas páginas? Serve direto do cache.
+            chave_pdf = None
+            if quer_pdf:
+                chave_pdf = cache_render.chave_documento(
+                    [cache_render.chave_pagina(grupo, 'PNG', opcoes_png, **opcoes_render) for grupo in grupos], 'PDF', dpi=150)
+                pdf_cache = cache_render.cache.get(chave_pdf)
+                if pdf_cache is not None:
+                    g.paginas_reaproveitadas = Reaproveitamento(total_paginas, range(total_paginas))
+                    return send_file(io.BytesIO(pdf_cache), as_attachment=True, download_name="cartazes_ofertas.pdf", mimetype='application/pdf')
+
+            # As páginas são renderizadas em paralelo (pool de processos) quando o lote é grande
+            # e consumidas uma a uma, na ordem, à medida que ficam prontas. Páginas já
+            # renderizadas antes (mesmas ofertas/tema/layout) saem do cache: num CSV reenviado
+            # com alguns preços novos, só as páginas que mudaram são desenhadas de novo.
+            g.paginas_reaproveitadas = reaproveitamento = Reaproveitamento(total_paginas)
+            resultados = iterar_paginas(grupos, formato='PNG', opcoes_formato=opcoes_png, cache=cache_render.cache,
+                                        **opcoes_render)
+            primeiras, paginas = antecipar(paginas_validas(resultados, total_paginas, reaproveitamento))
+            primeira = primeiras[0]
+
+            # 5. Saída (PDF ou PNG)
+            # Se for só 1 página e o usuário pediu PNG
+            if not quer_pdf:
+                buf = io.BytesIO(primeira)
+                return send_file(buf, as_attachment=True, download_name="cartaz_ofertas.png", mimetype='image/png')
+
+            # Se for PDF (ou múltiplas páginas que obrigam PDF): monta o PDF em streaming,
+            # enviando cada página ao cliente assim que é renderizada (memória constante).
+            if pdf_stream.suporta(primeira):
+                partes = cache_render.guardar_em_partes(
+                    cache_render.cache, chave_pdf, pdf_stream.pdf_em_partes(paginas, dpi=150))
+                return Response(
+                    stream_with_context(partes),
+                    mimetype='application/pdf',
+                    headers={'Content-Disposition': 'attachment; filename=cartazes_ofertas.pdf'},
                 )
-                temp_images.append(path)
-            
-            # Adiciona os PNGs gerados à lista de limpeza
-            files_to_cleanup.extend(temp_images)
-
-            # Se for uma pré-visualização, sempre retorna a primeira imagem (PNG)
-            if request.form.get("action") == "preview":
-                # Lê em memória e envia para liberar o arquivo no Windows
-                from io import BytesIO
-                with open(temp_images[0], 'rb') as f:
-                    data = f.read()
-                buf = BytesIO(data)
-                buf.seek(0)
-                return send_file(buf, mimetype='image/png')
-
-            # 5. Saída (PDF, PNG ou ZIP)
-            # Se for só 1 página e o usuário pediu PNG/Preview
-            if len(temp_images) == 1 and request.form.get("format") != "pdf":
-                image_to_send = temp_images[0]
-                if request.form.get("action") == "preview":
-                    from io import BytesIO
-                    with open(image_to_send, 'rb') as f:
-                        data = f.read()
-                    buf = BytesIO(data)
-                    buf.seek(0)
-                    return send_file(buf, mimetype='image/png')
-                # Para download, também envia em memória para permitir remoção do arquivo
-                from io import BytesIO
-                with open(image_to_send, 'rb') as f:
-                    data = f.read()
-                buf = BytesIO(data)
-                buf.seek(0)
-                return send_file(buf, as_attachment=True, download_name=os.path.basename(image_to_send))
-
-            # Se for PDF (ou múltiplas páginas que obrigam PDF)
-            # Tenta gerar PDF primeiro (img2pdf é preferencial pela qualidade)
+
+            # Caminho alternativo (PNG que o escritor em streaming não embute): junta tudo em memória
+            paginas = list(paginas)
+
+            # Tenta img2pdf primeiro (preferencial pela qualidade)
+            img2pdf = carregar_img2pdf()
             if img2pdf:
-                fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
-                os.close(fd)
-                files_to_cleanup.append(pdf_path) # Adiciona à lista de limpeza
-
-                # Converte as imagens e salva no arquivo PDF
-                pdf_bytes = img2pdf.convert(temp_images)
-                with open(pdf_path, "wb") as f:
-                    f.write(pdf_bytes)
-
-                # Envia o PDF em memória para permitir remoção do arquivo no Windows
-                with open(pdf_path, 'rb') as f:
-                    pdf_data = f.read()
-                buf_pdf = io.BytesIO(pdf_data)
-                buf_pdf.seek(0)
+                pdf_bytes = img2pdf.convert(paginas)
+                buf_pdf = io.BytesIO(pdf_bytes)
                 return send_file(buf_pdf, as_attachment=True, download_name="cartazes_ofertas.pdf", mimetype='application/pdf')
 
             # Se img2pdf não estiver disponível, tenta criar PDF com Pillow (PIL)
             try:
                 from PIL import Image
 
-                # Abre imagens e converte para RGB (requisito para salvar em PDF)
-                pil_imgs = [Image.open(p).convert("RGB") for p in temp_images]
-
-                fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
-                os.close(fd)
-                files_to_cleanup.append(pdf_path)
+                # Converte para RGB (requisito para salvar em PDF)
+                pil_imgs = [Image.open(io.BytesIO(png)).convert("RGB") for png in paginas]
 
-                # Salva multipage PDF usando PIL
+                # Salva multipage PDF usando PIL direto no buffer
+                buf_pdf = io.BytesIO()
                 if len(pil_imgs) == 1:
-                    pil_imgs[0].save(pdf_path, format="PDF", resolution=150)
+                    pil_imgs[0].save(buf_pdf, format="PDF", resolution=150)
                 else:
-                    pil_imgs[0].save(pdf_path, format="PDF", save_all=True, append_images=pil_imgs[1:], resolution=150)
-
-                # Envia o PDF em memória para permitir remoção do arquivo no Windows
-                with open(pdf_path, 'rb') as f:
-                    pdf_data = f.read()
-                buf_pdf = io.BytesIO(pdf_data)
+                    pil_imgs[0].save(buf_pdf, format="PDF", save_all=True, append_images=pil_imgs[1:], resolution=150)
                 buf_pdf.seek(0)
                 return send_file(buf_pdf, as_attachment=True, download_name="cartazes_ofertas.pdf", mimetype='application/pdf')
             except Exception:
-                # Último recurso: empacotar imagens em ZIP
-                fd, zip_path = tempfile.mkstemp(suffix=".zip")
-                os.close(fd)
-                files_to_cleanup.append(zip_path)
-
-                with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-                    for img in temp_images:
-                        arcname = os.path.basename(img)
-                        zf.write(img, arcname=arcname)
-
+                # Último recurso: empacotar as imagens em ZIP (sem recomprimir os PNGs)
                 flash("Não foi possível gerar PDF (tentadas img2pdf e PIL) — fornecendo ZIP com as imagens geradas.")
-                # Envia o ZIP em memória
-                with open(zip_path, 'rb') as f:
-                    zip_data = f.read()
-                buf_zip = io.BytesIO(zip_data)
-                buf_zip.seek(0)
-                return send_file(buf_zip, as_attachment=True, download_name="cartazes_ofertas.zip", mimetype='application/zip')
+                arquivos = ((f"cartaz_{n:03d}.png", png) for n, png in enumerate(paginas, start=1))
+                return Response(
+                    stream_with_context(carregar_zip_stream().zip_em_partes(arquivos)),
+                    mimetype='application/zip',
+                    headers={'Content-Disposition': 'attachment; filename=cartazes_ofertas.zip'},
+                )
 
         except Exception as e:
-            # Em caso de erro, faz a limpeza manualmente, pois o hook @after_this_request não será executado.
-            for f in files_to_cleanup:
-                try:
-                    if os.path.exists(f):
-                        os.remove(f)
-                except Exception as e_clean:
-                    app.logger.error(f"Falha ao limpar arquivo temporário {f} durante tratamento de erro: {e_clean}")
-            
             app.logger.error(f"Erro ao processar a geração do poster: {e}", exc_info=True)
             flash(f"Erro ao processar: {str(e)}")
             return redirect(url_for("index"))
 
     defaults = {
-        'offers': default_offers,
+        'offers': DEFAULT_OFFERS,
         'vigencia_default': TEXTO_VIGENCIA,
         'estoque_default': TEXTO_ESTOQUES,
         'margin_default': PRINT_MARGIN,
@@ -340,7 +774,176 @@ def index():
 
     return render_template('index.html', **defaults)
 
+@app.route('/previa/<chave>')
+def previa_completa(chave):
+    """Página da pré-visualização em resolução completa (PNG a 150 DPI), renderizada sob demanda."""
+    if not re.fullmatch(r'[0-9a-f]{64}', chave):
+        return jsonify({'erro': 'Chave inválida.'}), 404
+    dados = cache_render.cache.get(chave)
+    if dados is None:
+        pedido = cache_render.cache.get(cache_render.chave_pedido(chave))
+        if pedido is None:
+            return jsonify({'erro': 'Pré-visualização não encontrada ou expirada.'}), 404
+        pedido = json.loads(pedido)
+        dados = poster_black.renderizar_poster_bytes(pedido['ofertas'], 'PNG', pedido.get('opcoes_png'),
+                                                     **pedido['opcoes'])
+        cache_render.cache.put(chave, dados)
+    return send_file(io.BytesIO(dados), mimetype='image/png')
+
+@app.route('/lotes/lojas', methods=['POST'])
+def lote_lojas():
+    """Um catálogo (csvfile, coluna local) para várias lojas (lojasfile): ZIP com um PDF por loja."""
+    arquivo_lojas = request.files.get('lojasfile')
+    if not arquivo_lojas or not arquivo_lojas.filename:
+        return jsonify({'erro': 'Envie a planilha de lojas (lojasfile).'}), 400
+    ofertas, itens_por_pagina, opcoes_render = ler_formulario()
+    if not ofertas:
+        return jsonify({'erro': 'Nenhuma oferta válida encontrada.'}), 400
+    lojas = carregar_lojas()
+    try:
+        lista_lojas = lojas.ler_lojas(arquivo_lojas.stream)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    if not lista_lojas:
+        return jsonify({'erro': 'Nenhuma loja na planilha (coluna loja).'}), 400
+
+    layout_mode = opcoes_render.pop('layout_mode')
+    formato = 'pdf_vetorial' if request.form.get('format') == 'pdf_vetorial' else 'pdf'
+    resultados = lojas.gerar_lojas(ofertas, lista_lojas, layout_mode, itens_por_pagina, formato, **opcoes_render)
+    return Response(
+        stream_with_context(lojas.zip_em_partes(resultados)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename=cartazes_lojas.zip'},
+    )
+
+@app.route('/jobs', methods=['POST'])
+def job_submeter():
+    """Cria um job assíncrono com os mesmos campos do formulário principal."""
+    ofertas, itens_por_pagina, opcoes_render = ler_formulario()
+    if not ofertas:
+        return jsonify({'erro': 'Nenhuma oferta válida encontrada.'}), 400
+    jobs = carregar_jobs()
+    job_id = jobs.submeter(paginacao.paginar(ofertas, itens_por_pagina, **opcoes_render), opcoes_impressao=ler_impressao(),
+                           opcoes_formato=ler_compacto(), **opcoes_render)
+    resposta = jsonify(_job_json(jobs.status(job_id)))
+    resposta.status_code = 202
+    resposta.headers['Location'] = url_for('job_status', job_id=job_id)
+    return resposta
+
+def _job_json(estado):
+    job_id = estado['id']
+    estado = dict(estado, status_url=url_for('job_status', job_id=job_id))
+    if estado['status'] == carregar_jobs().CONCLUIDO:
+        estado['download_url'] = url_for('job_download', job_id=job_id)
+    return estado
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Progresso do job: status, paginas_feitas / paginas_total.
+
+    Em JSON para clientes de API; o navegador (o formulário redireciona para cá
+    nos lotes grandes) recebe uma página HTML que se atualiza até o download.
+    """
+    jobs = carregar_jobs()
+    jobs.limpar_expirados()
+    estado = jobs.status(job_id)
+    html = request.accept_mimetypes.best_match(['application/json', 'text/html']) == 'text/html'
+    if estado is None:
+        if html:
+            return render_template('job.html', job=None), 404
+        return jsonify({'erro': 'Job não encontrado ou expirado.'}), 404
+    if html:
+        return render_template('job.html', job=_job_json(estado))
+    return jsonify(_job_json(estado))
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+@app.route('/jobs/<job_id>/cancelar', methods=['POST'])
+def job_cancelar(job_id):
+    jobs = carregar_jobs()
+    if not jobs.cancelar(job_id):
+        return jsonify({'erro': 'Job não encontrado ou expirado.'}), 404
+    return jsonify(_job_json(jobs.status(job_id))), 202
+
+@app.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    jobs = carregar_jobs()
+    path = jobs.caminho_artefato(job_id)
+    if path is None:
+        estado = jobs.status(job_id)
+        if estado is None:
+            return jsonify({'erro': 'Job não encontrado ou expirado.'}), 404
+        return jsonify(_job_json(estado)), 409
+    return send_file(path, as_attachment=True, download_name=jobs.ARTEFATO, mimetype='application/pdf')
+
+@app.route('/api/cartazes', methods=['POST', 'HEAD'])
+def api_cartazes():
+    """Renderiza cartazes a partir de JSON (ofertas, tema, layout_mode, format).
+
+    A resposta é determinística e leva uma ETag forte calculada das entradas. Com
+    If-None-Match igual, a resposta é 304 sem renderizar nada (também no POST:
+    o PDV reenvia as ofertas e só baixa quando algo mudou). HEAD com o mesmo corpo
+    devolve só os cabeçalhos. O artefato fica também em GET /api/cartazes/<etag>.
+    """
+    try:
+        pedido = ler_pedido_json(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    grupos = grupos_do_pedido(pedido)
+    if pedido['format'] == 'png' and len(grupos) > 1:
+        return jsonify({'erro': 'format png é só para uma página; use zip ou pdf.'}), 400
+    chave = chave_api(pedido, grupos)
+    if nao_modificado(chave):
+        return responder_nao_modificado(chave)
+    # O pedido fica guardado para GET/HEAD /api/cartazes/<chave> (renderizado só se for buscado)
+    cache_render.cache.put(cache_render.chave_pedido(chave), json.dumps(pedido, ensure_ascii=False).encode('utf-8'))
+    if request.method == 'HEAD':
+        return responder_cabecalhos(chave, pedido, grupos)
+    resposta = responder_api(chave, pedido, grupos)
+    resposta.headers['Location'] = url_for('api_cartaz', chave=chave)
+    return resposta
+
+@app.route('/api/cartazes/<chave>', methods=['GET', 'HEAD'])
+def api_cartaz(chave):
+    """O artefato de um pedido já enviado, pela ETag (cacheável: o conteúdo de uma chave nunca muda)."""
+    if not re.fullmatch(r'[0-9a-f]{64}', chave):
+        return jsonify({'erro': 'Chave inválida.'}), 404
+    if nao_modificado(chave):
+        return responder_nao_modificado(chave)
+    pedido = cache_render.cache.get(cache_render.chave_pedido(chave))
+    if pedido is None:
+        return jsonify({'erro': 'Pedido não encontrado ou expirado: envie de novo para /api/cartazes.'}), 404
+    pedido = json.loads(pedido)
+    if 'format' not in pedido:
+        # Pedido da pré-visualização do formulário: a mesma página em PNG (mesma chave)
+        pedido.update(format='png', itens_por_pagina=len(pedido['ofertas']), opcoes_png=None)
+    grupos = grupos_do_pedido(pedido)
+    if request.method == 'HEAD':
+        resposta = responder_cabecalhos(chave, pedido, grupos)
+    else:
+        resposta = responder_api(chave, pedido, grupos)
+        if resposta.status_code != 200:
+            return resposta
+    resposta.cache_control.no_cache = None  # send_file marca no-cache; o conteúdo da chave não muda
+    resposta.cache_control.public = True
+    resposta.cache_control.max_age = 365 * 24 * 3600
+    resposta.cache_control.immutable = True
+    return resposta
+
+@app.route('/metricas')
+def metricas():
+    """Contadores dos caches (render, fontes, ajuste de texto, planos, glifos e células) em JSON."""
+    return jsonify({
+        'cache_render': cache_render.estatisticas(),
+        'fontes': fontes.estatisticas(),
+        'ajuste_texto': ajuste_texto.estatisticas(),
+        'planos': plano.estatisticas(),
+        'glifos': glifos.estatisticas(),
+        'celulas': celulas.estatisticas(),
+    })
+
+_aquecimento = aquecer_worker() if AQUECER else None
+
 if __name__ == '__main__':
+    if not AQUECER:
+        aquecer_worker()
     app.run(debug=True, port=5050)
-& ".\.venv\Scripts\Activate.ps1"
-& ".\.venv\Scripts\python.exe" app.py
\ No newline at end of file
@@ -0,0 +1,950 @@
+"""
+Benchmarks do gerador de cartazes.
+
+Uso:
+    python bench_poster.py ajuste      # motor de ajuste de texto vs. laço linear antigo
+    python bench_poster.py paralelo    # escala do pool de processos de 1 a N workers
+    python bench_poster.py modelo      # lotes de 100 páginas com/sem camada base (ModeloPagina)
+    python bench_poster.py csv         # ingestão de um catálogo de 100k linhas
+    python bench_poster.py plano       # planos de layout: planejar o catálogo no pool e trocar de tema
+    python bench_poster.py lojas       # lote multi-loja: lojas/min com e sem compartilhar o layout
+    python bench_poster.py vetorial    # PDF vetorial vs. rasterizado: caixas do layout, tamanho e tempo
+    python bench_poster.py cores       # saída compacta (paleta do tema / cinza) vs. RGB: bytes e ms por página
+    python bench_poster.py glifos      # atlas de glifos dos preços vs. draw.text (layout simple, 12 linhas)
+    python bench_poster.py paginacao   # paginação por densidade vs. blocos fixos: páginas e tempo de render
+    python bench_poster.py celulas     # cache de células: ladrilhos por produto num catálogo com SKUs repetidos
+    python bench_poster.py suite       # todos os layouts x tamanhos x DPI: pág/s, pico de RSS e etapas
+    python bench_poster.py importacao  # tempo de importação x orçamento (sai com código 1 se estourar)
+    python bench_poster.py preload     # workers com fork: RSS/PSS/USS e 1ª requisição, com e sem pré-carga
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+try:
+    import resource  # Indisponível no Windows: o pico de RSS fica em branco
+except ImportError:
+    resource = None
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+import ajuste_texto
+import catalogo
+import fontes
+import paginacao
+import perfil
+import plano
+import poster_black
+
+LAYOUTS = ['list', 'simple', 'gondola', 'individual']
+
+
+def caber_texto_legado(draw, text, max_width, max_height, start_font_size, is_bold=True):
+    """Cópia do caber_texto_na_caixa original (laço de 2 em 2px), usada como referência."""
+    size = int(start_font_size)
+    min_size = 14
+    font_path = poster_black.get_font_path(bold=is_bold)
+
+    while size >= min_size:
+        try:
+            font = ImageFont.truetype(font_path, size)
+        except IOError:
+            font = ImageFont.load_default()
+            return [text], font, size, size
+
+        words = text.split()
+        lines = []
+        current_line = []
+        for word in words:
+            test_line = ' '.join(current_line + [word])
+            w_line = draw.textlength(test_line, font=font)
+            if w_line <= max_width:
+                current_line.append(word)
+            else:
+                if current_line:
+                    lines.append(' '.join(current_line))
+                current_line = [word]
+        if current_line:
+            lines.append(' '.join(current_line))
+
+        line_height = size * 1.15
+        total_block_height = len(lines) * line_height
+        if total_block_height <= max_height:
+            return lines, font, total_block_height, line_height
+        size -= 2
+
+    return [text[:30] + "..."], font, total_block_height, line_height
+
+
+def ofertas_exemplo():
+    """As ofertas farmacêuticas padrão do formulário (app.DEFAULT_OFFERS)."""
+    from app import DEFAULT_OFFERS
+    return [dict(o) for o in DEFAULT_OFFERS]
+
+
+def _render(ofertas, layout_mode, **kwargs):
+    path = poster_black.gerar_poster_a_partir_de_lista(ofertas, layout_mode=layout_mode, **kwargs)
+    try:
+        with Image.open(path) as img:
+            img.load()
+            return img
+    finally:
+        os.remove(path)
+
+
+def _mesmos_pixels(a, b):
+    return a.size == b.size and ImageChops.difference(a, b).getbbox() is None
+
+
+def _limpar_caches():
+    fontes.registro.limpar()
+    ajuste_texto.motor.limpar()
+
+
+def bench_ajuste(args):
+    """Compara o laço linear antigo com o motor de ajuste nos layouts com as ofertas padrão."""
+    ofertas = ofertas_exemplo()
+    novo = poster_black.caber_texto_na_caixa
+    print(f"{'layout':<12}{'legado ms':>12}{'frio ms':>12}{'quente ms':>12}{'speedup':>10}  pixels")
+    for layout in LAYOUTS:
+        grupo = ofertas[:1] if layout == 'individual' else ofertas
+
+        poster_black.caber_texto_na_caixa = caber_texto_legado
+        try:
+            t0 = time.perf_counter()
+            for _ in range(args.repeticoes):
+                ref = _render(grupo, layout)
+            t_legado = (time.perf_counter() - t0) / args.repeticoes
+        finally:
+            poster_black.caber_texto_na_caixa = novo
+
+        _limpar_caches()
+        t0 = time.perf_counter()
+        img = _render(grupo, layout)
+        t_frio = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeticoes):
+            img = _render(grupo, layout)
+        t_quente = (time.perf_counter() - t0) / args.repeticoes
+
+        iguais = 'iguais' if _mesmos_pixels(ref, img) else 'DIFERENTES'
+        print(f"{layout:<12}{t_legado * 1000:>12.1f}{t_frio * 1000:>12.1f}{t_quente * 1000:>12.1f}"
+              f"{t_legado / t_quente:>9.1f}x  {iguais}")
+
+    # Só o ajuste de texto, isolado do desenho e do PNG
+    draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+    W = int((210 * 150) / 25.4)
+    nomes = [o['produto'].upper() for o in ofertas]
+    t0 = time.perf_counter()
+    for _ in range(args.repeticoes):
+        for nome in nomes:
+            caber_texto_legado(draw, nome, W * 0.5, W * 0.08, W * 0.10)
+    t_legado = time.perf_counter() - t0
+    _limpar_caches()
+    t0 = time.perf_counter()
+    for nome in nomes:
+        novo(draw, nome, W * 0.5, W * 0.08, W * 0.10)
+    t_frio = time.perf_counter() - t0
+    print(f"\najuste isolado ({len(nomes)} nomes x {args.repeticoes}): "
+          f"legado {t_legado * 1000:.1f} ms | motor frio {t_frio * 1000:.1f} ms por passada | "
+          f"cache {ajuste_texto.estatisticas()} | fontes {fontes.estatisticas()}")
+
+
+def catalogo_sintetico(qtd):
+    """Catálogo de farmácia com `qtd` itens, repetindo/variando as ofertas padrão."""
+    base = ofertas_exemplo()
+    ofertas = []
+    for i in range(qtd):
+        o = dict(base[i % len(base)])
+        o['produto'] = f"{o['produto']} Lote {i // len(base) + 1}"
+        ofertas.append(o)
+    return ofertas
+
+
+def bench_paralelo(args):
+    """Renderiza um CSV grande (gôndola, 8 por página) com 1..N workers."""
+    import render_paralelo
+    from catalogo import dividir_lista
+
+    ofertas = catalogo_sintetico(args.itens)
+    grupos = list(dividir_lista(ofertas, 8))
+    max_workers = args.max_workers or (os.cpu_count() or 1)
+    print(f"{len(ofertas)} itens -> {len(grupos)} páginas (gondola), CPUs: {os.cpu_count()}")
+    print(f"{'workers':>8}{'segundos':>12}{'pág/s':>10}{'escala':>9}")
+    base_t = None
+    for workers in range(1, max_workers + 1):
+        if workers > 1:
+            # Aquece o pool antes de medir (o servidor reaproveita o pool entre requisições)
+            render_paralelo.renderizar_paginas(grupos[:workers * 2], workers=workers, layout_mode='gondola')
+        t0 = time.perf_counter()
+        resultados = render_paralelo.renderizar_paginas(grupos, workers=workers, layout_mode='gondola')
+        dt = time.perf_counter() - t0
+        assert not render_paralelo.erros(resultados)
+        base_t = base_t or dt
+        print(f"{workers:>8}{dt:>12.2f}{len(grupos) / dt:>10.1f}{base_t / dt:>8.2f}x")
+    render_paralelo.encerrar_pool()
+
+
+def bench_modelo(args):
+    """Lote de N páginas por layout: camada base reaproveitada vs. página desenhada do zero."""
+    print(f"{args.paginas} páginas por layout (só desenho, sem codificar PNG)")
+    print(f"{'layout':<12}{'do zero s':>12}{'modelo s':>12}{'speedup':>10}")
+    for layout in LAYOUTS:
+        por_pagina = poster_black.ITENS_POR_PAGINA[layout]
+        ofertas = catalogo_sintetico(args.paginas * por_pagina)
+        grupos = [ofertas[i:i + por_pagina] for i in range(0, len(ofertas), por_pagina)]
+        poster_black.aquecer([layout])
+
+        t0 = time.perf_counter()
+        for grupo in grupos:
+            poster_black.obter_modelo.cache_clear()  # Simula o fluxo antigo: fundo/cabeçalho/rodapé a cada página
+            poster_black.renderizar_poster(grupo, layout_mode=layout)
+        t_zero = time.perf_counter() - t0
+
+        poster_black.obter_modelo.cache_clear()
+        t0 = time.perf_counter()
+        for grupo in grupos:
+            poster_black.renderizar_poster(grupo, layout_mode=layout)
+        t_modelo = time.perf_counter() - t0
+        print(f"{layout:<12}{t_zero:>12.2f}{t_modelo:>12.2f}{t_zero / t_modelo:>9.2f}x")
+
+
+TEMAS = (
+    {},
+    {'bg_color': '#ffffff', 'text_color': '#c00000', 'accent_color': '#000000', 'badge_color': '#0000c0'},
+)
+
+
+def bench_plano(args):
+    """Planos do catálogo calculados no pool; depois cada tema só executa os planos."""
+    import render_paralelo
+    plano.planos = plano.CachePlanos()  # Só memória: o disco compartilhado esconderia o custo de planejar
+    print(f"{args.paginas} páginas por layout, {len(TEMAS)} temas (só desenho, sem codificar PNG)")
+    print(f"{'layout':<12}{'planejar s':>12}{'sem plano s':>13}{'com plano s':>13}{'JSON/pág KB':>13}")
+    for layout in LAYOUTS:
+        grupos = _grupos(catalogo_sintetico(args.paginas * poster_black.ITENS_POR_PAGINA[layout]), poster_black.ITENS_POR_PAGINA[layout])
+        poster_black.aquecer([layout])
+
+        # Referência: cada página de cada tema calcula o layout de novo
+        t0 = time.perf_counter()
+        for tema in TEMAS:
+            for grupo in grupos:
+                plano.planos.limpar()
+                poster_black.renderizar_poster(grupo, layout_mode=layout, **tema)
+        t_sem = time.perf_counter() - t0
+
+        plano.planos.limpar()
+        t0 = time.perf_counter()
+        planos = render_paralelo.planejar_catalogo(grupos, args.workers or None, layout)
+        t_planejar = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for tema in TEMAS:
+            for grupo in grupos:
+                poster_black.renderizar_poster(grupo, layout_mode=layout, **tema)
+        t_com = time.perf_counter() - t0
+
+        kb = sum(len(plano.para_json(p)) for p in planos) / len(planos) / 1024
+        print(f"{layout:<12}{t_planejar:>12.2f}{t_sem:>13.2f}{t_com:>13.2f}{kb:>13.1f}")
+
+
+def bench_lojas(args):
+    """Lojas/min do lote multi-loja vs. gerar cada loja isolada (layout recalculado por loja)."""
+    import cache_render
+    import lojas
+
+    # Sem cache de páginas: mede o trabalho de verdade, não o disco
+    cache_render.cache = cache_render.CacheRender(max_memoria=0, max_disco=0)
+    plano.planos = plano.CachePlanos()
+    temas = sorted(poster_black.TEMAS)
+    lista = [lojas.Loja(f"Loja {i:03d}", {f"{k}_color": v for k, v in poster_black.TEMAS[temas[i % len(temas)]].items()})
+             for i in range(args.lojas)]
+    ofertas = catalogo_sintetico(args.paginas * poster_black.ITENS_POR_PAGINA['gondola'])
+    grupos = _grupos(ofertas, poster_black.ITENS_POR_PAGINA['gondola'])
+    print(f"{args.lojas} lojas x {len(grupos)} páginas (gondola), formato {args.formato}")
+    poster_black.aquecer(['gondola'])
+
+    t0 = time.perf_counter()
+    for loja in lista:
+        plano.planos.limpar()
+        ajuste_texto.motor.limpar()
+        lojas.gerar_pdf(grupos, args.formato, layout_mode='gondola', **loja.opcoes_render)
+    t_isoladas = time.perf_counter() - t0
+
+    plano.planos.limpar()
+    ajuste_texto.motor.limpar()
+    t0 = time.perf_counter()
+    for r in lojas.gerar_lojas(ofertas, lista, 'gondola', formato=args.formato, workers=args.workers or None):
+        assert r.erro is None, r.erro
+    t_lote = time.perf_counter() - t0
+    print(f"{'isoladas':<10}{t_isoladas:>8.2f}s{args.lojas / t_isoladas * 60:>10.0f} lojas/min")
+    print(f"{'lote':<10}{t_lote:>8.2f}s{args.lojas / t_lote * 60:>10.0f} lojas/min  ({t_isoladas / t_lote:.2f}x)")
+
+
+def parse_csv_legado(filepath):
+    """Cópia do parse_csv original (DictReader + list + replace encadeado), usada como referência."""
+    import csv
+    ofertas = []
+    csv_data = []
+    for encoding in ['utf-8-sig', 'latin-1']:
+        try:
+            with open(filepath, newline='', encoding=encoding) as csvfile:
+                csv_data = list(csv.DictReader(csvfile))
+            break
+        except UnicodeDecodeError:
+            continue
+    for row in csv_data:
+        row = {k.lower(): v for k, v in row.items() if k}
+        try:
+            de_val = float(str(row.get('de', '0')).replace('R$', '').replace(' ', '').replace(',', '.'))
+        except ValueError:
+            de_val = 0.0
+        try:
+            por_val = float(str(row.get('por', '0')).replace('R$', '').replace(' ', '').replace(',', '.'))
+        except ValueError:
+            por_val = 0.0
+        ofertas.append({
+            'produto': row.get('produto', '').strip(),
+            'de': de_val,
+            'por': por_val,
+            'local': row.get('local', '').strip(),
+            'locale': row.get('locale', 'pt_BR').strip() or 'pt_BR'
+        })
+    return ofertas
+
+
+def escrever_catalogo_csv(path, linhas, latin1_no_fim=False):
+    """CSV sintético de farmácia com preços no formato "R$ 1.234,56"."""
+    import csv
+    base = ofertas_exemplo()
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['Produto', 'DE', 'POR', 'Local'])
+        for i in range(linhas):
+            o = base[i % len(base)]
+            de = o['de'] * (1 + (i % 30))
+            por = o['por'] * (1 + (i % 7))
+            w.writerow([f"{o['produto']} {i}", f"R$ {de:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'),
+                        f"{por:.2f}".replace('.', ','), f"Loja {i % 50}"])
+    if latin1_no_fim:
+        with open(path, 'ab') as f:
+            f.write('Sabonete Glicerinado Ação,"R$ 3,50","2,99",Loja 1\n'.encode('latin-1'))
+
+
+def bench_csv(args):
+    """parse_csv antigo vs. ingestão em streaming do catalogo.py."""
+    import tempfile
+    import catalogo
+
+    path = os.path.join(tempfile.gettempdir(), f"bench_catalogo_{args.linhas}.csv")
+    escrever_catalogo_csv(path, args.linhas, latin1_no_fim=True)
+    print(f"{args.linhas} linhas ({os.path.getsize(path) / 1e6:.1f} MB), com um byte latin-1 na última linha")
+
+    t0 = time.perf_counter()
+    legado = parse_csv_legado(path)
+    t_legado = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    novo = catalogo.parse_csv(path)
+    t_novo = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    primeira_pagina = next(catalogo.dividir_lista(catalogo.iter_ofertas(path), 8))
+    t_primeira = time.perf_counter() - t0
+
+    precos_br = sum(1 for o in legado if o['de'] == 0.0) - sum(1 for o in novo if o['de'] == 0.0)
+    print(f"legado: {t_legado:.2f} s | streaming: {t_novo:.2f} s ({t_legado / t_novo:.1f}x) | "
+          f"primeira página pronta em {t_primeira * 1000:.1f} ms ({len(primeira_pagina)} ofertas)")
+    print(f"preços 'R$ 1.234,56' que o parser antigo zerava e agora são lidos: {precos_br}")
+    os.remove(path)
+
+
+class _GravadorCaixas:
+    """ImageDraw que anota as caixas (tipo, conteúdo, x0, y0, x1, y1) de tudo que desenha."""
+
+    def __init__(self, draw):
+        self.draw = draw
+        self.caixas = []
+
+    def __getattr__(self, nome):
+        return getattr(self.draw, nome)
+
+    def text(self, xy, text, font=None, **kwargs):
+        if text:
+            largura = self.draw.textlength(text, font=font)
+            self.caixas.append(('text', text, (xy[0], xy[1], xy[0] + largura, xy[1] + font.getmetrics()[0])))
+        self.draw.text(xy, text, font=font, **kwargs)
+
+    def rectangle(self, xy, fill=None, **kwargs):
+        x0, y0, x1, y1 = (int(v) for v in xy)
+        self.caixas.append(('rectangle', fill, (x0, y0, x1 + 1, y1 + 1)))
+        self.draw.rectangle(xy, fill=fill, **kwargs)
+
+    def line(self, xy, fill=None, width=1):
+        x0, y0, x1, y1 = xy
+        self.caixas.append(('line', fill, (x0, y0 - width / 2, x1, y1 + width / 2)))
+        self.draw.line(xy, fill=fill, width=width)
+
+
+def _caixas_iguais(a, b, tolerancia=0.5):
+    if len(a) != len(b):
+        return False
+    for (tipo_a, cont_a, caixa_a), (tipo_b, cont_b, caixa_b) in zip(a, b):
+        if tipo_a != tipo_b or cont_a != cont_b:
+            return False
+        if any(abs(p - q) > tolerancia for p, q in zip(caixa_a, caixa_b)):
+            return False
+    return True
+
+
+def _caixas_raster(grupo, layout):
+    """Caixas de tudo que o modo imagem desenha na página (base, fundos do layout e produtos)."""
+    modelo = poster_black.obter_modelo()
+    gravador = _GravadorCaixas(ImageDraw.Draw(Image.new('RGB', modelo.tamanho)))
+    modelo.desenhar_base(gravador)
+    poster_black.desenhar_fundo_layout(gravador, layout, len(grupo),
+                                       modelo.W, modelo.margin, modelo.y_start, modelo.y_end)
+    modelo.desenhar_produtos(gravador, grupo, layout)
+    return gravador.caixas
+
+
+def bench_vetorial(args):
+    """
+    Paridade de layout (cada texto/retângulo/linha do PDF vetorial na mesma caixa
+    do modo imagem, tolerância de 0,5 px) e tamanho/tempo contra o PDF rasterizado.
+    """
+    import pdf_stream
+    import pdf_vetorial
+    import render_paralelo
+
+    if not pdf_vetorial.disponivel():
+        print("fontTools não instalado: PDF vetorial indisponível")
+        return 1
+
+    print(f"{'layout':<12}{'págs':>6}{'paridade':>10}{'raster s':>10}{'vetor s':>9}{'raster KB':>11}{'vetor KB':>10}")
+    falhas = 0
+    for layout in LAYOUTS:
+        por_pagina = poster_black.ITENS_POR_PAGINA[layout]
+        grupos = _grupos(catalogo_sintetico(args.paginas * por_pagina), por_pagina)
+
+        iguais = True
+        for grupo in grupos:
+            vetor = pdf_vetorial.desenhar_pagina(grupo, layout_mode=layout)
+            # O vetorial começa pelo retângulo do fundo (no modo imagem é a cor de criação)
+            iguais = iguais and _caixas_iguais(_caixas_raster(grupo, layout), vetor.caixas[1:])
+        falhas += not iguais
+
+        t0 = time.perf_counter()
+        resultados = render_paralelo.renderizar_paginas(grupos, workers=1, layout_mode=layout)
+        raster = pdf_stream.montar_pdf([r.dados for r in resultados])
+        t_raster = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        vetorial = pdf_vetorial.montar_pdf(grupos, layout_mode=layout)
+        t_vetor = time.perf_counter() - t0
+        print(f"{layout:<12}{len(grupos):>6}{'ok' if iguais else 'DIFERENTE':>10}{t_raster:>10.2f}{t_vetor:>9.2f}"
+              f"{len(raster) / 1024:>11.0f}{len(vetorial) / 1024:>10.0f}")
+    return 1 if falhas else 0
+
+
+# Temas do bench de cores: os do app e um só de cinzas (sai em 'L')
+TEMAS_CORES = dict(
+    {nome: {'bg_color': t['bg'], 'text_color': t['text'], 'accent_color': t['accent'], 'badge_color': t['badge']}
+     for nome, t in poster_black.TEMAS.items()},
+    cinza={'bg_color': '#ffffff', 'text_color': '#000000', 'accent_color': '#404040', 'badge_color': '#000000'},
+)
+
+
+def bench_cores(args):
+    """
+    Por tema: PNG RGB (atual) vs. saída compacta (paleta fixa do tema ou cinza) vs.
+    paleta adaptativa. Mede KB e ms de codificação por página, o tempo de embutir
+    no PDF e o maior erro de pixel em relação ao RGB.
+    """
+    import io
+    import pdf_stream
+
+    modos = {
+        'rgb': {},
+        'compacto': {'compacto': True},
+        f'paleta {poster_black.CORES_PALETA}': {'paleta': poster_black.CORES_PALETA},
+    }
+    por_pagina = poster_black.ITENS_POR_PAGINA[args.layout]
+    grupos = _grupos(catalogo_sintetico(args.paginas * por_pagina), por_pagina)
+    print(f"{len(grupos)} páginas '{args.layout}' a {args.dpi or 150} DPI, PNG nível {args.nivel} (só codificação)")
+    print(f"{'tema':<13}{'modo':<12}{'modo PIL':>9}{'KB/pág':>9}{'ms/pág':>9}{'PDF ms/pág':>12}{'erro máx':>10}")
+    for nome, tema in TEMAS_CORES.items():
+        cores = poster_black.cores_da_pagina(**tema)
+        imagens = [poster_black.renderizar_poster(g, layout_mode=args.layout, dpi=args.dpi, **tema) for g in grupos]
+        for modo, opcoes in modos.items():
+            opcoes = dict(opcoes, compress_level=args.nivel)
+            compacto = opcoes.pop('compacto', False)
+            t0 = time.perf_counter()
+            pngs = []
+            for img in imagens:
+                if compacto:
+                    img = poster_black.compactar(img, cores)
+                pngs.append(poster_black.codificar_imagem(img, 'PNG', **opcoes))
+            t_cod = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            pdf_stream.montar_pdf(pngs, dpi=args.dpi or 150)
+            t_pdf = time.perf_counter() - t0
+
+            with Image.open(io.BytesIO(pngs[0])) as png:
+                modo_pil = png.mode
+                diferenca = ImageChops.difference(imagens[0], png.convert('RGB'))
+            erro = max(hi for _, hi in diferenca.getextrema())
+            n = len(pngs)
+            print(f"{nome:<13}{modo:<12}{modo_pil:>9}{sum(map(len, pngs)) / n / 1024:>9.0f}{t_cod / n * 1000:>9.1f}"
+                  f"{t_pdf / n * 1000:>12.1f}{erro:>10}")
+
+
+def bench_glifos(args):
+    """
+    Atlas de glifos vs. draw.text, com os planos já prontos (só desenho). Mede os
+    textos de preço do plano isolados e a página inteira, e confere os pixels.
+    """
+    import glifos
+    por_pagina = poster_black.ITENS_POR_PAGINA[args.layout]
+    grupos = _grupos(catalogo_sintetico(args.paginas * por_pagina), por_pagina)
+    planos = [poster_black.obter_plano(g, layout_mode=args.layout, dpi=args.dpi) for g in grupos]
+    precos = [op for p in planos for op in p.base + p.fundos + p.produtos
+              if op[0] == 'texto' and glifos.CARACTERES.issuperset(op[3])]
+    tela = Image.new('RGB', planos[0].tamanho)
+    cores = {'fundo': poster_black.DEFAULT_BG, 'texto': poster_black.DEFAULT_TEXT,
+             'destaque': poster_black.DEFAULT_ACCENT, 'selo': poster_black.BADGE_COLOR}
+    print(f"{len(grupos)} páginas '{args.layout}' a {args.dpi or 150} DPI, "
+          f"{len(precos)} textos de preço, {args.repeticoes} repetições (melhor tempo)")
+    print(f"{'modo':<10}{'preços ms/pág':>15}{'µs/texto':>10}{'página ms':>11}")
+
+    def medir(funcao):
+        melhor = float('inf')
+        for _ in range(args.repeticoes):
+            t0 = time.perf_counter()
+            funcao()
+            melhor = min(melhor, time.perf_counter() - t0)
+        return melhor
+
+    resultados = {}
+    for modo, ativo in (('draw.text', False), ('atlas', True)):
+        glifos.atlas.ativo = ativo
+        glifos.atlas.limpar()
+        plano.executar(precos, ImageDraw.Draw(tela), cores)  # Aquece fontes e atlas
+        t_precos = medir(lambda: plano.executar(precos, ImageDraw.Draw(tela), cores))
+        paginas = []
+        t_pagina = medir(lambda: paginas.__setitem__(slice(None), [
+            poster_black.renderizar_poster(g, layout_mode=args.layout, dpi=args.dpi) for g in grupos]))
+        resultados[modo] = paginas
+        n = len(grupos)
+        print(f"{modo:<10}{t_precos / n * 1000:>15.2f}{t_precos / len(precos) * 1e6:>10.0f}{t_pagina / n * 1000:>11.1f}")
+    glifos.atlas.ativo = glifos.ATIVO
+    iguais = all(map(_mesmos_pixels, resultados['draw.text'], resultados['atlas']))
+    print(f"pixels idênticos: {'sim' if iguais else 'NÃO'}; atlas: {glifos.estatisticas()}")
+
+
+# Peças do catálogo de farmácia realista: nomes curtos (marca + apresentação) a bem longos
+PRODUTOS_FARMACIA = [
+    'Dorflex', 'Neosaldina', 'Buscopan Composto', 'Dipirona Monohidratada', 'Paracetamol', 'Ibuprofeno',
+    'Omeprazol', 'Losartana Potássica', 'Loratadina', 'Nimesulida', 'Dramin B6', 'Engov', 'Eno Sal de Fruta',
+    'Vitamina C Efervescente', 'Vitamina D3', 'Polivitamínico A-Z', 'Colágeno Hidrolisado em Pó',
+    'Protetor Solar Facial FPS 50 Toque Seco Antioleosidade', 'Protetor Solar Corporal FPS 30',
+    'Shampoo Anticaspa', 'Condicionador Reconstrução Intensiva', 'Sabonete Líquido Antibacteriano',
+    'Hidratante Corporal Pele Extrasseca', 'Desodorante Aerosol Antitranspirante 48h', 'Creme Dental',
+    'Escova Dental Macia', 'Fio Dental', 'Enxaguante Bucal Sem Álcool', 'Álcool em Gel 70%',
+    'Fralda Geriátrica Plenitud', 'Fralda Infantil Pampers Confort Sec', 'Lenço Umedecido', 'Absorvente Noturno',
+    'Termômetro Digital', 'Curativo Adesivo', 'Soro Fisiológico 0,9%', 'Colírio Lubrificante', 'Leite de Magnésia',
+]
+APRESENTACOES_FARMACIA = ['500mg 10 Comp', '1g 20 Comp', '20mg 28 Cáps', '50mg 30 Comp', '200ml', '400ml',
+                          '120g', '50g', 'c/ 10', 'G c/ 8', 'Leve 3 Pague 2', '', '']
+MARCAS_FARMACIA = ['EMS', 'Medley', 'Neo Química', 'Genérico', 'Nivea', 'Colgate', '', '', '', '']
+
+
+def catalogo_farmacia(qtd, semente=1):
+    """Catálogo de farmácia com nomes de tamanhos variados (repetível pela semente)."""
+    rnd = random.Random(semente)
+    ofertas = []
+    for _ in range(qtd):
+        nome = ' '.join(filter(None, (rnd.choice(PRODUTOS_FARMACIA), rnd.choice(APRESENTACOES_FARMACIA),
+                                      rnd.choice(MARCAS_FARMACIA))))
+        por = round(rnd.uniform(2, 150), 2)
+        de = round(por * rnd.choice((1, 1.1, 1.25, 1.5)), 2)
+        ofertas.append({'produto': nome, 'de': de, 'por': por, 'local': '', 'locale': 'pt_BR'})
+    return ofertas
+
+
+def bench_paginacao(args):
+    """
+    Paginação por densidade ('auto') vs. blocos fixos num catálogo de farmácia:
+    páginas, tempo de empacotar (só métricas de texto) e de renderizar todas as
+    páginas em PNG (um processo, cache de páginas fora do caminho).
+    """
+    ofertas = catalogo_farmacia(args.itens, args.semente)
+    print(f"{len(ofertas)} ofertas, nomes de {min(len(o['produto']) for o in ofertas)} a "
+          f"{max(len(o['produto']) for o in ofertas)} caracteres, {args.dpi or 150} DPI")
+    print(f"{'layout':<9}{'modo':<7}{'páginas':>9}{'itens/pág':>11}{'empacotar ms':>14}{'render s':>10}"
+          f"{'PNG MB':>8}{'economia':>10}")
+    for layout in args.layouts.split(','):
+        referencia = None
+        for modo in ('fixo', paginacao.AUTO):
+            _limpar_caches()
+            plano.planos.limpar()
+            t0 = time.perf_counter()
+            grupos = list(paginacao.paginar(ofertas, modo if modo == paginacao.AUTO else None,
+                                            layout_mode=layout, dpi=args.dpi))
+            t_empacotar = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            tamanho = sum(len(poster_black.renderizar_poster_bytes(g, 'PNG', layout_mode=layout, dpi=args.dpi))
+                          for g in grupos)
+            t_render = time.perf_counter() - t0
+
+            referencia = referencia or (len(grupos), t_render)
+            economia = (f"{1 - len(grupos) / referencia[0]:.0%} pág, {1 - t_render / referencia[1]:.0%} tempo"
+                        if modo == paginacao.AUTO else '')
+            print(f"{layout:<9}{modo:<7}{len(grupos):>9}{len(ofertas) / len(grupos):>11.1f}"
+                  f"{t_empacotar * 1000:>14.1f}{t_render:>10.2f}{tamanho / 1e6:>8.1f}  {economia}")
+
+
+def bench_celulas(args):
+    """
+    Cache de células num catálogo que repete SKUs (--itens ofertas sorteadas de
+    --skus produtos), com os planos já prontos: desenho direto, com ladrilhos a
+    frio e de novo com o cache cheio (reimpressão). Confere os pixels.
+    """
+    import celulas
+    rnd = random.Random(args.semente)
+    ofertas = rnd.choices(catalogo_farmacia(args.skus, args.semente), k=args.itens)
+    print(f"{len(ofertas)} ofertas de {args.skus} SKUs, {args.dpi or 150} DPI, "
+          f"limite {celulas.cache.max_bytes / 2**20:.0f} MB")
+    print(f"{'layout':<9}{'modo':<11}{'páginas':>9}{'ms/pág':>9}{'acertos':>9}{'diretas':>9}"
+          f"{'ladrilhos':>11}{'MB':>7}")
+    for layout in args.layouts.split(','):
+        grupos = _grupos(ofertas, poster_black.ITENS_POR_PAGINA[layout])
+        modelo = poster_black.obter_modelo(dpi=args.dpi)
+        for g in grupos:
+            poster_black.obter_plano(g, layout_mode=layout, dpi=args.dpi)  # Só o desenho entra no tempo
+        celulas.cache.limpar()
+        resultados = {}
+        for modo, ativo in (('direto', False), ('ladrilhos', True), ('reimpressão', True)):
+            celulas.cache.ativo = ativo
+            antes = celulas.estatisticas()
+            t, resultados[modo] = 0.0, []
+            for g in grupos:
+                t0 = time.perf_counter()
+                img = modelo.renderizar(g, layout)
+                t += time.perf_counter() - t0
+                resultados[modo].append(hashlib.sha256(img.tobytes()).digest())  # Páginas inteiras não cabem na memória
+            stats = celulas.estatisticas()
+            consultas = stats['hits'] + stats['misses'] - antes['hits'] - antes['misses']
+            acertos = f"{(stats['hits'] - antes['hits']) / consultas:.0%}" if consultas else '-'
+            print(f"{layout:<9}{modo:<11}{len(grupos):>9}{t / len(grupos) * 1000:>9.1f}{acertos:>9}"
+                  f"{stats['diretas'] - antes['diretas']:>9}{stats['ladrilhos']:>11}{stats['bytes'] / 2**20:>7.1f}")
+        celulas.cache.ativo = celulas.ATIVO
+        iguais = resultados['direto'] == resultados['ladrilhos'] == resultados['reimpressão']
+        print(f"{layout:<9}pixels idênticos: {'sim' if iguais else 'NÃO'}")
+
+
+def _grupos(ofertas, por_pagina):
+    return [ofertas[i:i + por_pagina] for i in range(0, len(ofertas), por_pagina)]
+
+
+def pico_rss_mb():
+    """Pico de memória residente do processo atual em MB (None se não der para medir)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def bench_caso(args):
+    """Um caso da suíte (rodado em subprocesso para o pico de RSS ser só dele). Imprime JSON."""
+    import pdf_stream
+    import render_paralelo
+    from catalogo import dividir_lista
+
+    por_pagina = poster_black.ITENS_POR_PAGINA[args.layout]
+    grupos = list(dividir_lista(catalogo_sintetico(args.paginas * por_pagina), por_pagina))
+    with perfil.coletar() as etapas:
+        t0 = time.perf_counter()
+        resultados = render_paralelo.iterar_paginas(
+            grupos, workers=1, formato='PNG', layout_mode=args.layout, dpi=args.dpi)
+        tamanho = 0
+        for parte in pdf_stream.pdf_em_partes((r.dados for r in resultados), dpi=args.dpi):
+            tamanho += len(parte)
+        dt = time.perf_counter() - t0
+    print(json.dumps({
+        'layout': args.layout, 'paginas': len(grupos), 'dpi': args.dpi,
+        'segundos': dt, 'pdf_mb': tamanho / 1e6, 'rss_mb': pico_rss_mb(),
+        'etapas': etapas.resumo(),
+    }))
+
+
+def bench_suite(args):
+    """Todos os layouts contra catálogos crescentes em cada DPI, um subprocesso por caso."""
+    tamanhos = [int(x) for x in args.paginas.split(',')]
+    dpis = [int(x) for x in args.dpi.split(',')]
+    etapas_vistas = ['desenho', 'ajuste_texto', 'fontes', 'codificacao', 'pdf']
+    print(f"{'layout':<12}{'págs':>6}{'dpi':>5}{'seg':>8}{'pág/s':>8}{'RSS MB':>8}{'PDF MB':>8}  "
+          + ' '.join(f"{e + ' ms':>14}" for e in etapas_vistas))
+    casos = []
+    for layout in LAYOUTS:
+        for dpi in dpis:
+            for paginas in tamanhos:
+                saida = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), 'caso',
+                     '--layout', layout, '--paginas', str(paginas), '--dpi', str(dpi)],
+                    check=True, capture_output=True, text=True).stdout
+                caso = json.loads(saida.strip().splitlines()[-1])
+                casos.append(caso)
+                rss = f"{caso['rss_mb']:.0f}" if caso['rss_mb'] is not None else '-'
+                tempos = ' '.join(f"{caso['etapas'].get(e, (0.0, 0))[0]:>14.1f}" for e in etapas_vistas)
+                print(f"{layout:<12}{caso['paginas']:>6}{dpi:>5}{caso['segundos']:>8.2f}"
+                      f"{caso['paginas'] / caso['segundos']:>8.1f}{rss:>8}{caso['pdf_mb']:>8.1f}  {tempos}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(casos, f, indent=2)
+        print(f"\nresultados gravados em {args.json}")
+
+
+# Orçamento de importação (ms, mediana de processos novos) e backends que não podem
+# ser carregados já na importação (são importados sob demanda)
+ORCAMENTO_IMPORTACAO_MS = {'poster_black': 120, 'cartazes': 150, 'app': 350}
+PROIBIDOS_NA_IMPORTACAO = {
+    'poster_black': ('flask', 'fontTools', 'img2pdf'),
+    'cartazes': ('flask', 'fontTools', 'img2pdf'),
+    'app': ('fontTools', 'img2pdf', 'pdf_vetorial', 'impressao', 'jobs', 'lojas', 'zip_stream'),
+}
+
+
+def _medir_importacao(modulo, proibidos):
+    codigo = (f"import json, sys, time; t = time.perf_counter(); import {modulo}; "
+              f"print(json.dumps([(time.perf_counter() - t) * 1000, "
+              f"[m for m in {list(proibidos)!r} if m in sys.modules]]))")
+    saida = subprocess.run([sys.executable, '-c', codigo], check=True, capture_output=True, text=True,
+                           cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def bench_importacao(args):
+    """Importa cada ponto de entrada em processos novos e compara com o orçamento. Retorna 1 se estourar."""
+    print(f"{'módulo':<14}{'mediana ms':>12}{'orçamento':>11}  resultado")
+    falhou = False
+    for modulo, orcamento in ORCAMENTO_IMPORTACAO_MS.items():
+        medidas = [_medir_importacao(modulo, PROIBIDOS_NA_IMPORTACAO[modulo]) for _ in range(args.repeticoes)]
+        mediana = sorted(ms for ms, _ in medidas)[len(medidas) // 2]
+        carregados = sorted({m for _, lista in medidas for m in lista})
+        problemas = []
+        if mediana > orcamento * args.folga:
+            problemas.append('acima do orçamento')
+        if carregados:
+            problemas.append(f"importou {', '.join(carregados)}")
+        falhou = falhou or bool(problemas)
+        print(f"{modulo:<14}{mediana:>12.0f}{orcamento:>11}  {'; '.join(problemas) or 'ok'}")
+    return 1 if falhou else 0
+
+
+def memoria_processo(pid='self'):
+    """(RSS, PSS, USS) em MB, de /proc/<pid>/smaps_rollup (só Linux). USS = páginas privadas."""
+    campos = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for linha in f:
+            partes = linha.split()
+            if len(partes) == 3 and partes[2] == 'kB':
+                campos[partes[0].rstrip(':')] = int(partes[1]) / 1024
+    return campos['Rss'], campos['Pss'], campos['Private_Clean'] + campos['Private_Dirty']
+
+
+def bench_preload(args):
+    """
+    Mesmos N workers (fork) atendendo a primeira requisição, sem e com o modo
+    pré-carregado (app.preaquecer no mestre + planos compartilhados em disco).
+    Cada cenário roda num processo novo, sem cache de páginas em disco.
+    """
+    import tempfile
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("precisa de /proc/<pid>/smaps_rollup (Linux)")
+        return 1
+    print(f"{args.workers} workers, uma requisição PNG (layout list) por worker, temas alternados")
+    print(f"{'modo':<10}{'worker':>7}{'import ms':>11}{'1ª req ms':>11}{'desenho ms':>12}"
+          f"{'RSS MB':>9}{'PSS MB':>9}{'USS MB':>9}")
+    for modo in ('frio', 'preload'):
+        with tempfile.TemporaryDirectory() as pasta:
+            env = dict(os.environ, POSTER_CACHE_DIR=os.path.join(pasta, 'paginas'), POSTER_CACHE_DISCO_MB='0',
+                       POSTER_PLANOS_DIR=os.path.join(pasta, 'planos'),
+                       POSTER_PLANOS_DISCO_MB='64' if modo == 'preload' else '0',
+                       POSTER_AQUECER='0', POSTER_WORKERS='1')
+            saida = subprocess.run([sys.executable, os.path.abspath(__file__), 'preload-caso', '--modo', modo,
+                                    '--workers', str(args.workers)],
+                                   env=env, capture_output=True, text=True, check=True).stdout
+        linhas = [json.loads(linha) for linha in saida.splitlines()]
+        for w in linhas:
+            print(f"{modo:<10}{w['worker']:>7}{w['importacao_ms']:>11.0f}{w['requisicao_ms']:>11.0f}"
+                  f"{w['desenho_ms']:>12.0f}{w['rss']:>9.1f}{w['pss']:>9.1f}{w['uss']:>9.1f}")
+        print(f"{modo:<10}{'total':>7}{'':>34}{sum(w['rss'] for w in linhas):>9.1f}"
+              f"{sum(w['pss'] for w in linhas):>9.1f}{sum(w['uss'] for w in linhas):>9.1f}")
+
+
+def bench_preload_caso(args):
+    """Um cenário do bench preload (processo próprio): imprime uma linha JSON por worker."""
+    if args.modo == 'preload':
+        import app
+        app.preaquecer()
+
+    workers = []
+    for i in range(args.workers):
+        inicio_r, inicio_w = os.pipe()
+        resultado_r, resultado_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(inicio_w)
+            os.close(resultado_r)
+            for _, outro_w, outro_r in workers:  # Senão o EOF dos irmãos nunca chega
+                os.close(outro_w)
+                os.close(outro_r)
+            os.read(inicio_r, 1)  # Espera a vez: as primeiras requisições não disputam a CPU
+            t0 = time.perf_counter()
+            import app
+            t_importacao = time.perf_counter() - t0
+            tema = list(app.THEMES.values())[i % len(app.THEMES)]
+            dados = {'layout_mode': 'list', 'format': 'png', 'action': 'download', 'poster_title': 'OFERTAS',
+                     'bg_color': tema['bg'], 'text_color': tema['text'],
+                     'accent_color': tema['accent'], 'badge_color': tema['badge']}
+            for n, oferta in enumerate(app.DEFAULT_OFFERS, start=1):
+                dados.update({f'produto_{n}': oferta['produto'], f'de_{n}': str(oferta['de']),
+                              f'por_{n}': str(oferta['por'])})
+            t0 = time.perf_counter()
+            resposta = app.app.test_client().post('/', data=dados, headers={'X-Poster-Timing': '1'})
+            t_requisicao = time.perf_counter() - t0
+            assert resposta.status_code == 200, resposta.status_code
+            # Desenho = tudo menos a codificação do PNG (que não depende de aquecimento)
+            etapas = dict(item.split(';dur=') for item in resposta.headers['Server-Timing'].split(', '))
+            t_desenho = sum(float(ms) for nome, ms in etapas.items() if nome not in ('codificacao', 'requisicao'))
+            os.write(resultado_w, json.dumps({'importacao_ms': t_importacao * 1000, 'desenho_ms': t_desenho,
+                                              'requisicao_ms': t_requisicao * 1000}).encode())
+            os.close(resultado_w)
+            os.read(inicio_r, 1)  # Fica vivo (EOF) até o mestre medir a memória de todos
+            os._exit(0)
+        os.close(inicio_r)
+        os.close(resultado_w)
+        workers.append((pid, inicio_w, resultado_r))
+
+    medidas = []
+    for i, (pid, inicio_w, resultado_r) in enumerate(workers):
+        os.write(inicio_w, b'1')
+        with os.fdopen(resultado_r) as f:
+            medidas.append(dict(json.loads(f.read()), worker=i + 1))
+    # Com todos vivos: o PSS divide as páginas compartilhadas entre os processos
+    for medida, (pid, _, _) in zip(medidas, workers):
+        medida['rss'], medida['pss'], medida['uss'] = memoria_processo(pid)
+    for pid, inicio_w, _ in workers:
+        os.close(inicio_w)
+        os.waitpid(pid, 0)
+    for medida in medidas:
+        print(json.dumps(medida))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('ajuste', help='motor de ajuste de texto vs. laço linear antigo')
+    p.add_argument('--repeticoes', type=int, default=5)
+    p.set_defaults(func=bench_ajuste)
+
+    p = sub.add_parser('paralelo', help='escala do pool de processos de 1 a N workers')
+    p.add_argument('--itens', type=int, default=600)
+    p.add_argument('--max-workers', type=int, default=0)
+    p.set_defaults(func=bench_paralelo)
+
+    p = sub.add_parser('modelo', help='lotes de 100 páginas com/sem camada base')
+    p.add_argument('--paginas', type=int, default=100)
+    p.set_defaults(func=bench_modelo)
+
+    p = sub.add_parser('csv', help='ingestão de um catálogo grande')
+    p.add_argument('--linhas', type=int, default=100_000)
+    p.set_defaults(func=bench_csv)
+
+    p = sub.add_parser('plano', help='planos de layout: planejar o catálogo no pool e trocar de tema')
+    p.add_argument('--paginas', type=int, default=100)
+    p.add_argument('--workers', type=int, default=0)
+    p.set_defaults(func=bench_plano)
+
+    p = sub.add_parser('lojas', help='lote multi-loja: lojas/min com e sem compartilhar o layout')
+    p.add_argument('--lojas', type=int, default=20)
+    p.add_argument('--paginas', type=int, default=10, help='páginas por loja')
+    p.add_argument('--formato', default='pdf', choices=('pdf', 'pdf_vetorial'))
+    p.add_argument('--workers', type=int, default=1)
+    p.set_defaults(func=bench_lojas)
+
+    p = sub.add_parser('vetorial', help='PDF vetorial vs. rasterizado (paridade de layout, tamanho, tempo)')
+    p.add_argument('--paginas', type=int, default=20)
+    p.set_defaults(func=bench_vetorial)
+
+    p = sub.add_parser('cores', help='saída compacta (paleta do tema / cinza) vs. RGB: bytes e ms por página')
+    p.add_argument('--paginas', type=int, default=10)
+    p.add_argument('--layout', default='list', choices=LAYOUTS)
+    p.add_argument('--dpi', type=int)
+    p.add_argument('--nivel', type=int, default=6, help='compress_level do PNG')
+    p.set_defaults(func=bench_cores)
+
+    p = sub.add_parser('glifos', help='atlas de glifos dos preços vs. draw.text (só desenho)')
+    p.add_argument('--paginas', type=int, default=10)
+    p.add_argument('--layout', default='simple', choices=LAYOUTS)
+    p.add_argument('--dpi', type=int)
+    p.add_argument('--repeticoes', type=int, default=5)
+    p.set_defaults(func=bench_glifos)
+
+    p = sub.add_parser('paginacao', help='paginação por densidade vs. blocos fixos (páginas e tempo de render)')
+    p.add_argument('--itens', type=int, default=600)
+    p.add_argument('--layouts', default='list,simple')
+    p.add_argument('--dpi', type=int)
+    p.add_argument('--semente', type=int, default=1)
+    p.set_defaults(func=bench_paginacao)
+
+    p = sub.add_parser('celulas', help='cache de células (ladrilhos por produto) num catálogo com SKUs repetidos')
+    p.add_argument('--itens', type=int, default=2000)
+    p.add_argument('--skus', type=int, default=150)
+    p.add_argument('--layouts', default='list,simple,gondola')
+    p.add_argument('--dpi', type=int)
+    p.add_argument('--semente', type=int, default=1)
+    p.set_defaults(func=bench_celulas)
+
+    p = sub.add_parser('suite', help='todos os layouts x tamanhos x DPI (pág/s, pico de RSS, etapas)')
+    p.add_argument('--paginas', default='5,20,50', help='tamanhos do catálogo em páginas, separados por vírgula')
+    p.add_argument('--dpi', default='150,300', help='resoluções, separadas por vírgula')
+    p.add_argument('--json', help='grava os resultados neste arquivo (para comparar entre versões)')
+    p.set_defaults(func=bench_suite)
+
+    p = sub.add_parser('importacao', help='tempo de importação x orçamento (código 1 se estourar)')
+    p.add_argument('--repeticoes', type=int, default=5)
+    p.add_argument('--folga', type=float, default=1.0, help='multiplica o orçamento (máquinas lentas de CI)')
+    p.set_defaults(func=bench_importacao)
+
+    p = sub.add_parser('preload', help='workers com fork: RSS/PSS/USS e 1ª requisição, com e sem pré-carga')
+    p.add_argument('--workers', type=int, default=4)
+    p.set_defaults(func=bench_preload)
+
+    p = sub.add_parser('preload-caso', help=argparse.SUPPRESS)
+    p.add_argument('--modo', choices=('frio', 'preload'), required=True)
+    p.add_argument('--workers', type=int, required=True)
+    p.set_defaults(func=bench_preload_caso)
+
+    p = sub.add_parser('caso', help=argparse.SUPPRESS)
+    p.add_argument('--layout', choices=LAYOUTS, required=True)
+    p.add_argument('--paginas', type=int, required=True)
+    p.add_argument('--dpi', type=int, default=150)
+    p.set_defaults(func=bench_caso)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
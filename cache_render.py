@@ -0,0 +1,334 @@
+"""
+Cache de renderização endereçado por conteúdo.
+
+A chave é um hash estável (sha256) das ofertas da página e de tudo que muda o
+desenho: cores, layout_mode, poster_title, textos do rodapé, DPI e formato.
+A mesma lista de ofertas impressa por várias lojas, ou pré-visualizada várias
+vezes, é renderizada uma vez só.
+
+Dois níveis, cada um com LRU limitado por bytes:
+- memória (por processo);
+- disco (compartilhado entre processos, em POSTER_CACHE_DIR).
+
+Configuração por variáveis de ambiente:
+    POSTER_CACHE_DIR        pasta do nível em disco (padrão: <tmp>/poster_black_cache)
+    POSTER_CACHE_MEM_MB     limite do nível em memória (padrão: 128)
+    POSTER_CACHE_DISCO_MB   limite do nível em disco (padrão: 1024; 0 desliga o disco)
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+# Mude quando o desenho mudar, para invalidar o que já está no disco
+VERSAO_RENDER = 3
+
+# Campos da oferta que influenciam o desenho
+CAMPOS_OFERTA = ('produto', 'de', 'por')
+
+
+def _env_mb(nome, padrao):
+    try:
+        return int(float(os.environ.get(nome, padrao)) * 1024 * 1024)
+    except ValueError:
+        return int(padrao * 1024 * 1024)
+
+
+def _hash(obj):
+    dados = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(dados.encode('utf-8')).hexdigest()
+
+
+def normalizar_ofertas(ofertas):
+    return [[o.get(campo) for campo in CAMPOS_OFERTA] for o in ofertas]
+
+
+def chave_pagina(ofertas, formato='PNG', opcoes_formato=None, **kwargs):
+    """
+    Chave de uma página: ofertas + parâmetros de renderização + formato. As opções
+    do codificador (nível de compressão, paleta) só entram na chave quando passadas,
+    então a chave da página padrão não muda.
+    """
+    item = {
+        'v': VERSAO_RENDER,
+        'tipo': 'pagina',
+        'ofertas': normalizar_ofertas(ofertas),
+        'formato': formato.upper(),
+        'params': kwargs,
+    }
+    if opcoes_formato:
+        item['opcoes_formato'] = opcoes_formato
+    return _hash(item)
+
+
+def chave_plano(ofertas, layout_mode='list', **kwargs):
+    """Chave de um plano de layout: ofertas + layout + parâmetros que mudam posições (sem cores)."""
+    return _hash({
+        'v': VERSAO_RENDER,
+        'tipo': 'plano',
+        'ofertas': normalizar_ofertas(ofertas),
+        'layout_mode': layout_mode,
+        'params': kwargs,
+    })
+
+
+def chave_pedido(chave):
+    """Chave do pedido (ofertas + parâmetros) que gera o item `chave`, para renderizá-lo depois."""
+    return _hash({'v': VERSAO_RENDER, 'tipo': 'pedido', 'item': chave})
+
+
+def chave_documento(chaves_paginas, formato='PDF', **extras):
+    """Chave de um documento montado (PDF/ZIP) a partir das chaves das suas páginas."""
+    return _hash({
+        'v': VERSAO_RENDER,
+        'tipo': 'documento',
+        'formato': formato.upper(),
+        'paginas': list(chaves_paginas),
+        'extras': extras,
+    })
+
+
+class CacheMemoria:
+    """LRU em memória limitado pelo total de bytes guardados (medidos por tamanho())."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            dados = self._itens.get(chave)
+            if dados is not None:
+                self._itens.move_to_end(chave)
+            return dados
+
+    def __contains__(self, chave):
+        with self._lock:
+            return chave in self._itens
+
+    @staticmethod
+    def tamanho(dados):
+        return len(dados)
+
+    def put(self, chave, dados):
+        tamanho = self.tamanho(dados)
+        if tamanho > self.max_bytes:
+            return
+        with self._lock:
+            antigo = self._itens.pop(chave, None)
+            if antigo is not None:
+                self.total_bytes -= self.tamanho(antigo)
+            self._itens[chave] = dados
+            self.total_bytes += tamanho
+            while self.total_bytes > self.max_bytes:
+                _, removido = self._itens.popitem(last=False)
+                self.total_bytes -= self.tamanho(removido)
+
+    def __len__(self):
+        return len(self._itens)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.total_bytes = 0
+
+
+class CacheDisco:
+    """
+    LRU em disco limitado por bytes. Cada item é um arquivo <pasta>/<ab>/<chave>;
+    a data de modificação marca o último uso (atualizada a cada leitura).
+    """
+
+    def __init__(self, pasta, max_bytes):
+        self.pasta = pasta
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(pasta, exist_ok=True)
+        self.total_bytes = sum(tamanho for _, tamanho, _ in self._arquivos())
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, chave[:2], chave)
+
+    def _arquivos(self):
+        for raiz, _, nomes in os.walk(self.pasta):
+            for nome in nomes:
+                path = os.path.join(raiz, nome)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def get(self, chave):
+        path = self._caminho(chave)
+        try:
+            with open(path, 'rb') as f:
+                dados = f.read()
+            os.utime(path)
+            return dados
+        except OSError:
+            return None
+
+    def __contains__(self, chave):
+        return os.path.exists(self._caminho(chave))
+
+    def put(self, chave, dados):
+        if len(dados) > self.max_bytes:
+            return
+        path = self._caminho(chave)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(dados)
+            existia = os.path.exists(path)
+            os.replace(tmp, path)  # Escrita atômica: outros processos nunca leem meio arquivo
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        with self._lock:
+            if not existia:
+                self.total_bytes += len(dados)
+            if self.total_bytes > self.max_bytes:
+                self._despejar()
+
+    def _despejar(self):
+        """Remove os arquivos menos usados até caber em 90% do limite."""
+        arquivos = sorted(self._arquivos(), key=lambda a: a[2])
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        alvo = self.max_bytes * 0.9
+        for path, tamanho, _ in arquivos:
+            if total <= alvo:
+                break
+            try:
+                os.remove(path)
+                total -= tamanho
+            except OSError:
+                continue
+        self.total_bytes = total
+
+    def __len__(self):
+        return sum(1 for _ in self._arquivos())
+
+    def limpar(self):
+        with self._lock:
+            for path, _, _ in list(self._arquivos()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.total_bytes = 0
+
+
+class CacheRender:
+    """
+    Cache em dois níveis (memória -> disco) com métricas de acerto. A pasta do
+    disco só é criada/varrida no primeiro uso (importar o módulo não toca no disco).
+    """
+
+    def __init__(self, max_memoria=None, pasta=None, max_disco=None):
+        if max_memoria is None:
+            max_memoria = _env_mb('POSTER_CACHE_MEM_MB', 128)
+        if max_disco is None:
+            max_disco = _env_mb('POSTER_CACHE_DISCO_MB', 1024)
+        if pasta is None:
+            pasta = os.environ.get('POSTER_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'poster_black_cache')
+
+        self.memoria = CacheMemoria(max_memoria)
+        self.pasta = pasta
+        self.max_disco = max_disco
+        self._disco = None
+        self._lock = threading.Lock()
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+
+    @property
+    def disco(self):
+        if self._disco is None and self.max_disco > 0:
+            with self._lock:
+                if self._disco is None:
+                    self._disco = CacheDisco(self.pasta, self.max_disco)
+        return self._disco
+
+    def get(self, chave):
+        dados = self.memoria.get(chave)
+        if dados is not None:
+            with self._lock:
+                self.hits_memoria += 1
+            return dados
+        if self.disco is not None:
+            dados = self.disco.get(chave)
+            if dados is not None:
+                self.memoria.put(chave, dados)  # Promove para a memória
+                with self._lock:
+                    self.hits_disco += 1
+                return dados
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, chave, dados):
+        self.memoria.put(chave, dados)
+        if self.disco is not None:
+            self.disco.put(chave, dados)
+
+    def contem(self, chave):
+        """True se a chave está em algum nível (sem ler os dados nem contar nas métricas)."""
+        return chave in self.memoria or (self.disco is not None and chave in self.disco)
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.hits_memoria + self.hits_disco + self.misses
+            acertos = self.hits_memoria + self.hits_disco
+            stats = {
+                'hits_memoria': self.hits_memoria,
+                'hits_disco': self.hits_disco,
+                'misses': self.misses,
+                'taxa_acerto': round(acertos / consultas, 4) if consultas else 0.0,
+            }
+        stats['memoria_bytes'] = self.memoria.total_bytes
+        stats['memoria_itens'] = len(self.memoria)
+        stats['disco_bytes'] = self.disco.total_bytes if self.disco is not None else 0
+        return stats
+
+    def limpar(self):
+        self.memoria.limpar()
+        if self.disco is not None:
+            self.disco.limpar()
+        with self._lock:
+            self.hits_memoria = self.hits_disco = self.misses = 0
+
+
+# Instância global usada pelo app
+cache = CacheRender()
+
+
+def estatisticas():
+    return cache.estatisticas()
+
+
+def guardar_em_partes(cache, chave, partes, limite=None):
+    """
+    Repassa os pedaços de um documento gerado em streaming e, ao final, guarda o
+    documento inteiro no cache. Se passar de `limite` bytes, desiste de guardar
+    (para não segurar documentos enormes em memória só por causa do cache).
+    """
+    limite = cache.memoria.max_bytes if limite is None else limite
+    acumulado = []
+    tamanho = 0
+    for parte in partes:
+        if acumulado is not None:
+            acumulado.append(parte)
+            tamanho += len(parte)
+            if tamanho > limite:
+                acumulado = None
+        yield parte
+    if acumulado is not None:
+        cache.put(chave, b''.join(acumulado))
@@ -0,0 +1,182 @@
+"""
+Geração de cartazes sem o servidor web (linha de comando e API Python).
+
+Lê o CSV em streaming (caminho ou entrada padrão), pagina e renderiza no pool de
+processos e grava cada página assim que fica pronta, então a memória não cresce
+com o tamanho do catálogo. A saída é decidida pela extensão:
+
+    saida.pdf    PDF (páginas PNG embutidas; --vetorial para o PDF vetorial)
+    saida.zip    ZIP com um PNG por página (--nivel-png / --compacto para PNGs menores)
+    pasta/       um PNG por página
+    -            PDF na saída padrão
+
+    python cartazes.py catalogo.csv -o cartazes.pdf --layout gondola --workers 4
+    python cartazes.py catalogo.csv -o cartazes.pdf --layout simple --itens auto
+    cat catalogo.csv | python cartazes.py - -o - --tema natalino > cartazes.pdf
+
+    import cartazes
+    resumo = cartazes.gerar('catalogo.csv', 'cartazes.pdf', layout_mode='simple')
+
+Este módulo não importa o Flask: a partida a frio (cron, containers) só paga o
+Pillow e os módulos do gerador. O tempo de importação fica em TEMPO_IMPORTACAO.
+"""
+import time
+
+_inicio_importacao = time.perf_counter()
+
+import argparse
+import os
+import sys
+from collections import namedtuple
+
+import cache_render
+import catalogo
+import pdf_stream
+import pdf_vetorial
+import paginacao
+import perfil
+import poster_black
+import render_paralelo
+import zip_stream
+
+TEMPO_IMPORTACAO = time.perf_counter() - _inicio_importacao
+
+Resumo = namedtuple('Resumo', ['paginas', 'segundos', 'saida'])
+
+
+class ErroPagina(RuntimeError):
+    """Uma página não pôde ser renderizada."""
+
+
+def _paginas(grupos, workers, dpi, opcoes_render, opcoes_png=None):
+    """PNG de cada página, na ordem (pool de processos + cache de páginas)."""
+    resultados = render_paralelo.iterar_paginas(grupos, workers, 'PNG', opcoes_png, cache=cache_render.cache,
+                                                dpi=dpi, **opcoes_render)
+    try:
+        for resultado in resultados:
+            if resultado.erro:
+                raise ErroPagina(f"Falha ao gerar a página {resultado.indice + 1}: {resultado.erro}")
+            yield resultado.dados
+    finally:
+        resultados.close()
+
+
+def _escrever_pdf(arquivo, grupos, workers, dpi, vetorial, opcoes_render, opcoes_png=None):
+    if vetorial and pdf_vetorial.disponivel():
+        partes = pdf_vetorial.pdf_em_partes(grupos, dpi=dpi, **opcoes_render)
+    else:
+        partes = pdf_stream.pdf_em_partes(_paginas(grupos, workers, dpi, opcoes_render, opcoes_png), dpi=dpi or 150)
+    for parte in partes:
+        arquivo.write(parte)
+
+
+def gerar(origem, saida, layout_mode='list', itens_por_pagina=None, workers=None, vetorial=False,
+          dpi=None, opcoes_png=None, **opcoes_render):
+    """
+    Gera os cartazes de um CSV (caminho ou stream binário) em `saida` (.pdf, .zip,
+    pasta ou '-' para PDF na saída padrão). `opcoes_render` são os parâmetros de
+    poster_black.renderizar_poster (cores, textos, título); `opcoes_png` vai para o
+    codificador dos PNGs (ex.: {'compress_level': 1, 'compacto': True}).
+    itens_por_pagina='auto' usa a paginação por densidade (paginacao.py).
+    Retorna um Resumo.
+    """
+    inicio = time.perf_counter()
+    contagem = {'paginas': 0}
+    opcoes_render = dict(opcoes_render, layout_mode=layout_mode)
+
+    def grupos():
+        for grupo in paginacao.paginar(catalogo.iter_ofertas(origem), itens_por_pagina, dpi=dpi, **opcoes_render):
+            contagem['paginas'] += 1
+            yield grupo
+
+    destino = saida.lower() if isinstance(saida, str) else ''
+    if saida == '-':
+        _escrever_pdf(sys.stdout.buffer, grupos(), workers, dpi, vetorial, opcoes_render, opcoes_png)
+        sys.stdout.buffer.flush()
+    elif destino.endswith('.pdf'):
+        with open(saida, 'wb') as f:
+            _escrever_pdf(f, grupos(), workers, dpi, vetorial, opcoes_render, opcoes_png)
+    elif destino.endswith('.zip'):
+        # PNG já é comprimido: ZIP_STORED não perde nada e não gasta CPU
+        paginas = _paginas(grupos(), workers, dpi, opcoes_render, opcoes_png)
+        arquivos = ((f"cartaz_{n:04d}.png", png) for n, png in enumerate(paginas, start=1))
+        with open(saida, 'wb') as f:
+            for parte in zip_stream.zip_em_partes(arquivos):
+                f.write(parte)
+    else:
+        os.makedirs(saida, exist_ok=True)
+        for n, png in enumerate(_paginas(grupos(), workers, dpi, opcoes_render, opcoes_png), start=1):
+            with open(os.path.join(saida, f"cartaz_{n:04d}.png"), 'wb') as f:
+                f.write(png)
+    return Resumo(contagem['paginas'], time.perf_counter() - inicio, saida)
+
+
+def _opcoes_da_linha_de_comando(args):
+    opcoes = {}
+    if args.tema:
+        tema = poster_black.TEMAS[args.tema]
+        opcoes.update(bg_color=tema['bg'], text_color=tema['text'],
+                      accent_color=tema['accent'], badge_color=tema['badge'])
+    for nome in ('bg', 'text', 'accent', 'badge'):
+        if getattr(args, nome):
+            opcoes[f"{nome}_color"] = getattr(args, nome)
+    if args.titulo:
+        opcoes['poster_title'] = args.titulo
+    if args.vigencia:
+        opcoes['vigencia_text'] = args.vigencia
+    if args.estoques:
+        opcoes['aviso_estoques'] = args.estoques
+    return opcoes
+
+
+def _opcoes_png(args):
+    opcoes = {}
+    if args.nivel_png is not None:
+        opcoes['compress_level'] = args.nivel_png
+    if args.compacto:
+        opcoes['compacto'] = True
+    return opcoes or None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera os cartazes de um CSV de ofertas (sem o servidor web).")
+    parser.add_argument('catalogo', help="CSV de ofertas (produto, de, por); '-' lê da entrada padrão")
+    parser.add_argument('-o', '--saida', required=True, help="arquivo .pdf ou .zip, pasta, ou '-' (PDF na saída padrão)")
+    parser.add_argument('--layout', default='list', choices=sorted(poster_black.ITENS_POR_PAGINA))
+    parser.add_argument('--itens', type=paginacao.itens_da_linha_de_comando,
+                        help="itens por página (padrão: o do layout; 'auto' empacota pela densidade dos nomes)")
+    parser.add_argument('--workers', type=int, help='processos (padrão: POSTER_WORKERS ou nº de CPUs)')
+    parser.add_argument('--vetorial', action='store_true', help='PDF vetorial (precisa do fontTools)')
+    parser.add_argument('--dpi', type=int, help='resolução das páginas (padrão: 150)')
+    parser.add_argument('--nivel-png', type=int, choices=range(10), metavar='0-9',
+                        help='compressão dos PNGs do .zip/pasta (padrão: 6; 1 é bem mais rápido)')
+    parser.add_argument('--compacto', action='store_true',
+                        help='páginas com a paleta do tema (ou em cinza): PNG/PDF menores e mais rápidos')
+    parser.add_argument('--tema', choices=sorted(poster_black.TEMAS))
+    parser.add_argument('--titulo')
+    parser.add_argument('--vigencia')
+    parser.add_argument('--estoques')
+    for nome in ('bg', 'text', 'accent', 'badge'):
+        parser.add_argument(f'--{nome}', help=f'cor {nome} em hex (sobrescreve o tema)')
+    parser.add_argument('--perfil', action='store_true', help='mostra o tempo de cada etapa')
+    args = parser.parse_args(argv)
+
+    origem = sys.stdin.buffer if args.catalogo == '-' else args.catalogo
+    with perfil.coletar() as etapas:
+        try:
+            resumo = gerar(origem, args.saida, args.layout, args.itens, args.workers, args.vetorial, args.dpi,
+                           _opcoes_png(args), **_opcoes_da_linha_de_comando(args))
+        except ErroPagina as e:
+            print(e, file=sys.stderr)
+            return 1
+
+    taxa = resumo.paginas / resumo.segundos if resumo.segundos else 0.0
+    print(f"importação {TEMPO_IMPORTACAO * 1000:.0f} ms | {resumo.paginas} páginas em {resumo.segundos:.2f}s "
+          f"({taxa:.1f} pág/s) -> {resumo.saida}", file=sys.stderr)
+    if args.perfil:
+        print(etapas.resumo(), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
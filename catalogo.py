@@ -0,0 +1,231 @@
+"""
+Leitura do catálogo (CSV ou lista JSON da API) e paginação das ofertas.
+
+A ingestão é em streaming:
+- o encoding é detectado numa amostra do início do arquivo (sem reler tudo
+  do zero com latin-1 quando um byte inválido aparece no meio);
+- o cabeçalho é mapeado uma única vez (nada de recriar um dict por linha);
+- os preços são convertidos em lote, com regex compilada e memo dos valores
+  repetidos ("R$ 1.234,56", "2,99", "2.99"...);
+- as ofertas saem de um gerador, então a paginação e a renderização podem
+  começar antes do arquivo terminar de ser lido.
+
+Este módulo não depende do Flask.
+"""
+import codecs
+import csv
+import io
+import itertools
+import re
+
+import perfil
+
+TAMANHO_AMOSTRA = 64 * 1024
+TAMANHO_LOTE = 1024
+
+# Campos reconhecidos no cabeçalho (comparação sem maiúsculas/espaços)
+CAMPOS = ('produto', 'de', 'por', 'local', 'locale')
+
+_RE_PRECO = re.compile(r'^\s*(?:R\$)?\s*(-?)\s*([\d.,]+)\s*$', re.IGNORECASE)
+
+
+def _latin1_no_erro(erro):
+    """Bytes que não são UTF-8 válido viram o caractere latin-1 correspondente."""
+    return erro.object[erro.start:erro.end].decode('latin-1'), erro.end
+
+
+codecs.register_error('poster_latin1', _latin1_no_erro)
+
+
+def detectar_encoding(amostra):
+    """'utf-8-sig' se a amostra decodifica como UTF-8 (ou começa com BOM), senão 'latin-1'."""
+    if amostra.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    try:
+        decoder.decode(amostra, final=False)  # final=False: a amostra pode cortar um caractere no meio
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def _preco_texto(valor):
+    """Converte um preço em texto para float (0.0 se não der)."""
+    m = _RE_PRECO.match(valor)
+    if m:
+        sinal, numero = m.groups()
+        virgula = numero.rfind(',')
+        ponto = numero.rfind('.')
+        if virgula >= 0 and ponto >= 0:
+            # Os dois separadores: o último é o decimal ("1.234,56" ou "1,234.56")
+            if virgula > ponto:
+                numero = numero.replace('.', '').replace(',', '.')
+            else:
+                numero = numero.replace(',', '')
+        elif virgula >= 0:
+            numero = numero.replace(',', '.') if numero.count(',') == 1 else numero
+        try:
+            return float(sinal + numero)
+        except ValueError:
+            pass
+    # Mesmo tratamento antigo: remove R$, espaços e troca vírgula por ponto
+    try:
+        return float(valor.replace('R$', '').replace(' ', '').replace(',', '.'))
+    except ValueError:
+        return 0.0
+
+
+def converter_precos(valores, memo=None):
+    """
+    Converte um lote de preços em texto para float.
+    Valores repetidos (muito comuns em catálogos) são convertidos uma vez só via `memo`.
+    """
+    memo = {} if memo is None else memo
+    saida = []
+    for valor in valores:
+        if valor is None:
+            saida.append(0.0)
+            continue
+        convertido = memo.get(valor)
+        if convertido is None:
+            try:
+                convertido = float(valor)  # Caminho rápido: "2.99", "10"
+            except ValueError:
+                convertido = _preco_texto(valor)
+            if len(memo) < 100_000:
+                memo[valor] = convertido
+        saida.append(convertido)
+    return saida
+
+
+class _ComAmostra(io.RawIOBase):
+    """Stream binário que devolve primeiro a amostra já lida e depois o resto do arquivo."""
+
+    def __init__(self, amostra, resto):
+        self.amostra = memoryview(amostra)
+        self.resto = resto
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        if self.amostra:
+            n = min(len(buf), len(self.amostra))
+            buf[:n] = self.amostra[:n]
+            self.amostra = self.amostra[n:]
+            return n
+        dados = self.resto.read(len(buf))
+        n = len(dados)
+        buf[:n] = dados
+        return n
+
+
+def _abrir_texto(origem):
+    """
+    Abre um caminho ou stream binário (ex.: upload do Flask, sys.stdin.buffer)
+    como texto, detectando o encoding pela amostra inicial.
+    Retorna (arquivo_texto, stream_binário_aberto_aqui_ou_None).
+    """
+    if isinstance(origem, (str, bytes)) or hasattr(origem, '__fspath__'):
+        bruto = aberto = open(origem, 'rb')
+    else:
+        bruto, aberto = origem, None
+    amostra = bruto.read(TAMANHO_AMOSTRA)
+    encoding = detectar_encoding(amostra)
+    # Fechar o wrapper não fecha o stream de quem chamou (_ComAmostra não o fecha)
+    stream = io.BufferedReader(_ComAmostra(amostra, bruto))
+    return io.TextIOWrapper(stream, encoding=encoding, errors='poster_latin1', newline=''), aberto
+
+
+def iter_ofertas(origem, tamanho_lote=TAMANHO_LOTE):
+    """
+    Gerador de ofertas a partir de um CSV (caminho ou stream binário).
+    Cada oferta: {'produto', 'de', 'por', 'local', 'locale'}.
+    """
+    texto, aberto = _abrir_texto(origem)
+    try:
+        reader = csv.reader(texto)
+        cabecalho = next(reader, None)
+        if not cabecalho:
+            return
+
+        # Mapeia o cabeçalho uma única vez (a última coluna com o mesmo nome vence, como no DictReader)
+        indices = {}
+        for i, nome in enumerate(cabecalho):
+            nome = nome.strip().lower()
+            if nome:
+                indices[nome] = i
+        i_prod, i_de, i_por, i_local, i_locale = (indices.get(c) for c in CAMPOS)
+
+        def campo(row, i, padrao=''):
+            return row[i] if i is not None and i < len(row) else padrao
+
+        memo = {}
+        while True:
+            with perfil.etapa('csv'):
+                lote = [row for row in itertools.islice(reader, tamanho_lote) if row]
+                des = converter_precos([campo(row, i_de, '0') for row in lote], memo)
+                pors = converter_precos([campo(row, i_por, '0') for row in lote], memo)
+                ofertas = [{
+                    'produto': campo(row, i_prod).strip(),
+                    'de': de_val,
+                    'por': por_val,
+                    'local': campo(row, i_local).strip(),
+                    'locale': campo(row, i_locale, 'pt_BR').strip() or 'pt_BR',
+                } for row, de_val, por_val in zip(lote, des, pors)]
+            if not ofertas:
+                break
+            yield from ofertas
+    finally:
+        texto.close()
+        if aberto is not None:
+            aberto.close()
+
+
+def ofertas_de_json(itens):
+    """
+    Ofertas de uma lista JSON (API): cada item é um objeto com os mesmos campos do
+    CSV; os preços podem vir como número ou texto ("R$ 1.234,56"). Itens sem
+    produto são ignorados, como as linhas vazias do formulário.
+    Levanta ValueError se a estrutura não for uma lista de objetos.
+    """
+    if not isinstance(itens, list):
+        raise ValueError("'ofertas' deve ser uma lista.")
+    if not all(isinstance(item, dict) for item in itens):
+        raise ValueError("Cada oferta deve ser um objeto com produto, de e por.")
+    itens = [item for item in itens if str(item.get('produto') or '').strip()]
+
+    def preco(valor):
+        if isinstance(valor, bool) or not isinstance(valor, (int, float, str, type(None))):
+            return str(valor)  # Vira 0.0 na conversão, como um preço ilegível no CSV
+        return valor
+
+    memo = {}
+    des = converter_precos([preco(item.get('de', 0)) for item in itens], memo)
+    pors = converter_precos([preco(item.get('por', 0)) for item in itens], memo)
+    return [{
+        'produto': str(item['produto']).strip(),
+        'de': de_val,
+        'por': por_val,
+        'local': str(item.get('local') or '').strip(),
+        'locale': str(item.get('locale') or '').strip() or 'pt_BR',
+    } for item, de_val, por_val in zip(itens, des, pors)]
+
+
+def parse_csv(filepath):
+    """Lê o CSV inteiro e devolve a lista de ofertas."""
+    return list(iter_ofertas(filepath))
+
+
+def dividir_lista(lista, tamanho_do_grupo):
+    """Divide a lista total em pedaços (páginas). Aceita listas ou qualquer iterável (preguiçoso)."""
+    if isinstance(lista, list):
+        for i in range(0, len(lista), tamanho_do_grupo):
+            yield lista[i:i + tamanho_do_grupo]
+        return
+    iterador = iter(lista)
+    while True:
+        grupo = list(itertools.islice(iterador, tamanho_do_grupo))
+        if not grupo:
+            return
+        yield grupo
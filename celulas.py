@@ -0,0 +1,216 @@
+"""
+Cache de células: os textos de cada linha das listas e de cada cartazete da
+gôndola, rasterizados uma vez e colados nas outras páginas.
+
+O mesmo produto sai igual em muitas páginas (outras lojas, reimpressões, o mesmo
+SKU em lotes diferentes), mas o plano manda rasterizar nome, preços e rótulos de
+novo a cada página. Aqui cada célula do plano (as operações depois de uma marca
+('celula', ...), ver plano.py) guarda um ladrilho: a máscara alfa de cada texto,
+exatamente a que o draw.text do Pillow gera (desenhada com tinta 255 sobre 0).
+Preços e rótulos são montados com os glifos do atlas (glifos.py), como no
+plano.executar, e só os nomes passam pelo FreeType. Colar é o mesmo draw_bitmap
+que o draw.text faz com a máscara (glifos.colar), então o resultado é idêntico;
+retângulos e linhas (fundos, riscado do DE) são baratos e continuam desenhados,
+na mesma ordem do plano.
+
+A chave do ladrilho são os textos da célula (texto, fonte e a fração do x). A
+cor entra só na hora de colar e a máscara não depende do fundo, então o ladrilho
+serve a qualquer tema e a qualquer linha da página: com hinting, a fração do y
+só anda o texto 1 px (glifos.AtlasFonte.pixel_y, com o limiar medido por fonte),
+e o x de cada texto é fixo por coluna. Fontes fora do layout básico do FreeType
+ficam com o draw.text.
+
+    POSTER_CELULAS      0 desliga (tudo volta para plano.executar)
+    POSTER_CELULAS_MB   limite das máscaras em memória, por processo (padrão: 64)
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageFont
+
+import cache_render
+import glifos
+import plano
+
+ATIVO = os.environ.get('POSTER_CELULAS', '1') != '0'
+
+# Bytes contados por ladrilho além das máscaras (chave, tuplas)
+CUSTO_CHAVE = 512
+
+# Margem (px) da tela em que cada texto é rasterizado: a fração do x anda o texto até 1 px
+FOLGA = 2
+
+
+def agrupar(ops):
+    """(operações antes da primeira célula, [(caixa, operações da célula), ...])."""
+    soltas, grupos = [], []
+    atual = soltas
+    for op in ops:
+        if op[0] == 'celula':
+            atual = []
+            grupos.append((op[1:5], atual))
+        else:
+            atual.append(op)
+    return soltas, grupos
+
+
+def _fonte(fonte):
+    """Fonte da operação, ou None se a máscara dela puder mudar com a fração do y."""
+    fonte = plano._fonte(fonte)
+    if isinstance(fonte, ImageFont.FreeTypeFont) and fonte.layout_engine == ImageFont.Layout.BASIC:
+        return fonte
+    return None
+
+
+def _mascara(texto, fonte, fracao_x):
+    """(máscara 'L', dx, dy) do texto desenhado em (int(x) + fracao_x, y inteiro), relativa à origem."""
+    if not texto or '\n' in texto:
+        return None
+    if glifos.atlas.ativo and glifos.CARACTERES.issuperset(texto):
+        # Preços e rótulos: os dígitos já estão no atlas, não passam de novo pelo FreeType
+        atlas = glifos.atlas.da_fonte(fonte)
+        caixas = atlas.caixas(texto, atlas.fase_x(fracao_x), 0)
+        if caixas is not None:
+            return glifos.montar(caixas)
+    l, t, r, b = fonte.getbbox(texto)
+    x0, y0 = FOLGA - min(l, 0), FOLGA - min(t, 0)
+    tela = Image.new('L', (x0 + max(r, 0) + FOLGA, y0 + max(b, 0) + FOLGA))
+    # Tinta 255 sobre 0: a imagem é exatamente a máscara que o draw.text usaria
+    ImageDraw.Draw(tela).text((x0 + fracao_x, y0), texto, font=fonte, fill=255)
+    caixa = tela.getbbox()
+    if caixa is None:
+        return None
+    return tela.crop(caixa), caixa[0] - x0, caixa[1] - y0
+
+
+class CacheCelulas:
+    """LRU de ladrilhos (máscaras dos textos de uma célula) limitado pelo total de bytes."""
+
+    def __init__(self, max_bytes, ativo=ATIVO):
+        self.max_bytes = max_bytes
+        self.ativo = ativo
+        self.total_bytes = 0
+        self._ladrilhos = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.diretas = 0
+
+    @staticmethod
+    def _bytes(ladrilho):
+        return CUSTO_CHAVE + sum(m[0].width * m[0].height for m in ladrilho if m is not None)
+
+    def _get(self, chave):
+        with self._lock:
+            ladrilho = self._ladrilhos.get(chave)
+            if ladrilho is not None:
+                self._ladrilhos.move_to_end(chave)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return ladrilho
+
+    def _put(self, chave, ladrilho):
+        tamanho = self._bytes(ladrilho)
+        if tamanho > self.max_bytes:
+            return
+        with self._lock:
+            antigo = self._ladrilhos.pop(chave, None)
+            if antigo is not None:
+                self.total_bytes -= self._bytes(antigo)
+            self._ladrilhos[chave] = ladrilho
+            self.total_bytes += tamanho
+            while self.total_bytes > self.max_bytes:
+                _, removido = self._ladrilhos.popitem(last=False)
+                self.total_bytes -= self._bytes(removido)
+
+    def ladrilho(self, ops):
+        """
+        Máscaras dos textos da célula, na ordem das operações (do cache ou
+        rasterizadas agora), ou None se algum texto não puder sair do cache.
+        """
+        textos = []
+        for op in ops:
+            if op[0] == 'texto':
+                _, x, _, texto, fonte, _ = op
+                if _fonte(fonte) is None:
+                    return None
+                textos.append((texto, fonte, math.modf(x)[0]))
+        chave = tuple(textos)
+        ladrilho = self._get(chave)
+        if ladrilho is None:
+            ladrilho = tuple(_mascara(texto, _fonte(fonte), fracao) for texto, fonte, fracao in textos)
+            self._put(chave, ladrilho)
+        return ladrilho
+
+    def colar(self, ops, ladrilho, draw, pagina, cores, deslocamento=0):
+        """Desenha a célula: textos colados do ladrilho com `pagina` (ImageDraw da imagem), o resto em `draw`."""
+        mascaras = iter(ladrilho)
+        for op in ops:
+            if op[0] != 'texto':
+                plano.executar((op,), draw, cores)
+                continue
+            mascara = next(mascaras)
+            if mascara is None:
+                continue
+            _, x, y, _, fonte, cor = op
+            imagem, dx, dy = mascara
+            y = glifos.atlas.da_fonte(_fonte(fonte)).pixel_y(y)
+            glifos.colar(pagina, (int(x) + dx + deslocamento, y + dy + deslocamento), imagem, plano._cor(cor, cores))
+
+    def executar(self, ops, img, draw, cores, deslocamento=0):
+        """
+        Como plano.executar(ops, draw, cores), colando os textos das células em
+        `img` (a imagem de `draw`; `deslocamento` é a sangria que o draw soma às coordenadas).
+        """
+        if not self.ativo:
+            plano.executar(ops, draw, cores)
+            return
+        soltas, grupos = agrupar(ops)
+        plano.executar(soltas, draw, cores)
+        pagina = ImageDraw.Draw(img)
+        diretas = 0
+        for _, grupo in grupos:
+            ladrilho = self.ladrilho(grupo)
+            if ladrilho is None:
+                diretas += 1
+                plano.executar(grupo, draw, cores)
+            else:
+                self.colar(grupo, ladrilho, draw, pagina, cores, deslocamento)
+        if diretas:
+            with self._lock:
+                self.diretas += diretas
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'ativo': self.ativo,
+                'hits': self.hits,
+                'misses': self.misses,
+                'diretas': self.diretas,
+                'taxa_acerto': round(self.hits / consultas, 4) if consultas else 0.0,
+                'ladrilhos': len(self._ladrilhos),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._ladrilhos.clear()
+            self.total_bytes = 0
+            self.hits = self.misses = self.diretas = 0
+
+
+# Instância global (por processo)
+cache = CacheCelulas(cache_render._env_mb('POSTER_CELULAS_MB', 64))
+
+
+def executar(ops, img, draw, cores, deslocamento=0):
+    return cache.executar(ops, img, draw, cores, deslocamento)
+
+
+def estatisticas():
+    return cache.estatisticas()
@@ -0,0 +1,13 @@
+import pytest
+
+import plano
+import poster_black
+
+
+@pytest.fixture
+def sem_caches_de_layout(monkeypatch):
+    """Planos e modelos calculados de novo (nada do cache em memória ou em disco): o render reflete o código atual."""
+    monkeypatch.setattr(plano, 'planos', plano.CachePlanos())
+    poster_black.obter_modelo.cache_clear()
+    yield
+    poster_black.obter_modelo.cache_clear()
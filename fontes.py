@@ -0,0 +1,157 @@
+"""
+Registro de fontes com cache.
+
+Resolve os caminhos das fontes uma única vez (na importação do módulo) e
+mantém os objetos FreeTypeFont já carregados em um LRU limitado, chaveado
+por (caminho, tamanho). Assim o gerador não precisa abrir o .ttf
+do disco a cada chamada de get_font / caber_texto_na_caixa.
+
+Além das fontes do sistema (Arial / DejaVu / FreeSans), também lê as fontes
+empacotadas em assets/fonts (Anton, BebasNeue, Poppins, Lato...).
+"""
+import glob
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import ImageFont
+
+import perfil
+
+FONTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'fonts')
+
+# Ordem de preferência das fontes do sistema (mesma ordem histórica do get_font_path)
+SYSTEM_FONTS = {
+    True: ["arialbd.ttf", "DejaVuSans-Bold.ttf", "FreeSansBold.ttf"],
+    False: ["arial.ttf", "DejaVuSans.ttf", "FreeSans.ttf"],
+}
+
+# Família empacotada usada quando nenhuma fonte do sistema foi encontrada
+FAMILIA_RESERVA = 'Lato'
+
+# Quantidade máxima de FreeTypeFont mantidos em memória
+MAX_FONTES_CACHE = 256
+
+
+def _mapear_familias(pasta):
+    """Lê assets/fonts/*.ttf e monta {familia: {'regular': caminho, 'bold': caminho}}."""
+    familias = {}
+    for path in sorted(glob.glob(os.path.join(pasta, '*.ttf'))):
+        nome = os.path.splitext(os.path.basename(path))[0]
+        familia, _, estilo = nome.partition('-')
+        estilos = familias.setdefault(familia, {})
+        if estilo.lower() == 'bold':
+            estilos['bold'] = path
+        else:
+            estilos.setdefault('regular', path)
+    # Famílias com um único peso (Anton, BebasNeue...) usam o mesmo arquivo para os dois
+    for estilos in familias.values():
+        estilos.setdefault('regular', estilos.get('bold'))
+        estilos.setdefault('bold', estilos.get('regular'))
+    return familias
+
+
+def _resolver_sistema(options):
+    """Retorna o caminho absoluto da primeira fonte que o FreeType consegue abrir."""
+    for font in options:
+        try:
+            return ImageFont.truetype(font, 10).path  # Teste rápido (feito uma única vez)
+        except IOError:
+            continue
+    return None
+
+
+class RegistroFontes:
+    """Resolve caminhos de fonte e guarda as fontes carregadas em um LRU."""
+
+    def __init__(self, pasta=FONTS_DIR, max_fontes=MAX_FONTES_CACHE):
+        self.max_fontes = max_fontes
+        self.familias = _mapear_familias(pasta)
+        self._padrao = {}
+        for bold, options in SYSTEM_FONTS.items():
+            path = _resolver_sistema(options)
+            if path is None:
+                path = self.familias.get(FAMILIA_RESERVA, {}).get('bold' if bold else 'regular')
+            self._padrao[bold] = path
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def caminho(self, bold=False, familia=None):
+        """Caminho do .ttf para o peso/família pedidos (None se não houver nenhuma fonte)."""
+        if familia:
+            estilos = self.familias.get(familia)
+            if estilos:
+                return estilos['bold' if bold else 'regular']
+        return self._padrao[bool(bold)]
+
+    def fonte(self, size, bold=False, familia=None):
+        """Retorna a FreeTypeFont do tamanho pedido, carregando do disco só na primeira vez."""
+        path = self.caminho(bold, familia)
+        if path is None:
+            return ImageFont.load_default()
+        return self.do_arquivo(path, size)
+
+    def do_arquivo(self, path, size):
+        """FreeTypeFont de um .ttf já resolvido (ex.: o caminho gravado num plano de layout)."""
+        key = (path, int(size))
+        with self._lock:
+            font = self._cache.get(key)
+            if font is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return font
+            self.misses += 1
+
+        try:
+            with perfil.etapa('fontes'):
+                font = ImageFont.truetype(path, int(size))
+        except IOError:
+            return ImageFont.load_default()
+
+        with self._lock:
+            self._cache[key] = font
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_fontes:
+                self._cache.popitem(last=False)
+        return font
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'fontes_em_cache': len(self._cache),
+                'capacidade': self.max_fontes,
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Instância global usada pelo gerador (resolvida na importação)
+registro = RegistroFontes()
+
+
+def caminho_fonte(bold=False, familia=None):
+    return registro.caminho(bold, familia)
+
+
+def carregar_fonte(size, bold=False, familia=None):
+    return registro.fonte(size, bold, familia)
+
+
+def fonte_do_arquivo(path, size):
+    return registro.do_arquivo(path, size)
+
+
+def familias_disponiveis():
+    return sorted(registro.familias)
+
+
+def estatisticas():
+    return registro.estatisticas()
@@ -0,0 +1,265 @@
+"""
+Atlas de glifos dos preços.
+
+Preços e rótulos ("R$ 12,99", "DE:", "POR:") só usam os CARACTERES abaixo e são
+os maiores textos do cartaz. O atlas rasteriza cada caractere uma vez por
+(fonte, tamanho) como máscara alfa, guarda avanços e kerning, e monta a string
+colando as máscaras: o FreeType não desenha os mesmos dígitos de novo a cada preço.
+
+O resultado é idêntico ao draw.text do Pillow (layout básico, modo 'L'):
+- com hinting, o glifo sai sempre igual; a fração da posição só decide se ele
+  anda 1 px (o Pillow arredonda a posição em 1/64 de pixel; o limiar de cada
+  eixo é medido por fonte);
+- glifos que se sobrepõem são combinados como o Pillow faz: novo + fundo * (255 - novo) / 255.
+Quando algo foge disso (outro layout de texto, fonte bitmap, avanços fracionários,
+coordenada negativa, caractere fora do conjunto), texto() devolve False e quem
+chamou usa draw.text. O cache de células (celulas.py) monta as máscaras dos
+preços com os mesmos glifos (AtlasFonte.caixas + montar).
+
+Colar uma máscara usa o interior do ImageDraw (_getink e draw_bitmap), só em
+colar(); as versões do Pillow em que isso foi conferido estão no requirements.txt.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageFont, ImageMath
+
+CARACTERES = frozenset('0123456789,.R$DEPO: ')
+
+# Atlas (um por fonte e tamanho) mantidos em memória
+MAX_ATLAS = 64
+
+# POSTER_GLIFOS=0 desliga o atlas (tudo volta para draw.text)
+ATIVO = os.environ.get('POSTER_GLIFOS', '1') != '0'
+
+def _combinar(fundo, glifo):
+    """Sobreposição de dois glifos como no Pillow (MULDIV255 arredondado)."""
+    def expressao(a):
+        t = a['fundo'] * (255 - a['glifo']) + 128
+        return a['convert'](a['glifo'] + ((t + (t >> 8)) >> 8), 'L')
+    return ImageMath.lambda_eval(expressao, fundo=fundo, glifo=glifo)
+
+
+def _fase(fracao, limiar):
+    """1 se a posição anda um pixel (fração arredondada em 1/64 de pixel), senão 0."""
+    return 1 if math.floor(fracao * 64 + 0.5) >= limiar else 0
+
+
+def _sobrepostos(caixas):
+    return any(a[3] > b[1] and b[3] > a[1] and a[4] > b[2] and b[4] > a[2]
+               for i, a in enumerate(caixas) for b in caixas[:i])
+
+
+def montar(caixas):
+    """
+    (máscara 'L', x, y) da string a partir das caixas dos glifos (AtlasFonte.caixas),
+    combinando as sobreposições como o FreeType do Pillow; None se não houver pixels.
+    """
+    if not caixas:
+        return None
+    bx, by = min(c[1] for c in caixas), min(c[2] for c in caixas)
+    tela = Image.new('L', (max(c[3] for c in caixas) - bx, max(c[4] for c in caixas) - by))
+    sobrepostos = _sobrepostos(caixas)
+    for mascara, x0, y0, x1, y1 in caixas:
+        caixa = (x0 - bx, y0 - by, x1 - bx, y1 - by)
+        tela.paste(_combinar(tela.crop(caixa), mascara) if sobrepostos else mascara, caixa[:2])
+    return tela, bx, by
+
+
+def colar(draw, xy, mascara, fill):
+    """Pinta a máscara 'L' em `draw` com `fill`, como o draw.text faz com a máscara do FreeType."""
+    draw.draw.draw_bitmap(xy, mascara.im, draw._getink(fill)[0])
+
+
+class AtlasFonte:
+    """Máscaras (recortadas na caixa do glifo), avanços e kerning de uma fonte."""
+
+    def __init__(self, fonte):
+        self.fonte = fonte
+        self._glifos = {}
+        self._larguras = {}
+        self._limiares = None
+
+    def largura(self, texto):
+        largura = self._larguras.get(texto)
+        if largura is None:
+            largura = self._larguras[texto] = self.fonte.getlength(texto)
+        return largura
+
+    def avancos(self, texto):
+        """Posição (px inteiros) de cada caractere, ou None se o layout não for em pixels inteiros."""
+        posicoes = []
+        pen = 0.0
+        anterior = None
+        for ch in texto:
+            if anterior is not None:
+                # Avanço do anterior + kerning do par (o layout básico soma os dois)
+                pen += self.largura(anterior + ch) - self.largura(ch)
+            posicoes.append(pen)
+            anterior = ch
+        if any(p != int(p) for p in posicoes):
+            return None
+        return [int(p) for p in posicoes]
+
+    def origem(self, texto, x, y):
+        """
+        Pixel em que o Pillow põe a origem de `texto` desenhado em (x, y), ou None
+        se o layout não for em pixels inteiros (aí a fração muda mais que a posição).
+        """
+        if self.avancos(texto) is None:
+            return None
+        return int(x) + self.fase_x(math.modf(x)[0]), self.pixel_y(y)
+
+    def fase_x(self, fracao):
+        """1 se um texto desenhado em x com essa fração começa um pixel depois de int(x)."""
+        return _fase(fracao, self.limiares()[0])
+
+    def pixel_y(self, y):
+        """Linha em que o Pillow põe a origem de um texto desenhado em y (a fração só anda 1 px)."""
+        return int(y) + _fase(math.modf(y)[0], self.limiares()[1])
+
+    def limiares(self):
+        """
+        Fração (em 1/64 de pixel) a partir da qual x e y andam um pixel. O Pillow
+        arredonda x e y de jeitos diferentes (y passa pela ascendente da fonte),
+        então o limiar é medido uma vez por fonte em vez de suposto.
+        """
+        if self._limiares is None:
+            self._limiares = (self._limiar(0), self._limiar(1))
+        return self._limiares
+
+    def _limiar(self, eixo):
+        def caixa(k):
+            img = Image.new('L', (4 * self.fonte.size, 4 * self.fonte.size))
+            pos = [self.fonte.size, self.fonte.size]
+            pos[eixo] += k / 64
+            ImageDraw.Draw(img).text(tuple(pos), 'P', font=self.fonte, fill=255)
+            return img.getbbox()[eixo]
+        base = caixa(0)
+        inicio, fim = 1, 64  # busca binária do primeiro k que desloca (64 = nunca)
+        while inicio < fim:
+            meio = (inicio + fim) // 2
+            if caixa(meio) != base:
+                fim = meio
+            else:
+                inicio = meio + 1
+        return inicio
+
+    def caixas(self, texto, ox, oy):
+        """
+        Glifos de `texto` com a origem no pixel (ox, oy): [(máscara, x0, y0, x1, y1), ...],
+        ou None se o layout não for em pixels inteiros.
+        """
+        posicoes = self.avancos(texto)
+        if posicoes is None:
+            return None
+        caixas = []
+        for ch, pen in zip(texto, posicoes):
+            glifo = self.glifo(ch)
+            if glifo is not None:
+                mascara, dx, dy = glifo
+                x0, y0 = ox + pen + dx, oy + dy
+                caixas.append((mascara, x0, y0, x0 + mascara.width, y0 + mascara.height))
+        return caixas
+
+    def glifo(self, ch):
+        """(máscara 'L', dx, dy) do caractere desenhado na origem, ou None se não tiver pixels."""
+        if ch not in self._glifos:
+            x0, y0, x1, y1 = self.fonte.getbbox(ch)
+            mascara = None
+            if x1 > x0 and y1 > y0:
+                img = Image.new('L', (x1 - x0, y1 - y0))
+                # Tinta 255 sobre 0: a imagem é exatamente a máscara que o draw.text usaria
+                ImageDraw.Draw(img).text((-x0, -y0), ch, font=self.fonte, fill=255)
+                caixa = img.getbbox()
+                if caixa is not None:
+                    mascara = (img.crop(caixa), x0 + caixa[0], y0 + caixa[1])
+            self._glifos[ch] = mascara
+        return self._glifos[ch]
+
+    def __len__(self):
+        return len(self._glifos)
+
+
+class AtlasGlifos:
+    """LRU de AtlasFonte por (caminho, tamanho) da fonte."""
+
+    def __init__(self, max_atlas=MAX_ATLAS, ativo=ATIVO):
+        self.max_atlas = max_atlas
+        self.ativo = ativo
+        self._atlas = OrderedDict()
+        self._lock = threading.Lock()
+        self.textos = 0
+        self.recusados = 0
+
+    def da_fonte(self, fonte):
+        chave = (fonte.path, fonte.size)
+        with self._lock:
+            atlas = self._atlas.get(chave)
+            if atlas is None:
+                atlas = self._atlas[chave] = AtlasFonte(fonte)
+                while len(self._atlas) > self.max_atlas:
+                    self._atlas.popitem(last=False)
+            else:
+                self._atlas.move_to_end(chave)
+            return atlas
+
+    def texto(self, draw, xy, texto, fonte, fill):
+        """Desenha `texto` em `draw` como draw.text faria. False se não puder (use draw.text)."""
+        if not self.ativo or not texto or not CARACTERES.issuperset(texto):
+            return False  # Nomes e descrições: não é com o atlas
+        x, y = xy
+        if (x < 0 or y < 0
+                or type(draw) is not ImageDraw.ImageDraw or draw.fontmode != 'L'
+                or not isinstance(fonte, ImageFont.FreeTypeFont)
+                or fonte.layout_engine != ImageFont.Layout.BASIC):
+            with self._lock:
+                self.recusados += 1
+            return False
+        atlas = self.da_fonte(fonte)
+        origem = atlas.origem(texto, x, y)
+        caixas = atlas.caixas(texto, *origem) if origem is not None else None
+        if caixas is None:
+            with self._lock:
+                self.recusados += 1
+            return False
+
+        if not _sobrepostos(caixas):
+            for mascara, x0, y0, _, _ in caixas:
+                colar(draw, (x0, y0), mascara, fill)
+        else:
+            # Monta a string numa máscara só, combinando as sobreposições
+            tela, bx, by = montar(caixas)
+            colar(draw, (bx, by), tela, fill)
+        with self._lock:
+            self.textos += 1
+        return True
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'ativo': self.ativo,
+                'textos': self.textos,
+                'recusados': self.recusados,
+                'fontes': len(self._atlas),
+                'glifos': sum(len(a) for a in self._atlas.values()),
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._atlas.clear()
+            self.textos = self.recusados = 0
+
+
+# Instância global (por processo)
+atlas = AtlasGlifos()
+
+
+def texto(draw, xy, texto, fonte, fill):
+    return atlas.texto(draw, xy, texto, fonte, fill)
+
+
+def estatisticas():
+    return atlas.estatisticas()
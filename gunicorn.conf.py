@@ -0,0 +1,29 @@
+"""
+Configuração do gunicorn no modo pré-carregado (Linux/macOS).
+
+    gunicorn -c gunicorn.conf.py app:app
+
+O app é importado e aquecido (app.preaquecer) uma vez no processo mestre, antes
+do fork: fontes, caches de ajuste de texto e as camadas base dos temas de
+POSTER_PRELOAD_TEMAS ficam em páginas de memória compartilhadas (copy-on-write)
+por todos os workers, e a primeira requisição de cada worker não paga o
+aquecimento. Os planos de layout são compartilhados pelo disco (ver plano.py).
+
+    POSTER_BIND           endereço (padrão: 0.0.0.0:5050)
+    WEB_CONCURRENCY       workers (padrão: nº de CPUs)
+    POSTER_PRELOAD_TEMAS  temas aquecidos no mestre, separados por vírgula, ou
+                          'todos' (padrão: blackfriday, o tema inicial do formulário)
+"""
+import os
+
+bind = os.environ.get('POSTER_BIND', '0.0.0.0:5050')
+workers = int(os.environ.get('WEB_CONCURRENCY', 0)) or os.cpu_count() or 1
+preload_app = True
+# PDFs grandes saem em streaming e podem levar mais que os 30 s padrão
+timeout = 120
+
+
+def when_ready(server):
+    # Roda no mestre depois do preload e antes de criar os workers
+    import app
+    app.preaquecer()
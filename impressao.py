@@ -0,0 +1,163 @@
+"""
+Modo de impressão: páginas em alta resolução (300-600 DPI) com sangria e marcas de corte.
+
+Uma página A4 inteira a 600 DPI ocupa ~100 MB em RGB. Aqui a página nunca existe
+inteira em memória: ela é desenhada em faixas horizontais (cada uma com no máximo
+BYTES_FAIXA) e cada faixa vai direto para o compressor do PNG / do PDF. O pico de
+memória depende só da largura da página, não da altura nem do número de páginas.
+
+Folha de impressão (de fora para dentro):
+- área de marcas (branca), só com marcas_corte=True;
+- sangria (bleed_mm): o fundo do cartaz continua além do corte;
+- o A4 (TrimBox no PDF), com o mesmo layout do modo padrão.
+
+    for parte in impressao.pdf_em_partes(grupos, dpi=300, bleed_mm=3):
+        arquivo.write(parte)
+"""
+import struct
+import zlib
+
+from PIL import Image, ImageChops, ImageDraw
+
+import pdf_stream
+import perfil
+import plano
+import poster_black
+
+DPI_IMPRESSAO = 300
+SANGRIA_MM = 3          # Sangria padrão das gráficas
+MARCA_MM = 5            # Comprimento de cada marca de corte
+AFASTAMENTO_MARCA_MM = 2  # Distância mínima entre a marca e o corte (se a sangria for menor)
+BYTES_FAIXA = 4 * 1024 * 1024   # Tamanho máximo (RGB) de cada faixa desenhada
+COR_MARCAS = (0, 0, 0)
+COR_FOLHA = (255, 255, 255)
+
+# Filtro PNG "Sub" (cada byte menos o do pixel à esquerda), aplicado a todas as linhas
+_FILTRO_SUB = b'\x01'
+
+
+class PaginaImpressao:
+    """
+    Uma página no modo de impressão.
+
+    Os parâmetros de aparência são os mesmos do poster_black.renderizar_poster;
+    `marcas_corte` acrescenta a área branca com as marcas em volta da sangria.
+    """
+
+    def __init__(self, ofertas, layout_mode='list', marcas_corte=True, bytes_faixa=BYTES_FAIXA,
+                 dpi=None, bleed_mm=SANGRIA_MM, **kwargs):
+        self.ofertas = ofertas
+        self.layout_mode = layout_mode
+        self.modelo = modelo = poster_black.obter_modelo(dpi=dpi or DPI_IMPRESSAO, bleed_mm=bleed_mm, **kwargs)
+        self.dpi = modelo.dpi
+        s = modelo.sangria
+        # O layout é calculado uma vez; cada faixa só executa o plano
+        plano_pagina = poster_black.obter_plano(ofertas, layout_mode, **modelo.parametros)
+        self.ops = plano_pagina.base + plano_pagina.fundos + plano_pagina.produtos
+
+        if marcas_corte:
+            self.afastamento = max(s, poster_black.mm_para_px(AFASTAMENTO_MARCA_MM, self.dpi))
+            self.comprimento_marca = poster_black.mm_para_px(MARCA_MM, self.dpi)
+            self.folga = self.afastamento + self.comprimento_marca
+        else:
+            self.afastamento = self.comprimento_marca = 0
+            self.folga = s
+        self.largura = modelo.W + 2 * self.folga
+        self.altura = modelo.H + 2 * self.folga
+        self.linhas_por_faixa = max(16, bytes_faixa // (self.largura * 3))
+
+    def caixas(self):
+        """TrimBox e BleedBox em pixels (x0, y0, x1, y1), a partir do canto superior esquerdo."""
+        f, s, m = self.folga, self.modelo.sangria, self.modelo
+        return {
+            'TrimBox': (f, f, f + m.W, f + m.H),
+            'BleedBox': (f - s, f - s, f + m.W + s, f + m.H + s),
+        }
+
+    def _desenhar_marcas(self, draw, topo):
+        espessura = max(1, round(self.dpi * 0.25 / 72))  # 0,25 pt
+        f, a, c = self.folga, self.afastamento, self.comprimento_marca
+        for x in (f, f + self.modelo.W):
+            for y in (f, f + self.modelo.H):
+                lado_x = -1 if x == f else 1
+                lado_y = -1 if y == f else 1
+                # Horizontal: na altura do corte, para fora da página
+                x0, x1 = sorted((x + lado_x * a, x + lado_x * (a + c)))
+                draw.line((x0, y - topo, x1, y - topo), fill=COR_MARCAS, width=espessura)
+                # Vertical: na linha do corte, para cima/baixo da página
+                y0, y1 = sorted((y + lado_y * a, y + lado_y * (a + c)))
+                draw.line((x, y0 - topo, x, y1 - topo), fill=COR_MARCAS, width=espessura)
+
+    def faixas(self):
+        """Gerador das faixas (imagens RGB de largura total) de cima para baixo."""
+        m = self.modelo
+        x0_sangria, y0_sangria, x1_sangria, y1_sangria = self.caixas()['BleedBox']
+        origem = self.folga
+        for topo in range(0, self.altura, self.linhas_por_faixa):
+            h = min(self.linhas_por_faixa, self.altura - topo)
+            with perfil.etapa('desenho'):
+                img = Image.new('RGB', (self.largura, h), COR_FOLHA if self.comprimento_marca else m.c_bg)
+                draw = ImageDraw.Draw(img)
+                if self.comprimento_marca:
+                    draw.rectangle([x0_sangria, y0_sangria - topo, x1_sangria - 1, y1_sangria - topo - 1], fill=m.c_bg)
+                    self._desenhar_marcas(draw, topo)
+
+                # Mesma ordem do modo padrão: base, fundos do layout e produtos
+                pincel = poster_black.DesenhoDeslocado(img, origem, origem - topo, altura=h)
+                plano.executar(self.ops, pincel, m.cores)
+            yield img
+
+    def idat_em_partes(self, nivel=6):
+        """Fluxo zlib das linhas filtradas (o conteúdo dos IDAT), em pedaços, faixa a faixa."""
+        comp = zlib.compressobj(nivel)
+        passo = self.largura * 3
+        for faixa in self.faixas():
+            with perfil.etapa('codificacao'):
+                # Sub: subtrai de cada pixel o vizinho da esquerda (a 1ª coluna subtrai zero)
+                vizinhos = Image.new('RGB', faixa.size)
+                vizinhos.paste(faixa.crop((0, 0, self.largura - 1, faixa.height)), (1, 0))
+                dados = ImageChops.subtract_modulo(faixa, vizinhos).tobytes()
+                linhas = b''.join(_FILTRO_SUB + dados[i:i + passo] for i in range(0, len(dados), passo))
+                parte = comp.compress(linhas)
+            if parte:
+                yield parte
+        yield comp.flush()
+
+    def png_em_partes(self):
+        """O PNG da página em pedaços (cabeçalho, um IDAT por faixa comprimida, IEND)."""
+        pixels_por_metro = round(self.dpi / 0.0254)
+        yield (pdf_stream.PNG_SIGNATURE
+               + _chunk(b'IHDR', struct.pack('>IIBBBBB', self.largura, self.altura, 8, 2, 0, 0, 0))
+               + _chunk(b'pHYs', struct.pack('>IIB', pixels_por_metro, pixels_por_metro, 1)))
+        for parte in self.idat_em_partes():
+            if parte:
+                yield _chunk(b'IDAT', parte)
+        yield _chunk(b'IEND', b'')
+
+
+def _chunk(tipo, dados):
+    return struct.pack('>I', len(dados)) + tipo + dados + struct.pack('>I', zlib.crc32(tipo + dados))
+
+
+def png_em_partes(ofertas, **kwargs):
+    """PNG de uma página no modo de impressão, em pedaços (ver PaginaImpressao)."""
+    return PaginaImpressao(ofertas, **kwargs).png_em_partes()
+
+
+def pdf_em_partes(grupos, **kwargs):
+    """
+    PDF de impressão com uma página por grupo de ofertas, em pedaços. Cada página
+    leva TrimBox/BleedBox para o RIP da gráfica saber onde cortar.
+    """
+    saida = pdf_stream.Pedacos()
+    escritor = pdf_stream.EscritorPDF(saida, dpi=kwargs.get('dpi') or DPI_IMPRESSAO)
+    for grupo in grupos:
+        pagina = PaginaImpressao(grupo, **kwargs)
+        for _ in escritor.adicionar_pagina_em_partes(pagina.largura, pagina.altura, pagina.idat_em_partes(),
+                                                     caixas=pagina.caixas()):
+            dados = saida.esvaziar()
+            if dados:
+                yield dados
+    with perfil.etapa('pdf'):
+        escritor.fechar()
+    yield saida.esvaziar()
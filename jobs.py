@@ -0,0 +1,250 @@
+"""
+Fila de jobs assíncronos para lotes grandes de cartazes.
+
+Um job recebe as ofertas já lidas e os parâmetros de renderização, roda num pool
+local de threads (as páginas em si vão para o pool de processos do
+render_paralelo) e grava o PDF direto no disco, página a página. Não há broker
+externo: o estado de cada job fica em <POSTER_JOBS_DIR>/<id>/job.json, então
+qualquer processo do servidor consegue consultar o progresso, baixar o
+resultado ou pedir o cancelamento.
+
+Configuração por variáveis de ambiente:
+    POSTER_JOBS_DIR      pasta dos jobs (padrão: <tmp>/poster_black_jobs)
+    POSTER_JOBS_WORKERS  jobs simultâneos neste processo (padrão: 2)
+    POSTER_JOBS_TTL      segundos que um job finalizado fica disponível (padrão: 3600)
+    POSTER_JOBS_PARADO   segundos sem sinal de vida até um job rodando ser dado
+                         como interrompido (padrão: 600)
+
+Cada job guarda o processo que o executa (host e pid) e, enquanto roda, a hora
+da última página gravada (batida_em). Um job cujo processo morreu (restart,
+worker reciclado) ou que ficou parado além de POSTER_JOBS_PARADO vira 'falhou'
+em limpar_expirados e expira como os outros.
+"""
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import cache_render
+import impressao
+import pdf_stream
+from render_paralelo import iterar_paginas
+
+JOBS_DIR = os.environ.get('POSTER_JOBS_DIR') or os.path.join(tempfile.gettempdir(), 'poster_black_jobs')
+JOBS_WORKERS = int(os.environ.get('POSTER_JOBS_WORKERS', 2))
+JOBS_TTL = int(os.environ.get('POSTER_JOBS_TTL', 3600))
+JOBS_PARADO = int(os.environ.get('POSTER_JOBS_PARADO', 600))
+
+ARTEFATO = 'cartazes_ofertas.pdf'
+
+# Estados possíveis
+NA_FILA = 'na_fila'
+RODANDO = 'rodando'
+CONCLUIDO = 'concluido'
+FALHOU = 'falhou'
+CANCELADO = 'cancelado'
+FINALIZADOS = (CONCLUIDO, FALHOU, CANCELADO)
+
+
+class JobCancelado(Exception):
+    pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOBS_WORKERS, thread_name_prefix='poster-job')
+        return _executor
+
+
+def _pasta(job_id):
+    # O id vem da URL: aceita só o formato gerado aqui
+    if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+        raise KeyError(job_id)
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def _gravar_estado(job_id, estado):
+    path = os.path.join(_pasta(job_id), 'job.json')
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def status(job_id):
+    """Estado do job (dict) ou None se não existir/expirou."""
+    try:
+        with open(os.path.join(_pasta(job_id), 'job.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (KeyError, OSError, ValueError):
+        return None
+
+
+def caminho_artefato(job_id):
+    """Caminho do PDF de um job concluído (ou None)."""
+    estado = status(job_id)
+    if not estado or estado['status'] != CONCLUIDO:
+        return None
+    return os.path.join(_pasta(job_id), ARTEFATO)
+
+
+def cancelar(job_id):
+    """Pede o cancelamento; o job para antes da próxima página. Retorna False se o job não existe."""
+    estado = status(job_id)
+    if estado is None:
+        return False
+    if estado['status'] not in FINALIZADOS:
+        open(os.path.join(_pasta(job_id), 'cancelar'), 'w').close()
+    return True
+
+
+def _cancelamento_pedido(job_id):
+    return os.path.exists(os.path.join(_pasta(job_id), 'cancelar'))
+
+
+def _processo_vivo(estado):
+    """False se o processo que executa o job (neste host) não existe mais."""
+    if estado.get('host') != socket.gethostname() or not estado.get('pid'):
+        return True  # Outro host: só a batida diz se está parado
+    try:
+        os.kill(estado['pid'], 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # Existe, mas é de outro usuário
+    return True
+
+
+def _interrompido(estado, agora):
+    """True se o job não finalizado não vai mais andar (processo morto ou sem batida há JOBS_PARADO s)."""
+    if not _processo_vivo(estado):
+        return True
+    return estado['status'] == RODANDO and agora - (estado.get('batida_em') or agora) > JOBS_PARADO
+
+
+def limpar_expirados(agora=None):
+    """
+    Marca como 'falhou' os jobs interrompidos e remove os finalizados há mais de
+    JOBS_TTL segundos (e seus artefatos).
+    """
+    agora = agora or time.time()
+    if not os.path.isdir(JOBS_DIR):
+        return 0
+    removidos = 0
+    for job_id in os.listdir(JOBS_DIR):
+        estado = status(job_id)
+        if estado is None:
+            continue
+        if estado['status'] not in FINALIZADOS:
+            if not _interrompido(estado, agora):
+                continue
+            estado.update(status=FALHOU, erro='Job interrompido: o processo que o executava parou.',
+                          finalizado_em=agora)
+            _gravar_estado(job_id, estado)
+        if agora - (estado.get('finalizado_em') or agora) > JOBS_TTL:
+            shutil.rmtree(os.path.join(JOBS_DIR, job_id), ignore_errors=True)
+            removidos += 1
+    return removidos
+
+
+def _paginas_impressao(escritor, grupos, opcoes_render, opcoes_impressao):
+    """Modo gráfica: cada página vai em faixas direto para o arquivo (ver impressao.py)."""
+    for indice, grupo in enumerate(grupos):
+        pagina = impressao.PaginaImpressao(grupo, **opcoes_render, **opcoes_impressao)
+        for _ in escritor.adicionar_pagina_em_partes(pagina.largura, pagina.altura,
+                                                     pagina.idat_em_partes(), caixas=pagina.caixas()):
+            pass
+        yield indice, False
+
+
+def _paginas_renderizadas(escritor, grupos, opcoes_render, opcoes_formato=None):
+    """Páginas do pool de processos (e do cache), gravadas na ordem: (índice, reaproveitada)."""
+    resultados = iterar_paginas(grupos, formato='PNG', opcoes_formato=opcoes_formato, cache=cache_render.cache,
+                                **opcoes_render)
+    try:
+        for resultado in resultados:
+            if resultado.erro:
+                raise RuntimeError(f"Falha ao gerar a página {resultado.indice + 1}: {resultado.erro}")
+            escritor.adicionar_pagina(resultado.dados)
+            yield resultado.indice, resultado.reaproveitada
+    finally:
+        resultados.close()
+
+
+def _executar(job_id, grupos, opcoes_render, opcoes_impressao=None, opcoes_formato=None):
+    estado = status(job_id)
+    estado.update(status=RODANDO, iniciado_em=time.time(), batida_em=time.time())
+    _gravar_estado(job_id, estado)
+
+    pasta = _pasta(job_id)
+    parcial = os.path.join(pasta, ARTEFATO + '.parcial')
+    try:
+        if _cancelamento_pedido(job_id):
+            raise JobCancelado()
+        with open(parcial, 'wb') as f:
+            if opcoes_impressao:
+                escritor = pdf_stream.EscritorPDF(f, dpi=opcoes_impressao['dpi'])
+                feitas = _paginas_impressao(escritor, grupos, opcoes_render, opcoes_impressao)
+            else:
+                escritor = pdf_stream.EscritorPDF(f, dpi=opcoes_render.get('dpi') or 150)
+                feitas = _paginas_renderizadas(escritor, grupos, opcoes_render, opcoes_formato)
+            for indice, reaproveitada in feitas:
+                estado.update(paginas_feitas=indice + 1, batida_em=time.time())
+                if reaproveitada:
+                    estado['paginas_reaproveitadas'].append(indice + 1)
+                _gravar_estado(job_id, estado)
+                if _cancelamento_pedido(job_id):
+                    feitas.close()
+                    raise JobCancelado()
+            escritor.fechar()
+        os.replace(parcial, os.path.join(pasta, ARTEFATO))
+        estado['status'] = CONCLUIDO
+    except JobCancelado:
+        estado['status'] = CANCELADO
+    except Exception as e:
+        estado.update(status=FALHOU, erro=f"{type(e).__name__}: {e}")
+    finally:
+        if os.path.exists(parcial):
+            os.remove(parcial)
+        estado['finalizado_em'] = time.time()
+        _gravar_estado(job_id, estado)
+
+
+def submeter(grupos, opcoes_impressao=None, opcoes_formato=None, **opcoes_render):
+    """
+    Cria um job para renderizar os grupos (páginas) e retorna o id.
+    O trabalho começa em segundo plano; acompanhe com status(id).
+    `opcoes_impressao` (dpi, bleed_mm, marcas_corte) liga o modo gráfica do impressao.py;
+    `opcoes_formato` vai para o codificador das páginas (ex.: {'compacto': True}).
+    """
+    limpar_expirados()
+    grupos = list(grupos)
+    job_id = uuid.uuid4().hex
+    os.makedirs(_pasta(job_id))
+    _gravar_estado(job_id, {
+        'id': job_id,
+        'status': NA_FILA,
+        'paginas_feitas': 0,
+        'paginas_total': len(grupos),
+        'paginas_reaproveitadas': [],
+        'criado_em': time.time(),
+        'iniciado_em': None,
+        'batida_em': None,
+        'finalizado_em': None,
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+        'erro': None,
+    })
+    _pool().submit(_executar, job_id, grupos, opcoes_render, opcoes_impressao, opcoes_formato)
+    return job_id
@@ -0,0 +1,288 @@
+"""
+Lote multi-loja: um catálogo, várias lojas (cada uma com seu tema), numa passada só.
+
+A planilha de lojas tem uma linha por loja:
+
+    loja,tema,titulo,vigencia,estoques,bg,text,accent,badge
+    Centro,blackfriday,,,,,,,
+    Shopping Norte,natalino,OFERTAS DE NATAL,,,,,,
+
+Só `loja` é obrigatória; `tema` é uma chave de poster_black.TEMAS e bg/text/
+accent/badge sobrescrevem as cores do tema. No catálogo, a coluna `local` diz
+a que loja a oferta pertence; ofertas com `local` vazio valem para todas.
+
+O que não depende do tema é feito uma vez para o lote inteiro: os planos de
+layout (ajuste de texto + posições, ver plano.py) de todas as páginas distintas
+são calculados no pool e enviados junto com as tarefas, então cada worker só
+executa os planos com as cores da loja e monta o PDF. Lojas com as mesmas
+ofertas compartilham os planos.
+
+    python lojas.py catalogo.csv lojas.csv -o cartazes.zip --layout gondola
+    python lojas.py catalogo.csv lojas.csv -o pasta_saida/ --workers 4
+
+Este módulo não depende do Flask.
+"""
+import argparse
+import csv
+import itertools
+import os
+import re
+import sys
+import time
+from collections import deque, namedtuple
+
+import cache_render
+import catalogo
+import pdf_stream
+import pdf_vetorial
+import paginacao
+import perfil
+import plano
+import poster_black
+import render_paralelo
+import zip_stream
+
+# Colunas da planilha de lojas que vão para os parâmetros de renderização
+COLUNAS_TEXTO = {'titulo': 'poster_title', 'vigencia': 'vigencia_text', 'estoques': 'aviso_estoques'}
+COLUNAS_COR = {'bg': 'bg_color', 'text': 'text_color', 'accent': 'accent_color', 'badge': 'badge_color'}
+
+FORMATOS = ('pdf', 'pdf_vetorial')
+
+Loja = namedtuple('Loja', ['nome', 'opcoes_render'])
+# dados: bytes do PDF (None se a loja falhou ou não tem ofertas); paginas: páginas do PDF
+ResultadoLoja = namedtuple('ResultadoLoja', ['indice', 'loja', 'arquivo', 'dados', 'erro', 'paginas', 'etapas'])
+
+
+def _chave_local(texto):
+    return (texto or '').strip().casefold()
+
+
+def ler_lojas(origem, temas=None):
+    """Lê a planilha de lojas (caminho ou stream binário) e devolve a lista de Loja."""
+    temas = poster_black.TEMAS if temas is None else temas
+    texto, aberto = catalogo._abrir_texto(origem)
+    try:
+        linhas = list(csv.DictReader(texto))
+    finally:
+        texto.close()
+        if aberto is not None:
+            aberto.close()
+
+    lojas = []
+    for n, linha in enumerate(linhas, start=2):
+        linha = {(k or '').strip().lower(): (v or '').strip() for k, v in linha.items()}
+        nome = linha.get('loja')
+        if not nome:
+            continue
+        opcoes = {}
+        tema = linha.get('tema')
+        if tema:
+            if tema not in temas:
+                raise ValueError(f"Linha {n}: tema desconhecido '{tema}' (disponíveis: {', '.join(sorted(temas))})")
+            opcoes.update({COLUNAS_COR[k]: v for k, v in temas[tema].items() if k in COLUNAS_COR})
+        for coluna, parametro in itertools.chain(COLUNAS_TEXTO.items(), COLUNAS_COR.items()):
+            if linha.get(coluna):
+                opcoes[parametro] = linha[coluna]
+        lojas.append(Loja(nome, opcoes))
+    return lojas
+
+
+def ofertas_por_loja(ofertas, lojas):
+    """{nome da loja: ofertas} usando a coluna `local` (vazia = todas as lojas), na ordem do catálogo."""
+    por_local = {_chave_local(loja.nome): [] for loja in lojas}
+    for oferta in ofertas:
+        local = _chave_local(oferta.get('local'))
+        if not local:
+            for lista in por_local.values():
+                lista.append(oferta)
+        elif local in por_local:
+            por_local[local].append(oferta)
+    return {loja.nome: por_local[_chave_local(loja.nome)] for loja in lojas}
+
+
+def nome_arquivo(loja, usados):
+    base = re.sub(r'[^\w.-]+', '_', loja).strip('_.') or 'loja'
+    nome = f"cartazes_{base}.pdf"
+    n = 2
+    while nome in usados:
+        nome = f"cartazes_{base}_{n}.pdf"
+        n += 1
+    usados.add(nome)
+    return nome
+
+
+def gerar_pdf(grupos, formato='pdf', **opcoes_render):
+    """PDF de uma loja (bytes). As páginas rasterizadas passam pelo cache_render."""
+    if formato == 'pdf_vetorial' and pdf_vetorial.disponivel():
+        return pdf_vetorial.montar_pdf(grupos, **opcoes_render)
+
+    def paginas():
+        for grupo in grupos:
+            chave = cache_render.chave_pagina(grupo, 'PNG', **opcoes_render)
+            dados = cache_render.cache.get(chave)
+            if dados is None:
+                dados = poster_black.renderizar_poster_bytes(grupo, 'PNG', **opcoes_render)
+                cache_render.cache.put(chave, dados)
+            yield dados
+    return pdf_stream.montar_pdf(paginas(), dpi=150)
+
+
+def _gerar_loja(tarefa):
+    indice, loja, arquivo, grupos, opcoes_render, formato, planos = tarefa
+    if not grupos:
+        return ResultadoLoja(indice, loja, arquivo, None, None, 0, None)
+    # Planos calculados por quem montou o lote: aqui só se executa o layout com as cores da loja
+    for chave, plano_pagina in planos:
+        plano.planos.put(chave, plano_pagina, em_disco=False)
+    with perfil.coletar() as etapas:
+        try:
+            dados, erro = gerar_pdf(grupos, formato, **opcoes_render), None
+        except Exception as e:
+            dados, erro = None, f"{type(e).__name__}: {e}"
+    return ResultadoLoja(indice, loja, arquivo, dados, erro, len(grupos), etapas.como_dict())
+
+
+def _parametros_plano(opcoes_render):
+    """(layout_mode, parâmetros sem as cores): o que decide o plano de layout de uma página."""
+    parametros = {k: v for k, v in opcoes_render.items()
+                  if k != 'layout_mode' and k not in poster_black.PARAMETROS_COR}
+    return opcoes_render.get('layout_mode', 'list'), parametros
+
+
+def _planejar(tarefas, workers):
+    """Calcula (no pool) os planos de todas as páginas distintas do lote e os anexa às tarefas."""
+    por_parametros = {}
+    for _, _, _, grupos, opcoes_render, _, _ in tarefas:
+        layout_mode, parametros = _parametros_plano(opcoes_render)
+        chave_parametros = (layout_mode, tuple(sorted(parametros.items())))
+        unicos = por_parametros.setdefault(chave_parametros, {})
+        for grupo in grupos:
+            unicos.setdefault(cache_render.chave_plano(grupo, layout_mode, **parametros), grupo)
+
+    planos = {}
+    for (layout_mode, parametros), unicos in por_parametros.items():
+        calculados = render_paralelo.planejar_catalogo(list(unicos.values()), workers, layout_mode, **dict(parametros))
+        planos.update(zip(unicos, calculados))
+
+    completas = []
+    for indice, loja, arquivo, grupos, opcoes_render, formato, _ in tarefas:
+        layout_mode, parametros = _parametros_plano(opcoes_render)
+        chaves = [cache_render.chave_plano(grupo, layout_mode, **parametros) for grupo in grupos]
+        completas.append((indice, loja, arquivo, grupos, opcoes_render, formato,
+                          [(chave, planos[chave]) for chave in chaves]))
+    return completas
+
+
+def gerar_lojas(ofertas, lojas, layout_mode='list', itens_por_pagina=None, formato='pdf',
+                workers=None, **opcoes_render):
+    """
+    Gerador de ResultadoLoja, na ordem de `lojas`, um PDF por loja.
+    `opcoes_render` vale para todas as lojas; o que vem da planilha (tema, textos) tem precedência.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconhecido: {formato}")
+    ofertas_lojas = ofertas_por_loja(ofertas, lojas)
+
+    usados = set()
+    tarefas = []
+    for indice, loja in enumerate(lojas):
+        opcoes = dict(opcoes_render, layout_mode=layout_mode, **loja.opcoes_render)
+        # Na paginação automática a geometria (título, vigência) de cada loja conta
+        grupos = list(paginacao.paginar(ofertas_lojas[loja.nome], itens_por_pagina, **opcoes))
+        tarefas.append((indice, loja.nome, nome_arquivo(loja.nome, usados), grupos, opcoes, formato, []))
+
+    workers = render_paralelo.numero_de_workers(workers)
+    tarefas = _planejar(tarefas, workers)
+
+    def concluir(resultado):
+        perfil.somar(resultado.etapas)
+        return resultado
+
+    if workers == 1 or len(tarefas) < 2:
+        for tarefa in tarefas:
+            yield concluir(_gerar_loja(tarefa))
+        return
+
+    pool = render_paralelo.obter_pool(workers)
+    pendentes = deque()
+    for tarefa in tarefas:
+        pendentes.append(pool.submit(_gerar_loja, tarefa))
+        if len(pendentes) >= workers * 2:
+            yield concluir(pendentes.popleft().result())
+    while pendentes:
+        yield concluir(pendentes.popleft().result())
+
+
+def zip_em_partes(resultados):
+    """
+    ZIP com um PDF por loja, em pedaços (um por loja, assim que fica pronta).
+    Os PDFs já são comprimidos: entram sem recompressão (ZIP_STORED).
+    Lojas que falharam viram uma linha em erros.txt.
+    """
+    def arquivos():
+        erros = []
+        for r in resultados:
+            if r.dados is not None:
+                yield r.arquivo, r.dados
+            elif r.erro:
+                erros.append(f"{r.loja}: {r.erro}")
+        if erros:
+            yield 'erros.txt', ('\n'.join(erros) + '\n').encode('utf-8')
+
+    return zip_stream.zip_em_partes(arquivos())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cartazes de um catálogo para várias lojas (um PDF por loja).")
+    parser.add_argument('catalogo', help="CSV de ofertas (produto, de, por, local); '-' lê da entrada padrão")
+    parser.add_argument('lojas', help='CSV de lojas (loja, tema, titulo, vigencia, estoques, bg, text, accent, badge)')
+    parser.add_argument('-o', '--saida', required=True, help='arquivo .zip ou pasta (um PDF por loja)')
+    parser.add_argument('--layout', default='list', choices=sorted(poster_black.ITENS_POR_PAGINA))
+    parser.add_argument('--itens', type=paginacao.itens_da_linha_de_comando,
+                        help="itens por página (padrão: o do layout; 'auto' empacota pela densidade dos nomes)")
+    parser.add_argument('--formato', default='pdf', choices=FORMATOS)
+    parser.add_argument('--workers', type=int, help='processos (padrão: POSTER_WORKERS ou nº de CPUs)')
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    ofertas = list(catalogo.iter_ofertas(sys.stdin.buffer if args.catalogo == '-' else args.catalogo))
+    lojas = ler_lojas(args.lojas)
+    resultados = gerar_lojas(ofertas, lojas, args.layout, args.itens, args.formato, args.workers)
+
+    feitas = falhas = 0
+    sem_ofertas = []
+    if args.saida.lower().endswith('.zip'):
+        def contar(resultados):
+            nonlocal feitas, falhas
+            for r in resultados:
+                feitas += r.dados is not None
+                falhas += r.erro is not None
+                if not r.paginas:
+                    sem_ofertas.append(r.loja)
+                yield r
+        with open(args.saida, 'wb') as f:
+            for parte in zip_em_partes(contar(resultados)):
+                f.write(parte)
+    else:
+        os.makedirs(args.saida, exist_ok=True)
+        for r in resultados:
+            if r.erro:
+                falhas += 1
+                print(f"{r.loja}: {r.erro}", file=sys.stderr)
+            elif r.dados is not None:
+                feitas += 1
+                with open(os.path.join(args.saida, r.arquivo), 'wb') as f:
+                    f.write(r.dados)
+            else:
+                sem_ofertas.append(r.loja)
+
+    duracao = time.perf_counter() - inicio
+    if sem_ofertas:
+        print(f"Sem ofertas (nenhum PDF): {', '.join(sem_ofertas)}", file=sys.stderr)
+    print(f"{feitas} lojas em {duracao:.1f}s ({feitas / duracao * 60:.0f} lojas/min), "
+          f"{falhas} falhas, {len(ofertas)} ofertas", file=sys.stderr)
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Paginação das ofertas: blocos fixos (dividir_lista) ou por densidade ('auto').
+
+Nos layouts de lista a altura da linha é a área útil dividida pelo número de
+itens, então quantos itens cabem numa página depende dos nomes: nomes curtos
+sobram em linhas baixas, nomes longos pedem linhas altas (senão caem para o
+mínimo de 14 px ou são truncados). A paginação automática mede, para cada
+oferta, o maior número de linhas por página em que o nome ainda sai num tamanho
+legível, com as mesmas medidas do desenho (poster_black.metricas_linha) e as
+tabelas de largura do ajuste_texto: nada é renderizado. Depois empacota as
+páginas numa passada: cada página leva o máximo de ofertas que todas as suas
+ofertas aceitam. Como caber em n linhas implica caber em menos, essa passada
+gulosa dá o menor número de páginas.
+
+Os limites de legibilidade são em pontos (1/72"), então valem em qualquer DPI.
+A gôndola (grade 2x4 fixa) e o individual não mudam com a densidade: seguem fixos.
+
+    grupos = paginacao.paginar(ofertas, paginacao.AUTO, layout_mode='simple', dpi=150)
+
+Este módulo não depende do Flask.
+"""
+import argparse
+import math
+
+import ajuste_texto
+import catalogo
+import poster_black
+
+AUTO = 'auto'
+
+# Menor nome, menor preço e menores rótulos DE:/POR: (só na lista) aceitos na paginação automática, em pontos
+NOME_MINIMO_PT = 14
+PRECO_MINIMO_PT = 20
+ROTULO_MINIMO_PT = 10
+
+# Itens por página que a paginação automática pode escolher, por layout
+LIMITES_AUTO = {'list': (2, 12), 'simple': (2, 20)}
+
+# Nomes já medidos guardados por Densidade (catálogos repetem muito os nomes)
+MAX_NOMES = 50_000
+
+
+class Densidade:
+    """Quantas linhas por página cada oferta aceita num layout, com os parâmetros da página."""
+
+    def __init__(self, layout_mode='list', **opcoes_render):
+        parametros = {k: v for k, v in opcoes_render.items() if k not in poster_black.PARAMETROS_COR}
+        modelo = poster_black.obter_modelo(**parametros)
+        self.layout_mode = layout_mode
+        self.W, self.margin = modelo.W, modelo.margin
+        self.area = modelo.y_end - modelo.y_start
+        self.negrito = layout_mode != 'simple'  # Nome em negrito na lista, regular na lista simples
+        self.nome_minimo = NOME_MINIMO_PT * modelo.dpi / 72
+        self._nomes = {}
+
+        # Preço e rótulos só dependem da altura da linha: corta o máximo uma vez para todas as ofertas
+        self.minimo, maximo = LIMITES_AUTO[layout_mode]
+        preco_minimo = PRECO_MINIMO_PT * modelo.dpi / 72
+        rotulo_minimo = ROTULO_MINIMO_PT * modelo.dpi / 72 if layout_mode == 'list' else 0
+        while maximo > self.minimo and (self._metricas(maximo)[3] < preco_minimo
+                                        or self.area / maximo * poster_black.ROTULO_LISTA < rotulo_minimo):
+            maximo -= 1
+        self.maximo = maximo
+
+    def _metricas(self, linhas):
+        return poster_black.metricas_linha(self.layout_mode, self.W, self.margin, self.area / linhas)
+
+    def cabe(self, nome, linhas):
+        """True se o nome sai com pelo menos NOME_MINIMO_PT numa página de `linhas` itens."""
+        largura, altura, inicial, _ = self._metricas(linhas)
+        # O ajuste tenta inicial, inicial-2, ...: o nome sai legível se o menor desses
+        # tamanhos que ainda é legível couber (uma quebra de linha só, sem buscar o tamanho)
+        inicial = int(inicial)
+        minimo = math.ceil(self.nome_minimo)
+        if inicial < minimo:
+            return False
+        tamanho = inicial - (inicial - minimo) // 2 * 2
+        return ajuste_texto.motor.cabe(nome, tamanho, largura, altura, self.negrito)
+
+    def max_linhas(self, oferta):
+        """Maior número de itens por página que a oferta aceita (o mínimo se nem assim o nome couber)."""
+        nome = str(oferta.get('produto') or '').strip().upper()
+        linhas = self._nomes.get(nome)
+        if linhas is None:
+            # Quase todo nome cabe no máximo; senão, busca binária (quem cabe em n linhas cabe em menos)
+            lo, hi = self.minimo, self.maximo
+            if self.cabe(nome, hi):
+                lo = hi
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if self.cabe(nome, mid):
+                    lo = mid
+                else:
+                    hi = mid - 1
+            linhas = lo
+            if len(self._nomes) < MAX_NOMES:
+                self._nomes[nome] = linhas
+        return linhas
+
+    def paginas(self, ofertas):
+        """Gerador de páginas (listas de ofertas); aceita qualquer iterável, como dividir_lista."""
+        pagina, limite = [], self.maximo
+        for oferta in ofertas:
+            linhas = self.max_linhas(oferta)
+            if pagina and len(pagina) + 1 > min(limite, linhas):
+                yield pagina
+                pagina, limite = [], self.maximo
+            pagina.append(oferta)
+            limite = min(limite, linhas)
+        if pagina:
+            yield pagina
+
+
+def itens_da_linha_de_comando(valor):
+    """Tipo do argparse para --itens: um número ou 'auto'."""
+    if valor == AUTO:
+        return AUTO
+    try:
+        return int(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"use um número ou '{AUTO}': {valor!r}")
+
+
+def max_por_pagina(itens_por_pagina, layout_mode='list'):
+    """Maior página possível (ex.: quantas ofertas ler para a pré-visualização)."""
+    if itens_por_pagina == AUTO:
+        if layout_mode in LIMITES_AUTO:
+            return LIMITES_AUTO[layout_mode][1]
+        itens_por_pagina = None
+    return itens_por_pagina or poster_black.ITENS_POR_PAGINA.get(layout_mode, 6)
+
+
+def paginar(ofertas, itens_por_pagina=None, layout_mode='list', **opcoes_render):
+    """
+    Gerador de páginas: `itens_por_pagina` fixo, None (padrão do layout) ou AUTO
+    (por densidade; `opcoes_render` dá a geometria da página: textos, margem, DPI).
+    """
+    if itens_por_pagina == AUTO:
+        if layout_mode in LIMITES_AUTO:
+            return Densidade(layout_mode, **opcoes_render).paginas(ofertas)
+        itens_por_pagina = None
+    return catalogo.dividir_lista(ofertas, itens_por_pagina or poster_black.ITENS_POR_PAGINA.get(layout_mode, 6))
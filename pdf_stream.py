@@ -0,0 +1,237 @@
+"""
+Escritor de PDF em streaming.
+
+Cada página é gravada na saída assim que fica pronta (imagem + conteúdo + objeto
+Page) e só a tabela xref (alguns bytes por objeto) fica em memória. No fim, são
+gravados a árvore de páginas, o catálogo e o trailer. Assim a memória não cresce
+com o número de páginas: 5 ou 500 cartazes custam o mesmo.
+
+Os PNGs gerados pelo poster_black são embutidos sem recodificar: o fluxo IDAT já é
+zlib com preditores PNG, que o PDF aceita direto em /FlateDecode (como faz o img2pdf).
+"""
+import io
+import struct
+
+import perfil
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Tipos de cor PNG suportados -> (espaço de cor PDF, componentes)
+_CORES_PNG = {
+    0: ('/DeviceGray', 1),
+    2: ('/DeviceRGB', 3),
+    3: (None, 1),  # paleta -> /Indexed
+}
+
+
+class FormatoNaoSuportado(ValueError):
+    """O PNG não pode ser embutido sem recodificação (ex.: entrelaçado, 16 bits, alfa)."""
+
+
+def ler_png(dados):
+    """Extrai (largura, altura, tipo de cor, bits, paleta, idat) de um PNG."""
+    if not dados.startswith(PNG_SIGNATURE):
+        raise FormatoNaoSuportado("Não é um PNG")
+    pos = len(PNG_SIGNATURE)
+    ihdr = None
+    paleta = b''
+    idat = []
+    while pos < len(dados):
+        (tamanho,) = struct.unpack('>I', dados[pos:pos + 4])
+        tipo = dados[pos + 4:pos + 8]
+        corpo = dados[pos + 8:pos + 8 + tamanho]
+        pos += 12 + tamanho
+        if tipo == b'IHDR':
+            ihdr = struct.unpack('>IIBBBBB', corpo)
+        elif tipo == b'PLTE':
+            paleta = corpo
+        elif tipo == b'IDAT':
+            idat.append(corpo)
+        elif tipo == b'IEND':
+            break
+    if ihdr is None:
+        raise FormatoNaoSuportado("PNG sem IHDR")
+
+    largura, altura, bits, tipo_cor, _, _, entrelacado = ihdr
+    if tipo_cor not in _CORES_PNG or bits != 8 or entrelacado:
+        raise FormatoNaoSuportado(f"PNG tipo {tipo_cor}/{bits} bits/entrelaçado={entrelacado}")
+    return largura, altura, tipo_cor, bits, paleta, b''.join(idat)
+
+
+def suporta(dados):
+    """True se o PNG pode ser embutido direto pelo EscritorPDF."""
+    try:
+        ler_png(dados)
+        return True
+    except FormatoNaoSuportado:
+        return False
+
+
+class EscritorPDF:
+    """
+    Monta um PDF página a página em qualquer objeto com write().
+
+        escritor = EscritorPDF(arquivo, dpi=150)
+        for png in paginas:
+            escritor.adicionar_pagina(png)
+        escritor.fechar()
+    """
+
+    CATALOGO = 1
+    PAGINAS = 2
+
+    def __init__(self, saida, dpi=150):
+        self.saida = saida
+        self.dpi = dpi
+        self.offset = 0
+        self.offsets = {}
+        self.proximo_obj = 3
+        self.kids = []
+        self._escrever(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _escrever(self, dados):
+        self.saida.write(dados)
+        self.offset += len(dados)
+
+    def _novo_obj(self):
+        num = self.proximo_obj
+        self.proximo_obj += 1
+        return num
+
+    def _objeto(self, num, dicionario, stream=None):
+        self.offsets[num] = self.offset
+        if stream is None:
+            self._escrever(b'%d 0 obj\n%s\nendobj\n' % (num, dicionario))
+        else:
+            self._escrever(b'%d 0 obj\n%s\nstream\n' % (num, dicionario))
+            self._escrever(stream)
+            self._escrever(b'\nendstream\nendobj\n')
+
+    def adicionar_pagina(self, pagina, dpi=None):
+        """Grava uma página. `pagina` pode ser bytes de PNG ou uma imagem PIL."""
+        if not isinstance(pagina, (bytes, bytearray)):
+            buf = io.BytesIO()
+            pagina.save(buf, format='PNG')
+            pagina = buf.getvalue()
+        largura, altura, tipo_cor, bits, paleta, idat = ler_png(pagina)
+        espaco, componentes = _CORES_PNG[tipo_cor]
+
+        dpi = dpi or self.dpi
+
+        if espaco is None:
+            n_cores = len(paleta) // 3
+            espaco = b'[/Indexed /DeviceRGB %d <%s>]' % (n_cores - 1, paleta.hex().encode())
+        else:
+            espaco = espaco.encode()
+
+        num_img = self._novo_obj()
+        self._objeto(num_img, _dicionario_imagem(largura, altura, espaco, bits, componentes, b'%d' % len(idat)), idat)
+        self._pagina(num_img, largura, altura, dpi)
+
+    def adicionar_pagina_em_partes(self, largura, altura, partes_idat, dpi=None, caixas=None):
+        """
+        Gerador: grava uma página RGB de 8 bits consumindo o fluxo IDAT (zlib com
+        filtros PNG) aos poucos, sem precisar dele inteiro em memória. A cada pedaço
+        gravado devolve o controle, para quem chamou poder esvaziar a saída.
+        `caixas`: {'TrimBox': (x0, y0, x1, y1), ...} em pixels, origem no canto superior esquerdo.
+        """
+        num_img = self._novo_obj()
+        num_tamanho = self._novo_obj()  # /Length indireto: só se sabe o tamanho no fim
+        self.offsets[num_img] = self.offset
+        self._escrever(b'%d 0 obj\n%s\nstream\n'
+                       % (num_img, _dicionario_imagem(largura, altura, b'/DeviceRGB', 8, 3, b'%d 0 R' % num_tamanho)))
+        tamanho = 0
+        for parte in partes_idat:
+            self._escrever(parte)
+            tamanho += len(parte)
+            yield
+        self._escrever(b'\nendstream\nendobj\n')
+        self._objeto(num_tamanho, b'%d' % tamanho)
+        self._pagina(num_img, largura, altura, dpi or self.dpi, caixas)
+        yield
+
+    def _pagina(self, num_img, largura, altura, dpi, caixas=None):
+        escala = 72.0 / dpi
+        w_pt = largura * escala
+        h_pt = altura * escala
+
+        conteudo = b'q %.4f 0 0 %.4f 0 0 cm /Im0 Do Q' % (w_pt, h_pt)
+        num_conteudo = self._novo_obj()
+        self._objeto(num_conteudo, b'<< /Length %d >>' % len(conteudo), conteudo)
+
+        extras = b''
+        for nome, (x0, y0, x1, y1) in sorted((caixas or {}).items()):
+            # PDF conta y de baixo para cima
+            extras += b' /%s [%.4f %.4f %.4f %.4f]' % (
+                nome.encode(), x0 * escala, (altura - y1) * escala, x1 * escala, (altura - y0) * escala)
+
+        num_pagina = self._novo_obj()
+        self._objeto(num_pagina, b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.4f %.4f]%s '
+                                 b'/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>'
+                     % (self.PAGINAS, w_pt, h_pt, extras, num_img, num_conteudo))
+        self.kids.append(num_pagina)
+
+    def fechar(self):
+        kids = b' '.join(b'%d 0 R' % k for k in self.kids)
+        self._objeto(self.PAGINAS, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.kids)))
+        self._objeto(self.CATALOGO, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGINAS)
+
+        inicio_xref = self.offset
+        total = self.proximo_obj
+        linhas = [b'xref\n0 %d\n' % total, b'0000000000 65535 f \n']
+        for num in range(1, total):
+            linhas.append(b'%010d 00000 n \n' % self.offsets[num])
+        self._escrever(b''.join(linhas))
+        self._escrever(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                       % (total, self.CATALOGO, inicio_xref))
+
+
+def _dicionario_imagem(largura, altura, espaco, bits, componentes, tamanho):
+    return (b'<< /Type /XObject /Subtype /Image /Width %d /Height %d '
+            b'/ColorSpace %s /BitsPerComponent %d /Filter /FlateDecode '
+            b'/DecodeParms << /Predictor 15 /Colors %d /BitsPerComponent %d /Columns %d >> '
+            b'/Length %s >>'
+            % (largura, altura, espaco, bits, componentes, bits, largura, tamanho))
+
+
+class Pedacos:
+    """Saída em memória que só guarda o que ainda não foi entregue ao cliente."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+
+    def esvaziar(self):
+        dados = b''.join(self.partes)
+        self.partes = []
+        return dados
+
+
+def pdf_em_partes(paginas, dpi=150):
+    """
+    Gerador que devolve o PDF em pedaços: um pedaço por página, assim que a
+    página fica pronta. Ideal para Response(...) em streaming no Flask.
+
+    Se `paginas` levantar erro no meio, o erro sobe sem o xref/trailer: nada de um
+    PDF que parece completo. Fechar o gerador fecha também `paginas`.
+    """
+    saida = Pedacos()
+    escritor = EscritorPDF(saida, dpi=dpi)
+    try:
+        for pagina in paginas:
+            with perfil.etapa('pdf'):
+                escritor.adicionar_pagina(pagina)
+            yield saida.esvaziar()
+    finally:
+        if hasattr(paginas, 'close'):
+            paginas.close()
+    with perfil.etapa('pdf'):
+        escritor.fechar()
+    yield saida.esvaziar()
+
+
+def montar_pdf(paginas, dpi=150):
+    """Conveniência: o PDF inteiro como bytes (para lotes pequenos/testes)."""
+    return b''.join(pdf_em_partes(paginas, dpi))
@@ -0,0 +1,303 @@
+"""
+PDF vetorial: textos, retângulos e linhas viram operadores PDF, sem rasterizar nada.
+
+As páginas usam exatamente o mesmo layout do modo imagem: as funções desenhar_*
+do poster_black recebem um DesenhoPDF no lugar do ImageDraw. Ele mede os textos
+com o próprio Pillow (mesmas larguras, quebras e tamanhos de fonte) e grava cada
+chamada de desenho como operador PDF. As fontes usadas (o mesmo .ttf que o
+Pillow abriu) são embutidas uma vez por documento, só com os glifos usados.
+
+Um PDF vetorial de cartaz tem poucos KB por página (contra centenas de KB do PNG
+embutido) e é gerado em milissegundos.
+
+Requer fontTools (cmap, métricas e subconjunto das fontes). Sem ele, disponivel()
+retorna False e quem chama deve cair no PDF rasterizado. O fontTools só é
+importado no primeiro PDF vetorial (a importação dele custa ~100 ms).
+"""
+import functools
+import importlib.util
+import io
+import os
+import zlib
+
+from PIL import Image, ImageDraw
+
+import ajuste_texto
+import pdf_stream
+import perfil
+import plano
+import poster_black
+
+_TEM_FONTTOOLS = importlib.util.find_spec('fontTools') is not None
+
+# Entradas por bloco beginbfchar do ToUnicode (a spec dos CMaps limita a 100)
+MAX_BFCHAR = 100
+
+
+def disponivel():
+    return _TEM_FONTTOOLS
+
+
+@functools.lru_cache(maxsize=None)
+def _fonttools():
+    """(fontTools.subset, TTFont), importados na primeira vez que são usados."""
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+    return subset, TTFont
+
+
+def _num(v):
+    """Número PDF curto (sem notação científica, sem zeros sobrando)."""
+    texto = f"{v:.3f}".rstrip('0').rstrip('.')
+    return texto if texto not in ('', '-0') else '0'
+
+
+def _cor(rgb):
+    return ' '.join(_num(c / 255) for c in rgb[:3])
+
+
+class FonteTTF:
+    """Métricas e mapa de caracteres de um .ttf (lidos uma vez por caminho)."""
+
+    def __init__(self, path):
+        self.path = path
+        _, TTFont = _fonttools()
+        tt = TTFont(path, lazy=True)
+        self.cmap = tt.getBestCmap() or {}
+        self._ids = tt.getReverseGlyphMap()
+        self.upm = tt['head'].unitsPerEm
+        self._hmtx = tt['hmtx'].metrics
+        self._ordem = tt.getGlyphOrder()
+        head, hhea = tt['head'], tt['hhea']
+        self.bbox = [round(v * 1000 / self.upm) for v in (head.xMin, head.yMin, head.xMax, head.yMax)]
+        self.ascent = round(hhea.ascent * 1000 / self.upm)
+        self.descent = round(hhea.descent * 1000 / self.upm)
+        os2 = tt['OS/2'] if 'OS/2' in tt else None
+        cap = getattr(os2, 'sCapHeight', 0) or hhea.ascent
+        self.cap_height = round(cap * 1000 / self.upm)
+        nome = tt['name'].getDebugName(6) or os.path.splitext(os.path.basename(path))[0]
+        self.nome_ps = ''.join(c for c in nome if c.isalnum() or c == '-')
+        tt.close()
+
+    def glifo(self, char):
+        """Id do glifo do caractere (0 = .notdef)."""
+        nome = self.cmap.get(ord(char))
+        return self._ids.get(nome, 0) if nome else 0
+
+    def largura(self, gid):
+        """Avanço do glifo em milésimos de em (unidade do /W do PDF)."""
+        return round(self._hmtx[self._ordem[gid]][0] * 1000 / self.upm)
+
+    def subconjunto(self, gids):
+        """Bytes do .ttf só com os glifos pedidos (ids preservados)."""
+        ft_subset, TTFont = _fonttools()
+        tt = TTFont(self.path, recalcTimestamp=False)  # head.modified original: mesmo PDF para as mesmas páginas
+        opcoes = ft_subset.Options()
+        opcoes.retain_gids = True
+        opcoes.notdef_outline = True
+        opcoes.layout_features = []
+        opcoes.name_IDs = []
+        opcoes.drop_tables += ['FFTM']  # Carimbo do FontForge (o fontTools não sabe recortar)
+        subsetter = ft_subset.Subsetter(opcoes)
+        subsetter.populate(gids=sorted(set(gids) | {0}))
+        subsetter.subset(tt)
+        buf = io.BytesIO()
+        tt.save(buf)
+        tt.close()
+        return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=16)
+def carregar_ttf(path):
+    return FonteTTF(path)
+
+
+class DesenhoPDF:
+    """
+    Substituto do ImageDraw para as funções de layout: mede com o Pillow e grava
+    operadores PDF. Coordenadas em pixels da página (no DPI do modelo), com a
+    origem no canto superior esquerdo, como no modo imagem.
+    """
+
+    def __init__(self, largura, altura, dpi, dx=0, dy=0):
+        self.largura = largura
+        self.altura = altura
+        self.escala = 72.0 / dpi
+        self.dx = dx
+        self.dy = dy
+        self.ops = []
+        self.caixas = []   # (tipo, conteúdo, (x0, y0, x1, y1)) em pixels do layout, como gravado no PDF
+        self.fontes = {}   # caminho -> (apelido na página, {gid: caractere})
+        # Medições idênticas às do modo imagem (RGB -> fontmode 'L')
+        self._medidor = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+    @property
+    def fontmode(self):
+        return self._medidor.fontmode
+
+    def textlength(self, text, font=None, **kwargs):
+        return self._medidor.textlength(text, font=font, **kwargs)
+
+    def textbbox(self, xy, text, font=None, **kwargs):
+        return self._medidor.textbbox(xy, text, font=font, **kwargs)
+
+    def _x(self, x):
+        return _num((x + self.dx) * self.escala)
+
+    def _y(self, y):
+        return _num((self.altura - (y + self.dy)) * self.escala)
+
+    def rectangle(self, xy, fill=None, **kwargs):
+        if fill is None:
+            return
+        # O Pillow trunca as coordenadas e inclui a última linha/coluna
+        x0, y0, x1, y1 = (int(v) for v in xy)
+        self.caixas.append(('rectangle', fill, (x0, y0, x1 + 1, y1 + 1)))
+        self.ops.append(f"{_cor(fill)} rg {self._x(x0)} {self._y(y1 + 1)} "
+                        f"{_num((x1 - x0 + 1) * self.escala)} {_num((y1 - y0 + 1) * self.escala)} re f")
+
+    def line(self, xy, fill=None, width=1):
+        x0, y0, x1, y1 = xy
+        self.caixas.append(('line', fill, (x0, y0 - width / 2, x1, y1 + width / 2)))
+        self.ops.append(f"{_cor(fill)} RG {_num(width * self.escala)} w "
+                        f"{self._x(x0)} {self._y(y0)} m {self._x(x1)} {self._y(y1)} l S")
+
+    def text(self, xy, text, font=None, fill=None, **kwargs):
+        path = getattr(font, 'path', None)
+        if not text or path is None:
+            return
+        ttf = carregar_ttf(path)
+        if path not in self.fontes:
+            self.fontes[path] = (f"F{len(self.fontes) + 1}", {})
+        apelido, usados = self.fontes[path]
+        size = font.size
+
+        # Cada glifo na mesma posição x que o Pillow usou (avanços com hinting/kerning):
+        # o ajuste do TJ compensa a diferença para o avanço nominal da fonte.
+        partes = []
+        anterior = 0.0
+        avanco = 0.0  # Avanço total como o leitor de PDF vai aplicar (em milésimos de em)
+        for i, char in enumerate(text):
+            gid = ttf.glifo(char)
+            usados.setdefault(gid, char)
+            partes.append(f"<{gid:04x}>")
+            proximo = ajuste_texto.motor.largura(text[:i + 1], font, self.fontmode)
+            ajuste = ttf.largura(gid) - (proximo - anterior) * 1000 / size
+            avanco += ttf.largura(gid)
+            if abs(ajuste) >= 0.5:
+                partes.append(_num(ajuste))
+                avanco -= float(_num(ajuste))
+            anterior = proximo
+
+        ascent = font.getmetrics()[0]  # Âncora 'la' do Pillow: y é o topo (linha do ascendente)
+        self.caixas.append(('text', text, (xy[0], xy[1], xy[0] + avanco * size / 1000, xy[1] + ascent)))
+        self.ops.append(f"BT {_cor(fill or (0, 0, 0))} rg /{apelido} {_num(size * self.escala)} Tf "
+                        f"1 0 0 1 {self._x(xy[0])} {self._y(xy[1] + ascent)} Tm [{' '.join(partes)}] TJ ET")
+
+
+def desenhar_pagina(ofertas, layout_mode='list', **kwargs):
+    """DesenhoPDF da página, executando o mesmo plano de layout do modo imagem."""
+    with perfil.etapa('desenho'):
+        modelo = poster_black.obter_modelo(**kwargs)
+        plano_pagina = poster_black.obter_plano(ofertas, layout_mode, **modelo.parametros)
+        s = modelo.sangria
+        largura, altura = modelo.tamanho
+        d = DesenhoPDF(largura, altura, modelo.dpi)
+        d.rectangle([0, 0, largura - 1, altura - 1], fill=modelo.c_bg)
+        d.dx = d.dy = s
+        # Mesma ordem do modo imagem: base, fundos do layout e produtos
+        for ops in (plano_pagina.base, plano_pagina.fundos, plano_pagina.produtos):
+            plano.executar(ops, d, modelo.cores)
+    return d
+
+
+class EscritorPDFVetorial(pdf_stream.EscritorPDF):
+    """EscritorPDF para páginas DesenhoPDF; as fontes (subconjunto) são gravadas no fechar()."""
+
+    def __init__(self, saida):
+        super().__init__(saida)
+        self._fontes = {}   # caminho -> (num_obj, {gid: caractere}) de todo o documento
+
+    def adicionar_desenho(self, desenho):
+        recursos = []
+        for path, (apelido, usados) in desenho.fontes.items():
+            if path not in self._fontes:
+                self._fontes[path] = (self._novo_obj(), {})
+            num, glifos = self._fontes[path]
+            glifos.update(usados)
+            recursos.append(f"/{apelido} {num} 0 R")
+
+        dados = zlib.compress('\n'.join(desenho.ops).encode('latin-1'))
+        num_conteudo = self._novo_obj()
+        self._objeto(num_conteudo, b'<< /Length %d /Filter /FlateDecode >>' % len(dados), dados)
+
+        w_pt = desenho.largura * desenho.escala
+        h_pt = desenho.altura * desenho.escala
+        num_pagina = self._novo_obj()
+        self._objeto(num_pagina, b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.4f %.4f] '
+                                 b'/Resources << /Font << %s >> >> /Contents %d 0 R >>'
+                     % (self.PAGINAS, w_pt, h_pt, ' '.join(recursos).encode(), num_conteudo))
+        self.kids.append(num_pagina)
+
+    def _gravar_fonte(self, path, num, glifos):
+        ttf = carregar_ttf(path)
+        # Prefixo de subconjunto (6 letras) derivado dos glifos usados
+        tag = ''.join(chr(65 + (zlib.crc32(repr(sorted(glifos)).encode()) >> (4 * i)) % 26) for i in range(6))
+        nome = f"{tag}+{ttf.nome_ps}".encode()
+
+        arquivo = zlib.compress(ttf.subconjunto(glifos))
+        num_arquivo = self._novo_obj()
+        self._objeto(num_arquivo, b'<< /Length %d /Filter /FlateDecode >>' % len(arquivo), arquivo)
+
+        num_descritor = self._novo_obj()
+        self._objeto(num_descritor, b'<< /Type /FontDescriptor /FontName /%s /Flags 32 /FontBBox [%s] '
+                                    b'/ItalicAngle 0 /Ascent %d /Descent %d /CapHeight %d /StemV 80 /FontFile2 %d 0 R >>'
+                     % (nome, ' '.join(map(str, ttf.bbox)).encode(), ttf.ascent, ttf.descent,
+                        ttf.cap_height, num_arquivo))
+
+        larguras = ' '.join(f"{gid} [{ttf.largura(gid)}]" for gid in sorted(glifos))
+        num_cid = self._novo_obj()
+        self._objeto(num_cid, b'<< /Type /Font /Subtype /CIDFontType2 /BaseFont /%s '
+                              b'/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> '
+                              b'/FontDescriptor %d 0 R /CIDToGIDMap /Identity /W [%s] >>'
+                     % (nome, num_descritor, larguras.encode()))
+
+        # ToUnicode: permite copiar e buscar o texto no PDF (blocos bfchar de até 100 entradas, limite da spec)
+        entradas = [f"<{gid:04x}> <{char.encode('utf-16-be').hex()}>" for gid, char in sorted(glifos.items())]
+        blocos = ''.join(f"{len(bloco)} beginbfchar\n" + '\n'.join(bloco) + "\nendbfchar\n"
+                         for bloco in (entradas[i:i + MAX_BFCHAR] for i in range(0, len(entradas), MAX_BFCHAR)))
+        cmap = ("/CIDInit /ProcSet findresource begin 12 dict begin begincmap "
+                "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def "
+                "/CMapName /Adobe-Identity-UCS def /CMapType 2 def\n"
+                "1 begincodespacerange <0000> <ffff> endcodespacerange\n"
+                f"{blocos}"
+                "endcmap CMapName currentdict /CMap defineresource pop end end").encode()
+        num_unicode = self._novo_obj()
+        self._objeto(num_unicode, b'<< /Length %d >>' % len(cmap), cmap)
+
+        self._objeto(num, b'<< /Type /Font /Subtype /Type0 /BaseFont /%s /Encoding /Identity-H '
+                          b'/DescendantFonts [%d 0 R] /ToUnicode %d 0 R >>' % (nome, num_cid, num_unicode))
+
+    def fechar(self):
+        for path, (num, glifos) in self._fontes.items():
+            self._gravar_fonte(path, num, glifos)
+        super().fechar()
+
+
+def pdf_em_partes(grupos, **kwargs):
+    """PDF vetorial com uma página por grupo de ofertas, em pedaços (um por página + fontes no fim)."""
+    saida = pdf_stream.Pedacos()
+    escritor = EscritorPDFVetorial(saida)
+    for grupo in grupos:
+        desenho = desenhar_pagina(grupo, **kwargs)
+        with perfil.etapa('pdf'):
+            escritor.adicionar_desenho(desenho)
+        yield saida.esvaziar()
+    with perfil.etapa('pdf'):
+        escritor.fechar()
+    yield saida.esvaziar()
+
+
+def montar_pdf(grupos, **kwargs):
+    """Conveniência: o PDF vetorial inteiro como bytes."""
+    return b''.join(pdf_em_partes(grupos, **kwargs))
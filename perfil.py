@@ -0,0 +1,89 @@
+"""
+Cronometragem leve por etapa do pipeline de renderização.
+
+    with perfil.coletar() as etapas:
+        ...                       # código que chama poster_black, pdf_stream etc.
+    etapas.resumo()               # {'desenho': (ms, chamadas), 'codificacao': ...}
+
+Dentro do pipeline, cada etapa é marcada com `with perfil.etapa('nome'):`. Sem
+coletor ativo a marcação custa só uma leitura de ContextVar. As etapas podem
+ser aninhadas (ex.: 'ajuste_texto' conta também dentro de 'desenho'), então os
+tempos são inclusivos e não devem ser somados entre si.
+
+Etapas usadas hoje: csv, fontes, ajuste_texto, desenho, codificacao, pdf, requisicao.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+_coletor = contextvars.ContextVar('poster_perfil', default=None)
+
+
+class Etapas:
+    """Acumula (segundos, chamadas) por nome de etapa."""
+
+    def __init__(self):
+        self.tempos = {}
+
+    def adicionar(self, nome, segundos, chamadas=1):
+        total, n = self.tempos.get(nome, (0.0, 0))
+        self.tempos[nome] = (total + segundos, n + chamadas)
+
+    def somar(self, outras):
+        """Soma etapas vindas de outro processo (dict nome -> (segundos, chamadas))."""
+        for nome, (segundos, chamadas) in (outras or {}).items():
+            self.adicionar(nome, segundos, chamadas)
+
+    def como_dict(self):
+        return dict(self.tempos)
+
+    def resumo(self):
+        """{nome: (milissegundos, chamadas)} arredondado, para logs."""
+        return {nome: (round(s * 1000, 1), n) for nome, (s, n) in sorted(self.tempos.items())}
+
+    def server_timing(self):
+        """Valor do cabeçalho HTTP Server-Timing (ex.: 'desenho;dur=12.3, pdf;dur=4.0')."""
+        return ', '.join(f"{nome};dur={s * 1000:.1f}" for nome, (s, _) in sorted(self.tempos.items()))
+
+
+def ativo():
+    return _coletor.get()
+
+
+def iniciar():
+    """Liga a coleta no contexto atual. Retorna (token, etapas); encerre com encerrar(token)."""
+    etapas = Etapas()
+    return _coletor.set(etapas), etapas
+
+
+def encerrar(token):
+    _coletor.reset(token)
+
+
+@contextmanager
+def coletar():
+    token, etapas = iniciar()
+    try:
+        yield etapas
+    finally:
+        encerrar(token)
+
+
+@contextmanager
+def etapa(nome):
+    etapas = _coletor.get()
+    if etapas is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        etapas.adicionar(nome, time.perf_counter() - t0)
+
+
+def somar(outras):
+    """Soma etapas medidas em outro processo ao coletor atual (se houver)."""
+    etapas = _coletor.get()
+    if etapas is not None and outras:
+        etapas.somar(outras)
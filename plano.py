@@ -0,0 +1,213 @@
+"""
+Plano de layout: a página como lista de operações de desenho, sem cores.
+
+As funções desenhar_* do poster_black calculam posições, ajustam os textos e
+desenham, tudo junto. Passando um GravadorPlano no lugar do ImageDraw (e papéis
+como 'texto'/'destaque'/'selo' no lugar das cores do tema), cada chamada vira uma
+operação:
+
+    ('texto', x, y, texto, (caminho_fonte, tamanho), cor)
+    ('retangulo', x0, y0, x1, y1, cor)
+    ('linha', x0, y0, x1, y1, cor, largura)
+    ('celula', x0, y0, x1, y1)
+
+'celula' não desenha nada: marca que as operações seguintes (até a próxima
+'celula') são de um produto, na caixa dada (ver celulas.py).
+
+`cor` é um papel do tema ou uma cor fixa (RGB). O plano só depende das ofertas,
+do layout e dos textos/DPI; trocar o tema só reexecuta o plano com outras cores.
+executar() desenha o plano em qualquer coisa com text/rectangle/line (ImageDraw,
+DesenhoDeslocado, DesenhoPDF). Planos são tuplas simples: vão para JSON
+(para_json/de_json) e atravessam o pool de processos sem custo extra.
+
+Além do LRU em memória de cada processo, os planos vão para um LRU em disco
+compartilhado por todos os processos (workers do servidor e do pool): o plano
+calculado por um worker é lido pelos outros em vez de recalculado.
+
+    POSTER_PLANOS_DIR       pasta do nível em disco (padrão: <tmp>/poster_black_planos)
+    POSTER_PLANOS_DISCO_MB  limite do nível em disco (padrão: 64; 0 desliga)
+"""
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+import cache_render
+import fontes
+import glifos
+
+# Papéis de cor usados nos planos (resolvidos pelo tema na execução)
+PAPEIS = ('fundo', 'texto', 'destaque', 'selo')
+
+# Planos guardados em memória
+MAX_PLANOS = 2048
+
+# tamanho: (largura, altura) da imagem com sangria; camada: (layout efetivo, qtd de itens);
+# base/fundos/produtos: operações do cabeçalho+rodapé, dos fundos do layout e dos produtos
+Plano = namedtuple('Plano', ['tamanho', 'sangria', 'camada', 'base', 'fundos', 'produtos'])
+
+
+class GravadorPlano:
+    """ImageDraw de mentira: mede com o Pillow e grava as chamadas de desenho como operações."""
+
+    def __init__(self):
+        self.ops = []
+        self._medidor = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+    @property
+    def fontmode(self):
+        return self._medidor.fontmode
+
+    def textlength(self, text, font=None, **kwargs):
+        return self._medidor.textlength(text, font=font, **kwargs)
+
+    def textbbox(self, xy, text, font=None, **kwargs):
+        return self._medidor.textbbox(xy, text, font=font, **kwargs)
+
+    def text(self, xy, text, font=None, fill=None, **kwargs):
+        path = getattr(font, 'path', None)
+        fonte = (path if isinstance(path, str) else None, getattr(font, 'size', None))
+        self.ops.append(('texto', xy[0], xy[1], text, fonte, fill))
+
+    def rectangle(self, xy, fill=None, **kwargs):
+        x0, y0, x1, y1 = xy
+        self.ops.append(('retangulo', x0, y0, x1, y1, fill))
+
+    def line(self, xy, fill=None, width=1):
+        x0, y0, x1, y1 = xy
+        self.ops.append(('linha', x0, y0, x1, y1, fill, width))
+
+    def celula(self, xy):
+        x0, y0, x1, y1 = xy
+        self.ops.append(('celula', x0, y0, x1, y1))
+
+
+def _cor(cor, cores):
+    if isinstance(cor, str):
+        return cores[cor]
+    return tuple(cor) if cor is not None else None
+
+
+def _fonte(fonte):
+    path, size = fonte
+    if path is None:
+        return ImageFont.load_default()
+    return fontes.fonte_do_arquivo(path, size)
+
+
+def executar(ops, draw, cores):
+    """Desenha as operações em `draw` com as cores do tema ({papel: RGB})."""
+    for op in ops:
+        tipo = op[0]
+        if tipo == 'texto':
+            _, x, y, texto, fonte, cor = op
+            fonte, cor = _fonte(fonte), _cor(cor, cores)
+            # Preços e rótulos saem do atlas de glifos; o resto (e outros desenhos) pelo draw.text
+            if not glifos.texto(draw, (x, y), texto, fonte, cor):
+                draw.text((x, y), texto, font=fonte, fill=cor)
+        elif tipo == 'retangulo':
+            _, x0, y0, x1, y1, cor = op
+            draw.rectangle([x0, y0, x1, y1], fill=_cor(cor, cores))
+        elif tipo == 'linha':
+            _, x0, y0, x1, y1, cor, largura = op
+            draw.line((x0, y0, x1, y1), fill=_cor(cor, cores), width=largura)
+        elif tipo == 'celula':
+            continue  # Só marca o início de um produto
+        else:
+            raise ValueError(f"Operação de plano desconhecida: {tipo}")
+
+
+def para_json(plano):
+    return json.dumps(plano._asdict(), ensure_ascii=False, separators=(',', ':'))
+
+
+def de_json(dados):
+    d = json.loads(dados)
+    ops = lambda lista: [tuple(tuple(v) if isinstance(v, list) else v for v in op) for op in lista]
+    return Plano(tuple(d['tamanho']), d['sangria'], tuple(d['camada']),
+                 ops(d['base']), ops(d['fundos']), ops(d['produtos']))
+
+
+class CachePlanos:
+    """
+    LRU de planos por chave (ver cache_render.chave_plano), em memória e, com
+    `max_disco` > 0, num cache_render.CacheDisco em `pasta` (planos em JSON).
+    A pasta só é criada/varrida no primeiro uso do disco.
+    """
+
+    def __init__(self, max_planos=MAX_PLANOS, pasta=None, max_disco=0):
+        self.max_planos = max_planos
+        self.pasta = pasta
+        self.max_disco = max_disco
+        self._disco = None
+        self._planos = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.hits_disco = 0
+        self.misses = 0
+
+    @property
+    def disco(self):
+        if self._disco is None and self.max_disco > 0:
+            with self._lock:
+                if self._disco is None:
+                    self._disco = cache_render.CacheDisco(self.pasta, self.max_disco)
+        return self._disco
+
+    def _guardar(self, chave, plano):
+        with self._lock:
+            self._planos[chave] = plano
+            self._planos.move_to_end(chave)
+            while len(self._planos) > self.max_planos:
+                self._planos.popitem(last=False)
+
+    def get(self, chave):
+        with self._lock:
+            plano = self._planos.get(chave)
+            if plano is not None:
+                self._planos.move_to_end(chave)
+                self.hits += 1
+                return plano
+        dados = self.disco.get(chave) if self.disco is not None else None
+        if dados is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        plano = de_json(dados)
+        self._guardar(chave, plano)
+        with self._lock:
+            self.hits_disco += 1
+        return plano
+
+    def put(self, chave, plano, em_disco=True):
+        """Guarda o plano; em_disco=False só na memória (quem o passou já o gravou no disco)."""
+        self._guardar(chave, plano)
+        if em_disco and self.disco is not None:
+            self.disco.put(chave, para_json(plano).encode('utf-8'))
+
+    def estatisticas(self):
+        with self._lock:
+            stats = {'hits': self.hits, 'hits_disco': self.hits_disco, 'misses': self.misses,
+                     'planos_em_cache': len(self._planos)}
+        stats['disco_bytes'] = self._disco.total_bytes if self._disco is not None else 0
+        return stats
+
+    def limpar(self):
+        """Esvazia a memória deste processo (o disco é compartilhado e continua valendo)."""
+        with self._lock:
+            self._planos.clear()
+            self.hits = self.hits_disco = self.misses = 0
+
+
+# Instância global: memória por processo + disco compartilhado
+planos = CachePlanos(
+    pasta=os.environ.get('POSTER_PLANOS_DIR') or os.path.join(tempfile.gettempdir(), 'poster_black_planos'),
+    max_disco=cache_render._env_mb('POSTER_PLANOS_DISCO_MB', 64),
+)
+
+
+def estatisticas():
+    return planos.estatisticas()
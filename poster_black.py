@@ -1,7 +1,19 @@
+import functools
+import io
+import math
 import os
 import tempfile
+import threading
 import uuid
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont, features
+
+import ajuste_texto
+import cache_render
+import celulas
+import fontes
+import glifos
+import perfil
+import plano
 
 # --- CONFIGURAÇÕES VISUAIS ---
 DEFAULT_BG = (0, 0, 0)
@@ -9,6 +21,36 @@ DEFAULT_TEXT = (255, 255, 0)     # Amarelo
 DEFAULT_ACCENT = (255, 255, 255) # Branco
 BADGE_COLOR = (255, 0, 0)        # Vermelho
 
+# Temas prontos (cores em hex, como no formulário)
+TEMAS = {
+    'blackfriday': {
+        'bg': '#000000',
+        'text': '#ffff00',
+        'accent': '#ffffff',
+        'badge': '#ff0000'
+    },
+    'natalino': {
+        'bg': '#0a3a0a',
+        'text': '#ffffff',
+        'accent': '#ffcc00',
+        'badge': '#ff0000'
+    },
+    'farmacia': {
+        'bg': '#ffffff',
+        'text': '#cc0000',
+        'accent': '#ffcc00',
+        'badge': '#cc0000'
+    }
+}
+
+# Fundos fixos do zebrado das listas e dos cartazetes da gôndola
+ZEBRA_LISTA = (25, 25, 25)
+ZEBRA_SIMPLES = (20, 20, 20)
+FUNDO_CARTAO = (18, 18, 18)
+
+# Parâmetros de renderizar_poster que só mudam cores (não entram no plano de layout)
+PARAMETROS_COR = ('bg_color', 'text_color', 'accent_color', 'badge_color')
+
 PRINT_MARGIN = 40
 TEXTO_VIGENCIA = "Ofertas válidas enquanto durarem os estoques."
 TEXTO_ESTOQUES = "Consulte disponibilidade."
@@ -16,27 +58,14 @@ TEXTO_ESTOQUES = "Consulte disponibilidade."
 # --- FUNÇÕES DE FONTE ---
 
 def get_font_path(bold=False):
-    """Seleciona a fonte correta dependendo do sistema (Windows/Linux)."""
-    if bold:
-        # Tenta Arial Bold, depois DejaVu Bold
-        options = ["arialbd.ttf", "DejaVuSans-Bold.ttf", "FreeSansBold.ttf"]
-    else:
-        options = ["arial.ttf", "DejaVuSans.ttf", "FreeSans.ttf"]
-    
-    for font in options:
-        # Verifica se o arquivo existe no sistema ou na pasta atual
-        try:
-            ImageFont.truetype(font, 10) # Teste rápido
-            return font
-        except IOError:
-            continue
-    return "arial.ttf" # Fallback final
-
-def get_font(size, bold=False):
-    try:
-        return ImageFont.truetype(get_font_path(bold), int(size))
-    except IOError:
-        return ImageFont.load_default()
+    """Seleciona a fonte correta dependendo do sistema (Windows/Linux).
+
+    A resolução é feita uma única vez pelo registro em fontes.py.
+    """
+    return fontes.caminho_fonte(bold) or "arial.ttf" # Fallback final
+
+def get_font(size, bold=False, familia=None):
+    return fontes.carregar_fonte(size, bold, familia)
 
 def formatar_moeda(valor):
     """Recebe float (2.99) e retorna string ('R$ 2,99')."""
@@ -54,54 +83,22 @@ def caber_texto_na_caixa(draw, text, max_width, max_height, start_font_size, is_
     1. Quebra o texto em linhas (Word Wrap).
     2. Calcula a altura total.
     3. Se for maior que max_height, diminui a fonte e tenta de novo.
+
+    O trabalho pesado fica no motor de ajuste_texto.py (busca binária do tamanho
+    + cache de larguras e de layouts). Retorna sempre (linhas, fonte, altura_total, altura_linha).
     """
-    size = int(start_font_size)
-    min_size = 14 # Tamanho mínimo aceitável
-    font_path = get_font_path(bold=is_bold)
-
-    while size >= min_size:
-        try:
-            font = ImageFont.truetype(font_path, size)
-        except:
-            font = ImageFont.load_default()
-            return [text], font, size # Falha na fonte
-
-        # 1. Lógica de Word Wrap (Quebra de linha)
-        words = text.split()
-        lines = []
-        current_line = []
-        
-        for word in words:
-            # Simula a linha com a palavra adicionada
-            test_line = ' '.join(current_line + [word])
-            w_line = draw.textlength(test_line, font=font)
-            
-            if w_line <= max_width:
-                current_line.append(word)
-            else:
-                # Linha cheia, guarda e começa nova
-                if current_line:
-                    lines.append(' '.join(current_line))
-                current_line = [word] # A palavra que não coube começa a nova linha
-        
-        if current_line:
-            lines.append(' '.join(current_line))
-        
-        # 2. Verifica Altura Total
-        # Altura da linha = tamanho da fonte + 15% de espaçamento
-        line_height = size * 1.15
-        total_block_height = len(lines) * line_height
-        
-        # Se couber na altura disponível, SUCESSO!
-        if total_block_height <= max_height:
-            return lines, font, total_block_height, line_height
+    modo = getattr(draw, 'fontmode', 'L')
+    return ajuste_texto.ajustar_texto(text, max_width, max_height, start_font_size, is_bold, modo)
 
-        # Se não coube, reduz a fonte e repete o loop
-        size -= 2
 
-    # Se saiu do loop, é porque nem no tamanho mínimo coube.
-    # Trunca o texto com "..."
-    return [text[:30] + "..."], font, total_block_height, line_height
+def marcar_celula(draw, caixa):
+    """
+    Marca o início de um produto (caixa da célula). Só o GravadorPlano guarda a
+    marca (ver celulas.py); num ImageDraw não faz nada.
+    """
+    celula = getattr(draw, 'celula', None)
+    if celula is not None:
+        celula(caixa)
 
 
 # --- DESENHO DOS CARTAZES ---
@@ -196,27 +193,41 @@ def desenhar_item_individual(draw, item, W, H, margin, y_start, y_end, text_colo
     draw.text((start_x + w_rs + w_int, y_val), "," + decimal, font=font_dec, fill=text_color)
 
 
-def desenhar_lista_produtos(draw, ofertas, W, H, margin, y_start, y_end, text_color, accent_color, badge_color):
+# Rótulos DE:/POR: da lista, em fração da altura da linha (a paginação automática confere o mínimo)
+ROTULO_LISTA = 0.15
+
+
+def metricas_linha(layout_mode, W, margin, row_height):
+    """
+    Medidas de uma linha dos layouts de lista ('list' / 'simple'):
+    (largura da coluna do nome, altura máxima do nome, tamanho inicial do nome, tamanho do preço).
+    O nome é negrito na lista e regular na lista simples. A paginação automática
+    (paginacao.py) usa as mesmas medidas para saber quantas linhas cabem.
+    """
+    usable_width = W - (margin * 2)
+    if layout_mode == 'simple':
+        return (usable_width * 0.70, row_height * 0.9,
+                max(14, int(row_height * 0.35)), max(14, int(row_height * 0.45)))
+    # O nome pode ocupar até 85% da altura da linha, senão reduz
+    return usable_width * 0.55, row_height * 0.85, row_height * 0.35, row_height * 0.35
+
+
+def desenhar_lista_produtos(draw, ofertas, W, H, margin, y_start, y_end, text_color, accent_color, badge_color, fundo=True):
     """
     Layout Lista:
     - Coluna Nome (Esq): Usa 'caber_texto_na_caixa' para quebrar e reduzir fonte.
     - Coluna Preço (Dir): Fixa e alinhada.
+    Com fundo=False o zebrado não é desenhado (já vem pronto na camada do ModeloPagina).
     """
     qtd = len(ofertas)
     # Altura exata de cada linha da tabela
     row_height = (y_end - y_start) / qtd
     
-    # Definição das colunas
-    usable_width = W - (margin * 2)
-    col_name_w = usable_width * 0.55
-    # col_price_w = usable_width * 0.40
-    
-    # Fonte base ideal (vai reduzir se não couber)
-    ideal_font_size = row_height * 0.35
+    # Coluna do nome e fonte base ideal (vai reduzir se não couber); ver metricas_linha
+    col_name_w, max_h_text, ideal_font_size, f_price_val = metricas_linha('list', W, margin, row_height)
     
     # Fontes de preço (fixas para manter padrão)
-    f_price_lbl = row_height * 0.15
-    f_price_val = row_height * 0.35
+    f_price_lbl = row_height * ROTULO_LISTA
     font_lbl = get_font(f_price_lbl, bold=True)
     font_val = get_font(f_price_val, bold=True)
 
@@ -225,13 +236,13 @@ def desenhar_lista_produtos(draw, ofertas, W, H, margin, y_start, y_end, text_co
         y_center = y_pos + (row_height / 2)
         
         # Zebrado
-        if i % 2 == 0:
-            draw.rectangle([margin, y_pos, W - margin, y_pos + row_height], fill=(25, 25, 25))
+        caixa = [margin, y_pos, W - margin, y_pos + row_height]
+        marcar_celula(draw, caixa)
+        if fundo and i % 2 == 0:
+            draw.rectangle(caixa, fill=ZEBRA_LISTA)
 
         # --- NOME (ESQUERDA - INTELIGENTE) ---
         prod_raw = item.get('produto', '').upper()
-        # O texto pode ocupar até 85% da altura da linha, senão reduz
-        max_h_text = row_height * 0.85
         
         # CHAMA A FUNÇÃO DE AJUSTE
         lines, font_final, total_h, line_h = caber_texto_na_caixa(
@@ -271,7 +282,7 @@ def desenhar_lista_produtos(draw, ofertas, W, H, margin, y_start, y_end, text_co
             draw.line((x_de, y_de + f_price_lbl/2, x_anchor, y_de + f_price_lbl/2), fill=badge_color, width=2)
 
 
-def desenhar_lista_simples(draw, ofertas, W, H, margin, y_start, y_end, text_color, accent_color, badge_color):
+def desenhar_lista_simples(draw, ofertas, W, H, margin, y_start, y_end, text_color, accent_color, badge_color, fundo=True):
     """
     Layout simples: lista com nome do produto (esquerda) e preço final (direita).
     Pensado para até 12 itens por folha — usa fonte maior e limpa.
@@ -280,14 +291,8 @@ def desenhar_lista_simples(draw, ofertas, W, H, margin, y_start, y_end, text_col
     available_h = y_end - y_start
     row_height = available_h / qtd
 
-    # Coluna nome ocupa ~70% da largura
-    usable_width = W - (margin * 2)
-    col_name_w = usable_width * 0.70
-
-    # Fontes: nome e preço
-    font_name_size = max(14, int(row_height * 0.35))
-    font_price_size = max(14, int(row_height * 0.45))
-    font_name = get_font(font_name_size, bold=False)
+    # Coluna do nome (~70% da largura) e fontes de nome e preço; ver metricas_linha
+    col_name_w, max_h_text, font_name_size, font_price_size = metricas_linha('simple', W, margin, row_height)
     font_price = get_font(font_price_size, bold=True)
 
     for i, item in enumerate(ofertas):
@@ -295,14 +300,15 @@ def desenhar_lista_simples(draw, ofertas, W, H, margin, y_start, y_end, text_col
         y_center = y_pos + (row_height / 2)
 
         # Alterna leve cor de fundo para leitura
-        if i % 2 == 0:
-            draw.rectangle([margin, y_pos, W - margin, y_pos + row_height], fill=(20, 20, 20))
+        caixa = [margin, y_pos, W - margin, y_pos + row_height]
+        marcar_celula(draw, caixa)
+        if fundo and i % 2 == 0:
+            draw.rectangle(caixa, fill=ZEBRA_SIMPLES)
 
         prod_raw = item.get('produto', '').strip()
         por = item.get('por', 0.0)
 
         # Quebra o nome na largura disponível, reduzindo fonte se necessário
-        max_h_text = row_height * 0.9
         lines, font_final, total_h, line_h = caber_texto_na_caixa(
             draw, prod_raw.upper(), col_name_w, max_h_text, font_name_size, is_bold=False
         )
@@ -320,11 +326,8 @@ def desenhar_lista_simples(draw, ofertas, W, H, margin, y_start, y_end, text_col
         draw.text((x_price, y_price), price_text, font=font_price, fill=text_color)
 
 
-def desenhar_gondola(draw, ofertas, W, H, margin, y_start, y_end, text_color, accent_color, badge_color):
-    """
-    Gôndola / Cartazete: 8 por página em grid 2x4.
-    Cada item ocupa um 'cartazete' com nome (esquerda/alto) e preço (direita/baixo) legível.
-    """
+def _grade_gondola(W, margin, y_start, y_end):
+    """Geometria da grade 2x4 da gôndola: (cols, rows, gap, card_w, card_h)."""
     cols = 2
     rows = 4
     gap = max(8, int(W * 0.02))
@@ -333,19 +336,37 @@ def desenhar_gondola(draw, ofertas, W, H, margin, y_start, y_end, text_color, ac
     card_w = usable_w / cols
     usable_h = (y_end - y_start) - (gap * (rows - 1))
     card_h = usable_h / rows
+    return cols, rows, gap, card_w, card_h
+
+
+def _caixa_cartao(idx, cols, gap, card_w, card_h, margin, y_start):
+    """Retângulo (x0, y0, x1, y1) do cartazete número idx."""
+    r = idx // cols
+    c = idx % cols
+
+    x0 = margin + c * (card_w + gap)
+    y0 = y_start + r * (card_h + gap)
+    x1 = int(x0 + card_w)
+    y1 = int(y0 + card_h)
+    return x0, y0, x1, y1
+
+
+def desenhar_gondola(draw, ofertas, W, H, margin, y_start, y_end, text_color, accent_color, badge_color):
+    """
+    Gôndola / Cartazete: 8 por página em grid 2x4.
+    Cada item ocupa um 'cartazete' com nome (esquerda/alto) e preço (direita/baixo) legível.
+    O fundo de cada cartazete é desenhado aqui, antes dos textos dele e depois dos
+    do anterior: um nome truncado que vaza do cartão fica coberto pelo próximo.
+    """
+    cols, rows, gap, card_w, card_h = _grade_gondola(W, margin, y_start, y_end)
 
     # Fonte base aproximada
     for idx, item in enumerate(ofertas[:cols * rows]):
-        r = idx // cols
-        c = idx % cols
-
-        x0 = margin + c * (card_w + gap)
-        y0 = y_start + r * (card_h + gap)
-        x1 = int(x0 + card_w)
-        y1 = int(y0 + card_h)
+        x0, y0, x1, y1 = _caixa_cartao(idx, cols, gap, card_w, card_h, margin, y_start)
 
         # Card background (slightly lighter to separate)
-        draw.rectangle([x0, y0, x1, y1], fill=(18, 18, 18))
+        marcar_celula(draw, [x0, y0, x1, y1])
+        draw.rectangle([x0, y0, x1, y1], fill=FUNDO_CARTAO)
 
         padding = 8
 
@@ -384,75 +405,476 @@ def desenhar_gondola(draw, ofertas, W, H, margin, y_start, y_end, text_color, ac
             draw.text((dx, dy), de_text, font=font_de, fill=badge_color)
 
 
-def gerar_poster_a_partir_de_lista(ofertas, vigencia_text=None, aviso_estoques=None, 
+def layout_efetivo(layout_mode, qtd):
+    """Layout realmente usado para uma página com `qtd` ofertas."""
+    if layout_mode == 'individual' or qtd == 1:
+        return 'individual'
+    if layout_mode in ('simple', 'gondola'):
+        return layout_mode
+    return 'list'
+
+
+def desenhar_fundo_layout(draw, layout_mode, qtd, W, margin, y_start, y_end):
+    """
+    Desenha só os fundos da área de produtos (zebrado das listas). Depende apenas
+    do layout e da quantidade de itens, por isso pode ser pré-calculado uma vez por
+    lote. Os cartazetes da gôndola ficam com os produtos (ver desenhar_gondola).
+    """
+    layout_mode = layout_efetivo(layout_mode, qtd)
+    if layout_mode == 'simple':
+        cor = ZEBRA_SIMPLES
+    elif layout_mode == 'list':
+        cor = ZEBRA_LISTA
+    else:
+        return
+
+    row_height = (y_end - y_start) / qtd
+    for i in range(0, qtd, 2):
+        y_pos = y_start + (i * row_height)
+        draw.rectangle([margin, y_pos, W - margin, y_pos + row_height], fill=cor)
+
+
+def hex_to_rgb(h): return tuple(int(h.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
+
+
+def mm_para_px(mm, dpi):
+    return int(round((mm or 0) * dpi / 25.4))
+
+
+class DesenhoDeslocado:
+    """
+    ImageDraw com as coordenadas de desenho deslocadas em (dx, dy).
+
+    Permite desenhar a página numa imagem maior (sangria) ou só num pedaço dela
+    (faixas do modo de impressão) sem mexer nas funções de layout. Com `altura`,
+    textos e retângulos que caem inteiros fora da faixa [0, altura) nem são
+    desenhados. As medições (textlength, textbbox, fontmode) passam direto.
+
+    O resultado é idêntico ao da página inteira: o Pillow trunca coordenadas com
+    int(), que arredonda negativos para cima, então o que começa acima da faixa é
+    desenhado numa cópia estendida para cima (coordenadas positivas, como na
+    página inteira) e só a parte visível volta para a faixa.
+    """
+
+    def __init__(self, imagem, dx=0, dy=0, altura=None):
+        self.imagem = imagem
+        self.draw = ImageDraw.Draw(imagem)
+        self.dx = dx
+        self.dy = dy
+        self.altura = altura
+
+    def __getattr__(self, nome):
+        return getattr(self.draw, nome)
+
+    @staticmethod
+    def _somar(v, d):
+        # Soma o deslocamento (inteiro) só à parte inteira: a fração, que decide a
+        # posição subpixel e os arredondamentos, fica exatamente a da página inteira
+        f, i = math.modf(v)
+        return (i + d) + f
+
+    def _fora(self, y0, y1):
+        return self.altura is not None and (y1 < 0 or y0 > self.altura)
+
+    def _estendido(self, folga, desenhar):
+        """Chama desenhar(draw) numa cópia com `folga` linhas a mais no topo e devolve a faixa."""
+        tmp = Image.new(self.imagem.mode, (self.imagem.width, self.imagem.height + folga))
+        tmp.paste(self.imagem, (0, folga))
+        desenhar(ImageDraw.Draw(tmp))
+        self.imagem.paste(tmp.crop((0, folga, tmp.width, tmp.height)))
+
+    def text(self, xy, text, font=None, **kwargs):
+        x, y = self._somar(xy[0], self.dx), self._somar(xy[1], self.dy)
+        if self.altura is not None and font is not None:
+            _, topo, _, base = font.getbbox(text)
+            if self._fora(y + topo, y + base):
+                return
+        if y >= 0:
+            if kwargs.keys() <= {'fill'} and glifos.texto(self.draw, (x, y), text, font, kwargs.get('fill')):
+                return
+            self.draw.text((x, y), text, font=font, **kwargs)
+            return
+        folga = math.ceil(-y) + 1
+        y = self._somar(xy[1], self.dy + folga)
+        self._estendido(folga, lambda d: d.text((x, y), text, font=font, **kwargs))
+
+    def rectangle(self, xy, **kwargs):
+        x0, y0, x1, y1 = xy
+        if self._fora(y0 + self.dy, y1 + self.dy):
+            return
+        # Na página inteira as coordenadas são positivas e int() == floor
+        self.draw.rectangle([math.floor(x0) + self.dx, math.floor(y0) + self.dy,
+                             math.floor(x1) + self.dx, math.floor(y1) + self.dy], **kwargs)
+
+    def line(self, xy, fill=None, width=1):
+        x0, y0, x1, y1 = xy
+        x0, x1 = self._somar(x0, self.dx), self._somar(x1, self.dx)
+        topo = min(y0, y1) + self.dy
+        if self._fora(topo - width, max(y0, y1) + self.dy + width):
+            return
+        folga = 0 if topo - width >= 0 else math.ceil(width - topo) + 1
+        xy = (x0, self._somar(y0, self.dy + folga), x1, self._somar(y1, self.dy + folga))
+        if not folga:
+            self.draw.line(xy, fill=fill, width=width)
+            return
+        self._estendido(folga, lambda d: d.line(xy, fill=fill, width=width))
+
+
+class ModeloPagina:
+    """
+    Camada base de um lote: fundo, rodapé e cabeçalho desenhados uma única vez.
+
+    Cada página parte de uma cópia rápida da camada (com o zebrado das listas já
+    pré-desenhado para aquela quantidade de itens) e só executa o plano da área de
+    produtos. Use obter_modelo() para reaproveitar o modelo entre páginas.
+    """
+
+    def __init__(self, vigencia_text=None, aviso_estoques=None,
+                 print_margin=None, dpi=None, bleed_mm=None,
+                 bg_color=None, text_color=None, accent_color=None, badge_color=None,
+                 poster_title="OFERTAS"):
+        # O que muda o layout (sem as cores): chave de obter_plano
+        self.parametros = dict(vigencia_text=vigencia_text, aviso_estoques=aviso_estoques,
+                               print_margin=print_margin, dpi=dpi, bleed_mm=bleed_mm,
+                               poster_title=poster_title)
+        DPI = self.dpi = dpi or 150
+        W = self.W = int((210 * DPI) / 25.4)
+        H = self.H = int((297 * DPI) / 25.4)
+        margin = self.margin = print_margin if print_margin is not None else int(PRINT_MARGIN * (DPI/72))
+        # Sangria: a imagem ganha essa faixa de fundo em volta do A4 (o layout não muda)
+        self.sangria = mm_para_px(bleed_mm, DPI)
+
+        self.c_bg = hex_to_rgb(bg_color) if bg_color else DEFAULT_BG
+        self.c_text = hex_to_rgb(text_color) if text_color else DEFAULT_TEXT
+        self.c_accent = hex_to_rgb(accent_color) if accent_color else DEFAULT_ACCENT
+        self.c_badge = hex_to_rgb(badge_color) if badge_color else BADGE_COLOR
+        # Papéis de cor dos planos (plano.PAPEIS) -> cores deste tema
+        self.cores = {'fundo': self.c_bg, 'texto': self.c_text, 'destaque': self.c_accent, 'selo': self.c_badge}
+
+        # Só mede aqui; o desenho fica em desenhar_base (a imagem base é criada sob demanda)
+        draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+        # 1. RODAPÉ (Calcula espaço necessário)
+        vigencia = vigencia_text if vigencia_text else TEXTO_VIGENCIA
+        if aviso_estoques: vigencia += f" | {aviso_estoques}"
+
+        self._font_foot = get_font(int(W * 0.025))
+        # Usa a função inteligente também para o rodapé (para não quebrar errado)
+        self._rodape = lines_foot, _, total_h_foot, line_h_foot = caber_texto_na_caixa(
+            draw, vigencia, W - (margin*2), H * 0.1, int(W * 0.025), is_bold=False
+        )
+
+        # 2. CABEÇALHO (com ajuste automático de título)
+        self._h_header = h_header = int(H * 0.12)
+        max_w_title = W - (margin * 2)
+        start_font_size_title = int(h_header * 0.7) # Start with a large font
+
+        # Usa a função inteligente para ajustar o título (quebra linhas e reduz fonte)
+        self._titulo = caber_texto_na_caixa(
+            draw, poster_title.upper(), max_w_title, h_header, start_font_size_title, is_bold=True
+        )
+
+        # 3. ÁREA ÚTIL
+        self.y_start = margin + h_header
+        self.y_end = H - margin - total_h_foot - 20
+
+        self._lock = threading.Lock()
+
+    @property
+    def tamanho(self):
+        """(largura, altura) da imagem da página, já com a sangria."""
+        return self.W + 2 * self.sangria, self.H + 2 * self.sangria
+
+    def pincel(self, img):
+        """Draw que posiciona o layout dentro da sangria (um ImageDraw comum se não houver sangria)."""
+        if not self.sangria:
+            return ImageDraw.Draw(img)
+        return DesenhoDeslocado(img, self.sangria, self.sangria)
+
+    def desenhar_base(self, draw, cores=None):
+        """Rodapé e cabeçalho (o fundo é a cor de criação da imagem)."""
+        W, H, margin = self.W, self.H, self.margin
+        cores = cores or self.cores
+
+        lines_foot, _, total_h_foot, line_h_foot = self._rodape
+        y_foot = H - margin - total_h_foot
+        for line in lines_foot:
+            w_line = draw.textlength(line, font=self._font_foot)
+            draw.text(((W - w_line)/2, y_foot), line, font=self._font_foot, fill=cores['destaque'])
+            y_foot += line_h_foot
+
+        # Título centralizado (horizontal e verticalmente na área do cabeçalho)
+        title_lines, title_font, title_total_h, title_line_h = self._titulo
+        y_cursor = margin + (self._h_header - title_total_h) / 2
+        for line in title_lines:
+            w_line = draw.textlength(line, font=title_font)
+            x_line = (W - w_line) / 2
+            draw.text((x_line, y_cursor), line, font=title_font, fill=cores['texto'])
+            y_cursor += title_line_h
+
+    @property
+    def base(self):
+        """Imagem com fundo, rodapé e cabeçalho (criada na primeira página do modo padrão)."""
+        with self._lock:
+            img = camadas.get((self, 'base'))
+            if img is None:
+                img = Image.new('RGB', self.tamanho, color=self.c_bg)
+                self.desenhar_base(self.pincel(img))
+                camadas.put((self, 'base'), img)
+            return img
+
+    def camada(self, layout_mode, qtd):
+        """Camada base + fundos do layout para `qtd` itens (calculada uma vez e reaproveitada)."""
+        layout_mode = layout_efetivo(layout_mode, qtd)
+        if layout_mode in ('individual', 'gondola'):
+            return self.base
+        key = (self, layout_mode, qtd)
+        camada = camadas.get(key)
+        if camada is None:
+            camada = self.base.copy()
+            desenhar_fundo_layout(self.pincel(camada), layout_mode, qtd,
+                                  self.W, self.margin, self.y_start, self.y_end)
+            camadas.put(key, camada)
+        return camada
+
+    def desenhar_produtos(self, draw, ofertas, layout_mode='list', fundo=False, cores=None):
+        """Desenha só a área de produtos (os fundos já vêm da camada, salvo fundo=True)."""
+        W, H, margin, y_start, y_end = self.W, self.H, self.margin, self.y_start, self.y_end
+        cores = cores or self.cores
+        cores = (cores['texto'], cores['destaque'], cores['selo'])
+
+        # Escolhe o layout de desenho de acordo com o modo solicitado
+        layout_mode = layout_efetivo(layout_mode, len(ofertas))
+        if layout_mode == 'individual':
+            desenhar_item_individual(draw, ofertas[0], W, H, margin, y_start, y_end, *cores)
+        elif layout_mode == 'simple':
+            desenhar_lista_simples(draw, ofertas, W, H, margin, y_start, y_end, *cores, fundo=fundo)
+        elif layout_mode == 'gondola':
+            desenhar_gondola(draw, ofertas, W, H, margin, y_start, y_end, *cores)
+        else:
+            desenhar_lista_produtos(draw, ofertas, W, H, margin, y_start, y_end, *cores, fundo=fundo)
+
+    def planejar(self, ofertas, layout_mode='list'):
+        """Plano de layout da página (ver plano.py): as mesmas chamadas de desenho, gravadas com papéis de cor."""
+        papeis = {papel: papel for papel in plano.PAPEIS}
+        base, fundos, produtos = plano.GravadorPlano(), plano.GravadorPlano(), plano.GravadorPlano()
+        self.desenhar_base(base, papeis)
+        desenhar_fundo_layout(fundos, layout_mode, len(ofertas), self.W, self.margin, self.y_start, self.y_end)
+        self.desenhar_produtos(produtos, ofertas, layout_mode, cores=papeis)
+        efetivo = layout_efetivo(layout_mode, len(ofertas))
+        camada = (efetivo, len(ofertas) if efetivo != 'individual' else 1)
+        return plano.Plano(self.tamanho, self.sangria, camada, base.ops, fundos.ops, produtos.ops)
+
+    def renderizar(self, ofertas, layout_mode='list'):
+        """Página completa: cópia da camada + plano da área de produtos."""
+        plano_pagina = obter_plano(ofertas, layout_mode, **self.parametros)
+        img = self.camada(layout_mode, len(ofertas)).copy()
+        # Textos de produtos já rasterizados em outras páginas só são colados (ver celulas.py)
+        celulas.executar(plano_pagina.produtos, img, self.pincel(img), self.cores, self.sangria)
+        return img
+
+
+# Modelos guardados (um por combinação de tema/textos/DPI); as imagens ficam em `camadas`
+MAX_MODELOS = 8
+
+
+class CacheCamadas(cache_render.CacheMemoria):
+    """Camadas base e de layout de todos os modelos, limitadas pelo total de bytes dos pixels."""
+
+    @staticmethod
+    def tamanho(img):
+        return img.width * img.height * len(img.getbands())
+
+
+# Uma página A4 RGB tem ~6,5 MB a 150 DPI e ~26 MB a 300 DPI
+camadas = CacheCamadas(cache_render._env_mb('POSTER_CAMADAS_MB', 96))
+
+
+@functools.lru_cache(maxsize=MAX_MODELOS)
+def obter_modelo(**kwargs):
+    """ModeloPagina compartilhado para os mesmos parâmetros (fundo, textos, cores, DPI)."""
+    return ModeloPagina(**kwargs)
+
+
+def obter_plano(ofertas, layout_mode='list', **kwargs):
+    """
+    Plano de layout da página (ver plano.py), calculado uma vez por ofertas, layout,
+    textos e DPI. As cores em `kwargs` são ignoradas: o mesmo plano serve a todos os temas.
+    """
+    parametros = {k: v for k, v in kwargs.items() if k not in PARAMETROS_COR}
+    chave = cache_render.chave_plano(ofertas, layout_mode, **parametros)
+    plano_pagina = plano.planos.get(chave)
+    if plano_pagina is None:
+        plano_pagina = obter_modelo(**parametros).planejar(ofertas, layout_mode)
+        plano.planos.put(chave, plano_pagina)
+    return plano_pagina
+
+
+def renderizar_poster(ofertas, vigencia_text=None, aviso_estoques=None,
+                      print_margin=None, dpi=None, bleed_mm=None,
+                      bg_color=None, text_color=None, accent_color=None, badge_color=None,
+                      layout_mode='list', poster_title="OFERTAS"):
+    """Desenha a página e retorna a imagem PIL em memória (sem tocar no disco).
+
+    Páginas do mesmo lote compartilham o ModeloPagina: fundo, cabeçalho e rodapé
+    são desenhados só na primeira.
+    """
+    with perfil.etapa('desenho'):
+        modelo = obter_modelo(
+            vigencia_text=vigencia_text, aviso_estoques=aviso_estoques,
+            print_margin=print_margin, dpi=dpi, bleed_mm=bleed_mm,
+            bg_color=bg_color, text_color=text_color, accent_color=accent_color, badge_color=badge_color,
+            poster_title=poster_title,
+        )
+        return modelo.renderizar(ofertas, layout_mode)
+
+
+# --- SAÍDA ---
+
+FORMATOS_SAIDA = ('PNG', 'JPEG', 'WEBP', 'RAW')
+
+MIMETYPES = {
+    'PNG': 'image/png',
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+    'RAW': 'application/octet-stream',
+}
+
+# O Pillow pode ter sido compilado sem libwebp
+WEBP_DISPONIVEL = features.check('webp')
+
+# PNG indexado (codificar_imagem(..., paleta=CORES_PALETA)): 4 cores do tema + tons do antialiasing
+CORES_PALETA = 64
+
+# Saída compacta (opcoes_formato={'compacto': True}): tons intermediários entre cada par de cores do cartaz
+DEGRAUS_PALETA = 8
+
+
+def cores_da_pagina(bg_color=None, text_color=None, accent_color=None, badge_color=None, **_):
+    """Todas as cores que o cartaz usa: as quatro do tema e os cinzas fixos do zebrado."""
+    return (
+        hex_to_rgb(bg_color) if bg_color else DEFAULT_BG,
+        hex_to_rgb(text_color) if text_color else DEFAULT_TEXT,
+        hex_to_rgb(accent_color) if accent_color else DEFAULT_ACCENT,
+        hex_to_rgb(badge_color) if badge_color else BADGE_COLOR,
+        ZEBRA_LISTA, ZEBRA_SIMPLES, FUNDO_CARTAO,
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def paleta_do_tema(cores):
+    """
+    Imagem 'P' com a paleta fixa das cores do cartaz mais DEGRAUS_PALETA - 1 tons
+    entre cada par (é o que o antialiasing produz). Mapear para uma paleta conhecida
+    é bem mais rápido que quantizar de forma adaptativa e erra menos.
+    """
+    tons = list(cores)
+    for i, a in enumerate(cores):
+        for b in cores[i + 1:]:
+            tons.extend(tuple(round(a[c] + (b[c] - a[c]) * k / DEGRAUS_PALETA) for c in range(3))
+                        for k in range(1, DEGRAUS_PALETA))
+    tons = list(dict.fromkeys(tons))[:256]
+    paleta = Image.new('P', (1, 1))
+    paleta.putpalette([v for cor in tons for v in cor])
+    return paleta
+
+
+def compactar(img, cores):
+    """
+    Versão compacta da página: tons de cinza ('L') se todas as cores do tema são
+    neutras (a conversão não perde nada), senão a paleta fixa do tema ('P').
+    PNGs de 1 byte por pixel: menores, mais rápidos de codificar e embutidos no
+    PDF sem conversão (/DeviceGray ou /Indexed).
+    """
+    with perfil.etapa('compactacao'):
+        if all(r == g == b for r, g, b in cores):
+            return img.convert('L')
+        return img.quantize(palette=paleta_do_tema(tuple(cores)), dither=Image.Dither.NONE)
+
+
+def codificar_imagem(img, formato='PNG', **opcoes):
+    """
+    Codifica a imagem em memória no formato pedido:
+    - 'PNG' / 'JPEG' / 'WEBP': bytes do arquivo (opções extras vão para img.save, ex.: quality=90).
+    - 'RAW': buffer RGB cru (largura * altura * 3 bytes), sem cabeçalho.
+
+    Em PNG, `paleta=N` quantiza para N cores antes de gravar (PNG indexado): o
+    cartaz só tem as quatro cores do tema e os tons do antialiasing, então o
+    arquivo fica bem menor e o zlib tem menos bytes para comprimir.
+    """
+    formato = formato.upper()
+    if formato == 'JPG':
+        formato = 'JPEG'
+    if formato not in FORMATOS_SAIDA:
+        raise ValueError(f"Formato de saída desconhecido: {formato}")
+    with perfil.etapa('codificacao'):
+        if formato == 'RAW':
+            return img.convert('RGB').tobytes()
+
+        paleta = opcoes.pop('paleta', None)
+        if paleta and formato == 'PNG':
+            img = img.quantize(colors=int(paleta), method=Image.Quantize.FASTOCTREE)
+
+        buf = io.BytesIO()
+        img.save(buf, format=formato, **opcoes)
+        return buf.getvalue()
+
+
+def renderizar_poster_bytes(ofertas, formato='PNG', opcoes_formato=None, **kwargs):
+    """
+    Atalho: renderiza a página e já devolve os bytes codificados. Em PNG,
+    opcoes_formato={'compacto': True} grava a versão compacta (ver compactar).
+    """
+    img = renderizar_poster(ofertas, **kwargs)
+    opcoes = dict(opcoes_formato or {})
+    if opcoes.pop('compacto', False) and formato.upper() == 'PNG':
+        img = compactar(img, cores_da_pagina(**kwargs))
+    return codificar_imagem(img, formato, **opcoes)
+
+
+# Pré-visualização: só a primeira página, em resolução de tela e com compressão com perdas
+DPI_PREVIA = 72
+OPCOES_PREVIA = {'JPEG': {'quality': 70}, 'WEBP': {'quality': 70, 'method': 0}}
+
+
+def renderizar_previa(ofertas, formato='JPEG', dpi=DPI_PREVIA, **kwargs):
+    """Bytes da pré-visualização (JPEG ou WebP) de uma página, desenhada direto em `dpi`."""
+    formato = formato.upper()
+    return renderizar_poster_bytes(ofertas, formato, OPCOES_PREVIA.get(formato), dpi=dpi, **kwargs)
+
+
+# Itens por página padrão de cada layout (paginação, CLIs, benchmarks e aquecimento dos caches)
+ITENS_POR_PAGINA = {'list': 6, 'simple': 12, 'gondola': 8, 'individual': 1}
+
+
+def aquecer(layouts=None, dpi=None, temas=None):
+    """
+    Carrega as fontes e enche os caches de ajuste de texto desenhando uma página
+    de exemplo por layout. Chamado na inicialização dos workers para que a
+    primeira página real não pague esse custo.
+
+    Com `temas` (ex.: TEMAS.values()), a página de exemplo é desenhada em cada
+    tema, com as cores como o formulário as envia: os modelos e as camadas base
+    de todos os temas ficam prontos (usado antes do fork no modo pré-carregado).
+    """
+    cores = [{f"{nome}_color": tema[nome] for nome in ('bg', 'text', 'accent', 'badge')}
+             for tema in temas] if temas else [{}]
+    for layout_mode in layouts or ITENS_POR_PAGINA:
+        qtd = ITENS_POR_PAGINA.get(layout_mode, 6)
+        amostra = [{'produto': 'Produto de exemplo', 'de': 19.9, 'por': 9.99}] * qtd
+        for cores_tema in cores:
+            renderizar_poster(amostra, dpi=dpi, layout_mode=layout_mode, **cores_tema)
+
+
+def gerar_poster_a_partir_de_lista(ofertas, vigencia_text=None, aviso_estoques=None,
                                    print_margin=None, dpi=None, bleed_mm=None,
                                    bg_color=None, text_color=None, accent_color=None, badge_color=None,
                                    layout_mode='list', poster_title="OFERTAS"):
-    
-    DPI = dpi or 150
-    W = int((210 * DPI) / 25.4)
-    H = int((297 * DPI) / 25.4)
-    margin = print_margin if print_margin is not None else int(PRINT_MARGIN * (DPI/72))
-
-    def hex_to_rgb(h): return tuple(int(h.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-    c_bg = hex_to_rgb(bg_color) if bg_color else DEFAULT_BG
-    c_text = hex_to_rgb(text_color) if text_color else DEFAULT_TEXT
-    c_accent = hex_to_rgb(accent_color) if accent_color else DEFAULT_ACCENT
-    c_badge = hex_to_rgb(badge_color) if badge_color else BADGE_COLOR
-
-    img = Image.new('RGB', (W, H), color=c_bg)
-    draw = ImageDraw.Draw(img)
-
-    # 1. RODAPÉ (Calcula espaço necessário)
-    vigencia = vigencia_text if vigencia_text else TEXTO_VIGENCIA
-    if aviso_estoques: vigencia += f" | {aviso_estoques}"
-    
-    font_foot = get_font(int(W * 0.025))
-    # Usa a função inteligente também para o rodapé (para não quebrar errado)
-    lines_foot, _, total_h_foot, line_h_foot = caber_texto_na_caixa(
-        draw, vigencia, W - (margin*2), H * 0.1, int(W * 0.025), is_bold=False
-    )
-    
-    y_foot = H - margin - total_h_foot
-    for line in lines_foot:
-        w_line = draw.textlength(line, font=font_foot)
-        draw.text(((W - w_line)/2, y_foot), line, font=font_foot, fill=c_accent)
-        y_foot += line_h_foot
-
-    # 2. CABEÇALHO (com ajuste automático de título)
-    h_header = int(H * 0.12)
-    y_header_start = margin
-
-    max_w_title = W - (margin * 2)
-    max_h_title = h_header
-    start_font_size_title = int(h_header * 0.7) # Start with a large font
-
-    # Usa a função inteligente para ajustar o título (quebra linhas e reduz fonte)
-    title_lines, title_font, title_total_h, title_line_h = caber_texto_na_caixa(
-        draw, poster_title.upper(), max_w_title, max_h_title, start_font_size_title, is_bold=True
-    )
-    
-    # Desenha o título centralizado (horizontal e verticalmente na área do cabeçalho)
-    y_cursor = y_header_start + (max_h_title - title_total_h) / 2
-    for line in title_lines:
-        w_line = draw.textlength(line, font=title_font)
-        x_line = (W - w_line) / 2
-        draw.text((x_line, y_cursor), line, font=title_font, fill=c_text)
-        y_cursor += title_line_h
-
-    # 3. ÁREA ÚTIL
-    y_start = margin + h_header
-    y_end = H - margin - total_h_foot - 20
-    
-    # Escolhe o layout de desenho de acordo com o modo solicitado
-    if layout_mode == 'individual' or len(ofertas) == 1:
-        desenhar_item_individual(draw, ofertas[0], W, H, margin, y_start, y_end, c_text, c_accent, c_badge)
-    elif layout_mode == 'simple':
-        desenhar_lista_simples(draw, ofertas, W, H, margin, y_start, y_end, c_text, c_accent, c_badge)
-    elif layout_mode == 'gondola':
-        desenhar_gondola(draw, ofertas, W, H, margin, y_start, y_end, c_text, c_accent, c_badge)
-    else:
-        desenhar_lista_produtos(draw, ofertas, W, H, margin, y_start, y_end, c_text, c_accent, c_badge)
+    """Mantido por compatibilidade: renderiza e salva em um PNG temporário, retornando o caminho."""
+    img = renderizar_poster(ofertas, vigencia_text, aviso_estoques,
+                            print_margin, dpi, bleed_mm,
+                            bg_color, text_color, accent_color, badge_color,
+                            layout_mode, poster_title)
 
     # Salva a imagem em um arquivo temporário único para evitar conflitos
     out_filename = f"poster_{uuid.uuid4()}.png"
@@ -0,0 +1,206 @@
+"""
+Renderização de várias páginas em paralelo (pool de processos).
+
+Cada grupo de ofertas (uma página de dividir_lista) vira uma tarefa. Os workers
+são aquecidos na criação do pool (fontes carregadas e caches de ajuste cheios),
+as páginas voltam na mesma ordem dos grupos e um erro numa página não derruba o
+lote: vem no ResultadoPagina correspondente.
+
+O número de workers vem do parâmetro `workers`, da variável de ambiente
+POSTER_WORKERS ou, por padrão, do número de CPUs da máquina.
+"""
+import atexit
+import itertools
+import os
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import cache_render
+import perfil
+import plano
+import poster_black
+
+WORKERS_ENV = 'POSTER_WORKERS'
+
+# Abaixo disso não compensa despachar para outros processos
+PARALELO_MIN_PAGINAS = 4
+
+# etapas: tempos por etapa medidos no worker ({nome: (segundos, chamadas)}), somados ao perfil de quem pediu;
+# reaproveitada: a página veio do cache (não foi renderizada de novo)
+ResultadoPagina = namedtuple('ResultadoPagina', ['indice', 'dados', 'erro', 'etapas', 'reaproveitada'],
+                             defaults=(None, False))
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def numero_de_workers(workers=None):
+    """Resolve a quantidade de workers (parâmetro > POSTER_WORKERS > CPUs)."""
+    if workers is None:
+        try:
+            workers = int(os.environ.get(WORKERS_ENV, 0))
+        except ValueError:
+            workers = 0
+    if not workers or workers < 1:
+        workers = os.cpu_count() or 1
+    return int(workers)
+
+
+def _iniciar_worker():
+    """Inicializador do processo: carrega fontes e enche os caches antes da primeira página."""
+    poster_black.aquecer()
+
+
+def _renderizar_pagina(tarefa):
+    indice, grupo, formato, opcoes_formato, kwargs = tarefa
+    with perfil.coletar() as etapas:
+        try:
+            dados = poster_black.renderizar_poster_bytes(grupo, formato, opcoes_formato, **kwargs)
+            erro = None
+        except Exception as e:
+            dados, erro = None, f"{type(e).__name__}: {e}"
+    return ResultadoPagina(indice, dados, erro, etapas.como_dict())
+
+
+def obter_pool(workers=None):
+    """Pool global (reaproveitado entre requisições), recriado se o tamanho mudar."""
+    global _pool, _pool_workers
+    workers = numero_de_workers(workers)
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker)
+            _pool_workers = workers
+        return _pool
+
+
+def encerrar_pool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _pool_workers = 0
+
+
+atexit.register(encerrar_pool)
+
+
+def _do_cache(cache, tarefa):
+    """ResultadoPagina vindo do cache (ou None) e a chave usada na consulta."""
+    indice, grupo, formato, opcoes_formato, kwargs = tarefa
+    chave = cache_render.chave_pagina(grupo, formato, opcoes_formato, **kwargs)
+    dados = cache.get(chave)
+    return (ResultadoPagina(indice, dados, None, reaproveitada=True) if dados is not None else None), chave
+
+
+def iterar_paginas(grupos, workers=None, formato='PNG', opcoes_formato=None, cache=None, **kwargs):
+    """
+    Versão preguiçosa de renderizar_paginas: devolve cada ResultadoPagina, em ordem,
+    assim que fica pronto. No máximo ~2 páginas por worker ficam em voo, então a
+    memória não cresce com o tamanho do lote (útil para streaming de PDF).
+    `grupos` pode ser qualquer iterável, inclusive um gerador.
+
+    Com `cache` (um cache_render.CacheRender), páginas já renderizadas saem do cache
+    e as novas são guardadas nele. Fechar o gerador (close()) cancela as páginas
+    que ainda estão na fila do pool.
+    """
+    workers = numero_de_workers(workers)
+    tarefas = ((i, grupo, formato, opcoes_formato, kwargs) for i, grupo in enumerate(grupos))
+
+    def resolver(tarefa, executar):
+        chave = None
+        if cache is not None:
+            resultado, chave = _do_cache(cache, tarefa)
+            if resultado is not None:
+                return resultado, None
+        return executar(tarefa), chave
+
+    def concluir(pendente, chave):
+        resultado = pendente.result() if hasattr(pendente, 'result') else pendente
+        perfil.somar(resultado.etapas)
+        if chave is not None and resultado.dados is not None:
+            cache.put(chave, resultado.dados)
+        return resultado
+
+    if workers == 1:
+        for tarefa in tarefas:
+            yield concluir(*resolver(tarefa, _renderizar_pagina))
+        return
+
+    # Lê as primeiras páginas para decidir se vale a pena usar o pool
+    iniciais = list(itertools.islice(tarefas, PARALELO_MIN_PAGINAS))
+    if len(iniciais) < PARALELO_MIN_PAGINAS:
+        for tarefa in iniciais:
+            yield concluir(*resolver(tarefa, _renderizar_pagina))
+        return
+
+    pool = obter_pool(workers)
+    janela = workers * 2
+    pendentes = deque()
+    try:
+        for tarefa in itertools.chain(iniciais, tarefas):
+            pendentes.append(resolver(tarefa, lambda t: pool.submit(_renderizar_pagina, t)))
+            if len(pendentes) >= janela:
+                yield concluir(*pendentes.popleft())
+        while pendentes:
+            yield concluir(*pendentes.popleft())
+    finally:
+        # Gerador fechado antes do fim (erro numa página, cliente desconectou):
+        # as páginas que ainda não começaram saem da fila do pool
+        for pendente, _ in pendentes:
+            if hasattr(pendente, 'cancel'):
+                pendente.cancel()
+
+
+def renderizar_paginas(grupos, workers=None, formato='PNG', opcoes_formato=None, cache=None, **kwargs):
+    """
+    Renderiza cada grupo de ofertas como uma página codificada em `formato`.
+
+    Retorna uma lista de ResultadoPagina na ordem dos grupos. Com 1 worker (ou
+    poucas páginas) roda no próprio processo, sem pool.
+    """
+    return list(iterar_paginas(grupos, workers, formato, opcoes_formato, cache, **kwargs))
+
+
+def _planejar_pagina(tarefa):
+    indice, grupo, layout_mode, kwargs = tarefa
+    return indice, poster_black.obter_plano(grupo, layout_mode, **kwargs)
+
+
+def planejar_catalogo(grupos, workers=None, layout_mode='list', **kwargs):
+    """
+    Planos de layout (plano.Plano) de um catálogo inteiro, um por grupo e na ordem
+    dos grupos. Os que faltam no cache são calculados no pool e guardados no cache
+    deste processo: renderizar as páginas depois, em qualquer tema, só executa os planos.
+    """
+    parametros = {k: v for k, v in kwargs.items() if k not in poster_black.PARAMETROS_COR}
+    grupos = list(grupos)
+    planos = [None] * len(grupos)
+    faltando = []
+    for i, grupo in enumerate(grupos):
+        chave = cache_render.chave_plano(grupo, layout_mode, **parametros)
+        planos[i] = plano.planos.get(chave)
+        if planos[i] is None:
+            faltando.append((chave, (i, grupo, layout_mode, parametros)))
+
+    workers = numero_de_workers(workers)
+    tarefas = [tarefa for _, tarefa in faltando]
+    if workers == 1 or len(tarefas) < PARALELO_MIN_PAGINAS:
+        calculados = map(_planejar_pagina, tarefas)
+    else:
+        # Planejar é rápido: despacha em blocos para não pagar uma ida ao pool por página
+        bloco = max(1, len(tarefas) // (workers * 4))
+        calculados = obter_pool(workers).map(_planejar_pagina, tarefas, chunksize=bloco)
+    for (chave, _), (i, plano_pagina) in zip(faltando, calculados):
+        plano.planos.put(chave, plano_pagina)
+        planos[i] = plano_pagina
+    return planos
+
+
+def erros(resultados):
+    """Lista de (página, mensagem) para os resultados que falharam (páginas contadas a partir de 1)."""
+    return [(r.indice + 1, r.erro) for r in resultados if r.erro]
@@ -0,0 +1,47 @@
+"""
+O motor de ajuste (ajuste_texto.py) tem de dar o mesmo resultado do laço antigo
+de 2 em 2 px (bench_poster.caber_texto_legado), tanto no ajuste isolado quanto
+nas páginas desenhadas (o mesmo que o `bench_poster.py ajuste` imprime).
+"""
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+import ajuste_texto
+import bench_poster
+import plano
+import poster_black
+
+
+def _resumo(ajuste):
+    linhas, fonte, altura_total, altura_linha = ajuste
+    return linhas, fonte.size, altura_total, altura_linha
+
+
+def test_ajuste_igual_ao_legado():
+    draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+    aleatorio = random.Random(3)
+    nomes = [o['produto'].upper() for o in bench_poster.catalogo_farmacia(80, semente=3)]
+    nomes += [o['produto'].upper() for o in bench_poster.ofertas_exemplo()]
+    nomes += ['X' * 80, 'A', 'PALAVRAS ' * 12]
+    ajuste_texto.motor.limpar()
+    for nome in nomes:
+        largura, altura = aleatorio.uniform(150, 900), aleatorio.uniform(30, 300)
+        inicial, negrito = aleatorio.randint(14, 120), aleatorio.random() < 0.5
+        esperado = bench_poster.caber_texto_legado(draw, nome, largura, altura, inicial, negrito)
+        obtido = poster_black.caber_texto_na_caixa(draw, nome, largura, altura, inicial, negrito)
+        assert _resumo(obtido) == _resumo(esperado), nome
+
+
+@pytest.mark.parametrize('layout', bench_poster.LAYOUTS)
+def test_paginas_iguais_ao_legado(layout, monkeypatch, sem_caches_de_layout):
+    ofertas = bench_poster.ofertas_exemplo()
+    grupo = ofertas[:1] if layout == 'individual' else ofertas
+    novo = poster_black.renderizar_poster(grupo, layout_mode=layout)
+    # O legado replaneja do zero: sem modelos nem planos guardados com o motor novo
+    poster_black.obter_modelo.cache_clear()
+    monkeypatch.setattr(plano, 'planos', plano.CachePlanos())
+    monkeypatch.setattr(poster_black, 'caber_texto_na_caixa', bench_poster.caber_texto_legado)
+    legado = poster_black.renderizar_poster(grupo, layout_mode=layout)
+    assert bench_poster._mesmos_pixels(novo, legado)
@@ -0,0 +1,27 @@
+"""Rotas do app.py pelo cliente de teste do Flask."""
+import time
+
+import app
+import jobs
+
+
+def _esperar_job(cliente, url, limite=60):
+    fim = time.monotonic() + limite
+    while True:
+        estado = cliente.get(url, headers={'Accept': 'application/json'}).get_json()
+        if estado['status'] in jobs.FINALIZADOS or time.monotonic() > fim:
+            return estado
+        time.sleep(0.1)
+
+
+def test_job_grafica_sem_bleed_mm(monkeypatch, tmp_path):
+    # Sem o campo bleed_mm vale a sangria padrão do impressao.py (antes: 500 na rota)
+    monkeypatch.setattr(jobs, 'JOBS_DIR', str(tmp_path))
+    cliente = app.app.test_client()
+    resposta = cliente.post('/jobs', data={
+        'produto_1': 'Dipirona 500mg 10 comprimidos', 'de_1': '12,90', 'por_1': '9,99',
+        'layout_mode': 'individual', 'qualidade': '300',
+    })
+    assert resposta.status_code == 202
+    estado = _esperar_job(cliente, resposta.headers['Location'])
+    assert estado['status'] == jobs.CONCLUIDO, estado
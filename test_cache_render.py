@@ -0,0 +1,13 @@
+"""Cache de páginas/documentos (cache_render.py)."""
+import cache_render
+
+
+def test_disco_so_no_primeiro_uso(tmp_path):
+    pasta = tmp_path / 'cache'
+    cache = cache_render.CacheRender(max_memoria=1024, pasta=str(pasta), max_disco=1024 * 1024)
+    assert not pasta.exists()
+    cache.put('ab' * 32, b'pagina')
+    assert pasta.exists()
+    cache.memoria.limpar()
+    assert cache.get('ab' * 32) == b'pagina'
+    assert cache.estatisticas()['hits_disco'] == 1
@@ -0,0 +1,44 @@
+"""
+A página montada a partir da camada (fundo, cabeçalho, rodapé e zebrado já
+desenhados) mais o plano dos produtos tem de sair igual ao desenho antigo, tudo
+numa passada só e na ordem original: cada fundo de linha ou de cartazete antes
+dos textos daquele produto (um nome truncado que vaza fica coberto pelo próximo).
+"""
+import random
+
+import pytest
+from PIL import Image
+
+import bench_poster
+import poster_black
+
+
+def _legado(modelo, ofertas, layout):
+    img = Image.new('RGB', modelo.tamanho, color=modelo.c_bg)
+    draw = modelo.pincel(img)
+    modelo.desenhar_base(draw)
+    modelo.desenhar_produtos(draw, ofertas, layout, fundo=True)
+    return img
+
+
+def _casos():
+    aleatorio = random.Random(7)
+    nomes = [o['produto'] for o in bench_poster.catalogo_farmacia(60, semente=7)]
+    for layout in ('gondola', 'list', 'simple'):
+        for dpi in (72, 150):
+            for _ in range(6):
+                qtd = aleatorio.randint(2, poster_black.ITENS_POR_PAGINA[layout])
+                ofertas = []
+                for _ in range(qtd):
+                    # Nomes longos o bastante para o ajuste truncar e o texto vazar da caixa
+                    nome = ' '.join(aleatorio.choice(nomes) for _ in range(aleatorio.randint(1, 4)))
+                    por = round(aleatorio.uniform(2, 150), 2)
+                    ofertas.append({'produto': nome, 'de': round(por * 1.25, 2), 'por': por})
+                yield layout, dpi, ofertas
+
+
+@pytest.mark.parametrize('layout, dpi, ofertas', list(_casos()))
+def test_pagina_igual_ao_desenho_legado(layout, dpi, ofertas, sem_caches_de_layout):
+    modelo = poster_black.obter_modelo(dpi=dpi)
+    novo = modelo.renderizar(ofertas, layout)
+    assert bench_poster._mesmos_pixels(novo, _legado(modelo, ofertas, layout))
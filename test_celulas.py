@@ -0,0 +1,41 @@
+"""
+Colar os ladrilhos do cache de células (celulas.py) tem de dar os mesmos pixels
+do plano executado texto a texto (POSTER_CELULAS=0), com o ladrilho recém-criado
+e reaproveitado em outra página, em qualquer tema, DPI e sangria.
+"""
+import random
+
+import pytest
+
+import bench_poster
+import celulas
+import poster_black
+
+TEMAS = {nome: {f'{papel}_color': tema[papel] for papel in ('bg', 'text', 'accent', 'badge')}
+         for nome, tema in poster_black.TEMAS.items()}
+
+
+def _paginas(layout, semente):
+    """Páginas de tamanhos variados sorteadas de poucos produtos; a primeira volta no fim (só ladrilhos já prontos)."""
+    aleatorio = random.Random(semente)
+    skus = bench_poster.catalogo_farmacia(20, semente=semente)
+    skus += [{'produto': 'X' * 80, 'de': 1.0, 'por': 0.5}, {'produto': '', 'de': 0, 'por': 0}]
+    maximo = poster_black.ITENS_POR_PAGINA[layout]
+    paginas = [aleatorio.choices(skus, k=aleatorio.randint(2, maximo)) for _ in range(4)]
+    return paginas + paginas[:1]
+
+
+@pytest.mark.parametrize('layout', ['list', 'simple', 'gondola'])
+@pytest.mark.parametrize('dpi, bleed_mm', [(72, None), (150, None), (150, 3), (300, None)])
+@pytest.mark.parametrize('tema', sorted(TEMAS))
+def test_paginas_iguais_sem_celulas(layout, dpi, bleed_mm, tema, monkeypatch):
+    cache = celulas.CacheCelulas(64 * 1024 * 1024, ativo=True)
+    monkeypatch.setattr(celulas, 'cache', cache)
+    modelo = poster_black.obter_modelo(dpi=dpi, bleed_mm=bleed_mm, **TEMAS[tema])
+    for ofertas in _paginas(layout, semente=dpi):
+        cache.ativo = True
+        coladas = modelo.renderizar(ofertas, layout)
+        cache.ativo = False
+        desenhadas = modelo.renderizar(ofertas, layout)
+        assert bench_poster._mesmos_pixels(coladas, desenhadas), ofertas
+    assert cache.hits > 0
@@ -0,0 +1,62 @@
+"""
+O atlas de glifos (glifos.py) tem de desenhar exatamente os pixels do draw.text
+do Pillow: nos textos soltos (preços e rótulos em posições fracionárias, em
+todas as fontes) e nas páginas inteiras com POSTER_GLIFOS ligado e desligado.
+"""
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+import bench_poster
+import celulas
+import fontes
+import glifos
+import poster_black
+
+COR_FUNDO, COR_TEXTO = (10, 58, 10), (255, 204, 0)
+
+
+def _caminhos_fontes():
+    caminhos = [fontes.caminho_fonte(True), fontes.caminho_fonte(False)]
+    caminhos += [estilos[peso] for estilos in fontes.registro.familias.values() for peso in ('bold', 'regular')
+                 if peso in estilos]
+    return caminhos
+
+
+def test_texto_igual_ao_draw_text():
+    atlas = glifos.AtlasGlifos(ativo=True)
+    aleatorio = random.Random(7)
+    caminhos = _caminhos_fontes()
+    fracoes = (0, 0.5, 0.4921875, 0.5078125, 0.5062, 0.515625)
+    for _ in range(400):
+        fonte = fontes.fonte_do_arquivo(aleatorio.choice(caminhos), aleatorio.randint(8, 160))
+        texto = aleatorio.choice([poster_black.formatar_moeda(aleatorio.uniform(0, 30000)),
+                                  'DE:', 'POR:', 'R$', ',99', 'DE: R$ 9,99', '1.234,56'])
+        x, y = aleatorio.uniform(0, 200), aleatorio.uniform(0, 100)
+        if aleatorio.random() < 0.3:
+            x = int(x) + aleatorio.choice(fracoes)
+        if aleatorio.random() < 0.3:
+            y = int(y) + aleatorio.choice(fracoes)
+        tamanho = (int(fonte.size * len(texto) * 1.2) + 260, int(fonte.size * 1.6) + 120)
+        esperado, obtido = Image.new('RGB', tamanho, COR_FUNDO), Image.new('RGB', tamanho, COR_FUNDO)
+        ImageDraw.Draw(esperado).text((x, y), texto, font=fonte, fill=COR_TEXTO)
+        if not atlas.texto(ImageDraw.Draw(obtido), (x, y), texto, fonte, COR_TEXTO):
+            ImageDraw.Draw(obtido).text((x, y), texto, font=fonte, fill=COR_TEXTO)
+        assert bench_poster._mesmos_pixels(esperado, obtido), (fonte.path, fonte.size, texto, x, y)
+
+
+def _render(monkeypatch, ativo, ofertas, layout, dpi, bleed_mm):
+    # Ladrilhos novos: os do celulas.py também montam os preços com o atlas
+    monkeypatch.setattr(glifos, 'atlas', glifos.AtlasGlifos(ativo=ativo))
+    monkeypatch.setattr(celulas, 'cache', celulas.CacheCelulas(64 * 1024 * 1024))
+    return poster_black.obter_modelo(dpi=dpi, bleed_mm=bleed_mm).renderizar(ofertas, layout)
+
+
+@pytest.mark.parametrize('layout', bench_poster.LAYOUTS)
+@pytest.mark.parametrize('dpi, bleed_mm', [(72, None), (150, None), (150, 3)])
+def test_paginas_iguais_sem_atlas(layout, dpi, bleed_mm, monkeypatch):
+    ofertas = bench_poster.catalogo_farmacia(poster_black.ITENS_POR_PAGINA[layout], semente=11)
+    com_atlas = _render(monkeypatch, True, ofertas, layout, dpi, bleed_mm)
+    sem_atlas = _render(monkeypatch, False, ofertas, layout, dpi, bleed_mm)
+    assert bench_poster._mesmos_pixels(com_atlas, sem_atlas)
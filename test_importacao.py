@@ -0,0 +1,26 @@
+"""
+Orçamento de importação dos pontos de entrada (o mesmo do `bench_poster.py importacao`).
+
+Cada módulo é importado em processos novos: a mediana do tempo tem de caber no
+orçamento (POSTER_FOLGA_IMPORTACAO multiplica o orçamento em máquinas lentas de
+CI) e nenhum módulo proibido pode ter sido carregado.
+"""
+import os
+
+import pytest
+
+import bench_poster
+
+FOLGA = float(os.environ.get('POSTER_FOLGA_IMPORTACAO', 1.0))
+REPETICOES = 3
+
+
+@pytest.mark.parametrize('modulo', sorted(bench_poster.ORCAMENTO_IMPORTACAO_MS))
+def test_importacao(modulo):
+    medidas = [bench_poster._medir_importacao(modulo, bench_poster.PROIBIDOS_NA_IMPORTACAO[modulo])
+               for _ in range(REPETICOES)]
+    mediana = sorted(ms for ms, _ in medidas)[len(medidas) // 2]
+    carregados = sorted({m for _, lista in medidas for m in lista})
+    assert carregados == [], f"{modulo} importou {', '.join(carregados)}"
+    orcamento = bench_poster.ORCAMENTO_IMPORTACAO_MS[modulo] * FOLGA
+    assert mediana <= orcamento, f"{modulo}: {mediana:.0f} ms, orçamento {orcamento:.0f} ms"
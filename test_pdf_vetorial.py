@@ -0,0 +1,27 @@
+"""
+Paridade de layout do PDF vetorial: cada texto, retângulo e linha na mesma
+caixa do modo imagem, com tolerância de 0,5 px (o que o `bench_poster.py
+vetorial` imprime).
+"""
+import pytest
+
+import bench_poster
+import pdf_vetorial
+import poster_black
+
+pytestmark = pytest.mark.skipif(not pdf_vetorial.disponivel(), reason='fontTools não instalado')
+
+
+def _catalogos():
+    yield 'padrao', bench_poster.catalogo_sintetico(24)
+    yield 'farmacia', bench_poster.catalogo_farmacia(24, semente=5)
+
+
+@pytest.mark.parametrize('layout', bench_poster.LAYOUTS)
+@pytest.mark.parametrize('nome, ofertas', list(_catalogos()))
+def test_caixas_iguais_ao_raster(nome, ofertas, layout):
+    por_pagina = poster_black.ITENS_POR_PAGINA[layout]
+    for grupo in bench_poster._grupos(ofertas, por_pagina):
+        vetor = pdf_vetorial.desenhar_pagina(grupo, layout_mode=layout)
+        # O vetorial começa pelo retângulo do fundo (no modo imagem é a cor de criação)
+        assert bench_poster._caixas_iguais(bench_poster._caixas_raster(grupo, layout), vetor.caixas[1:])
@@ -0,0 +1,44 @@
+"""
+ZIP em streaming.
+
+O arquivo é montado entrada a entrada e cada pedaço sai assim que a entrada é
+gravada: nada de montar o ZIP inteiro num BytesIO e reler no fim. As entradas
+são ZIP_STORED por padrão, porque PNG e PDF já vêm comprimidos (deflate de novo
+só gasta CPU e não diminui nada).
+
+    for parte in zip_stream.zip_em_partes(('cartaz_001.png', png) for png in paginas):
+        arquivo.write(parte)
+"""
+import pdf_stream
+
+
+class SaidaZip(pdf_stream.Pedacos):
+    """Pedacos que o zipfile aceita como arquivo de saída (sem seek)."""
+
+    def write(self, dados):
+        super().write(dados)
+        return len(dados)
+
+    def flush(self):
+        pass
+
+
+def zip_em_partes(arquivos, compressao=None, data_hora=None):
+    """
+    Gerador de pedaços do ZIP; `arquivos` é um iterável (pode ser um gerador) de
+    (nome, bytes). Cada entrada sai do gerador assim que é gravada.
+    Com `data_hora` (tupla de 6 campos, como em ZipInfo) todas as entradas levam
+    essa data em vez da hora atual: os mesmos arquivos dão sempre os mesmos bytes.
+    """
+    import zipfile  # Só quem gera ZIP paga a importação
+    if compressao is None:
+        compressao = zipfile.ZIP_STORED
+    saida = SaidaZip()
+    with zipfile.ZipFile(saida, 'w', compression=compressao) as zf:
+        for nome, dados in arquivos:
+            if data_hora is not None:
+                nome = zipfile.ZipInfo(nome, date_time=data_hora)
+                nome.external_attr = 0o600 << 16  # Mesmas permissões do writestr com nome
+            zf.writestr(nome, dados, compress_type=compressao)
+            yield saida.esvaziar()
+    yield saida.esvaziar()